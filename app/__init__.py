@@ -6,7 +6,14 @@ from .extensions import db, migrate, login_manager, csrf
 from .jobs.scheduler import init_scheduler
 from .config import Config
 
-def create_app():
+def create_app(with_scheduler=None, with_blueprints=True):
+    """Application factory.
+
+    with_scheduler: start scheduler triggers and queue worker in this process
+        (defaults to SCHEDULER_IN_WEB); web processes skip them when a
+        dedicated ``flask worker`` runs the background jobs.
+    with_blueprints: register the web blueprints (not needed by workers).
+    """
     # Load environment variables
     load_dotenv()
     
@@ -15,6 +22,9 @@ def create_app():
     # Load configuration from Config class
     app.config.from_object(Config)
     
+    if with_scheduler is None:
+        with_scheduler = app.config["SCHEDULER_IN_WEB"]
+    
     # Database configuration with SSL support
     # Try DATABASE_URL first (Render's automatic variable), then SQLALCHEMY_DATABASE_URI
     database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
@@ -40,32 +50,40 @@ def create_app():
 
     # Register blueprints (will be imported after models are defined)
     with app.app_context():
-        from .views.public import public_bp
-        from .views.auth import auth_bp
-        from .views.dashboard import dashboard_bp
-        from .views.schedule import schedule_bp
-        from .views.content import content_bp
-        from .views.files import files_bp
-        from .billing.webhook import billing_bp
-        from .linkedin_oauth import linkedin_bp
-        from .meta_oauth import meta_bp
+        from . import models  # noqa: F401  (registers the tables with SQLAlchemy)
+        from .jobs import metrics
         
-        app.register_blueprint(public_bp)
-        app.register_blueprint(auth_bp)
-        app.register_blueprint(dashboard_bp)
-        app.register_blueprint(schedule_bp)
-        app.register_blueprint(content_bp)
-        app.register_blueprint(files_bp)
-        app.register_blueprint(billing_bp, url_prefix="/billing")
-        app.register_blueprint(linkedin_bp)
-        app.register_blueprint(meta_bp)
+        metrics.instrument_pool(db.engine)
+        
+        if with_blueprints:
+            from .views.public import public_bp
+            from .views.auth import auth_bp
+            from .views.dashboard import dashboard_bp
+            from .views.schedule import schedule_bp
+            from .views.content import content_bp
+            from .views.files import files_bp
+            from .billing.webhook import billing_bp
+            from .linkedin_oauth import linkedin_bp
+            from .meta_oauth import meta_bp
+            
+            app.register_blueprint(public_bp)
+            app.register_blueprint(auth_bp)
+            app.register_blueprint(dashboard_bp)
+            app.register_blueprint(schedule_bp)
+            app.register_blueprint(content_bp)
+            app.register_blueprint(files_bp)
+            app.register_blueprint(billing_bp, url_prefix="/billing")
+            app.register_blueprint(linkedin_bp)
+            app.register_blueprint(meta_bp)
 
         # Initialize scheduler
-        init_scheduler(app)
+        if with_scheduler:
+            init_scheduler(app)
         
         # Register CLI commands
-        from . import cli
+        from . import cli, worker
         cli.init_app(app)
+        worker.init_app(app)
 
     @app.context_processor
     def inject_globals():
@@ -73,4 +91,9 @@ def create_app():
             "STRIPE_PUBLIC_KEY": os.getenv("STRIPE_PUBLIC_KEY", ""),
         }
 
-    return app
\ No newline at end of file
+    return app
+
+def create_worker_app():
+    """App for ``flask --app app:create_worker_app worker``: no blueprints,
+    background jobs are started by the worker command itself"""
+    return create_app(with_scheduler=False, with_blueprints=False)
\ No newline at end of file
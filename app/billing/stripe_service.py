@@ -155,7 +155,9 @@ PLAN_LIMITS = {
         "max_posts_per_month": 10,
         "channels": ["telegram"],
         "ai_features": False,
-        "priority_support": False
+        "priority_support": False,
+        "queue_weight": 1,  # relative share of run-queue slots
+        "max_concurrent_runs": 1  # runs executing at once across workers
     },
     "basic": {
         "name": "Basic",
@@ -163,7 +165,9 @@ PLAN_LIMITS = {
         "max_posts_per_month": 100,
         "channels": ["telegram", "facebook"],
         "ai_features": True,
-        "priority_support": False
+        "priority_support": False,
+        "queue_weight": 2,
+        "max_concurrent_runs": 2
     },
     "pro": {
         "name": "Pro",
@@ -171,7 +175,9 @@ PLAN_LIMITS = {
         "max_posts_per_month": 500,
         "channels": ["telegram", "facebook", "linkedin", "instagram"],
         "ai_features": True,
-        "priority_support": True
+        "priority_support": True,
+        "queue_weight": 4,
+        "max_concurrent_runs": 4
     },
     "enterprise": {
         "name": "Enterprise",
@@ -179,7 +185,9 @@ PLAN_LIMITS = {
         "max_posts_per_month": -1,  # Unlimited
         "channels": ["telegram", "facebook", "linkedin", "instagram"],
         "ai_features": True,
-        "priority_support": True
+        "priority_support": True,
+        "queue_weight": 8,
+        "max_concurrent_runs": 8
     }
 }
 
@@ -101,6 +101,105 @@ def apply_manual_migration():
         traceback.print_exc()
 
 
+@click.group('schedules')
+def schedules_cli():
+    """Scheduled post diagnostics"""
+
+
+@schedules_cli.command('latency')
+@click.option('--by', 'group_by', type=click.Choice(['channel', 'tenant']), default='channel')
+@click.option('--hours', type=int, default=24, help='Look back this many hours')
+@click.option('--metric', default='total',
+              help='total, queue_wait, start_delay, text, image, tts, generation or publish')
+@click.option('--kind', type=click.Choice(['publish', 'pregenerate']), default='publish')
+@with_appcontext
+def schedules_latency(group_by, hours, metric, kind):
+    """p50/p95/p99 run latency per channel or tenant from the run ledger"""
+    from datetime import datetime, timedelta
+    from .jobs.ledger import LATENCY_FIELDS, latency_percentiles
+
+    field = metric if metric in LATENCY_FIELDS else f'{metric}_latency'
+    if field not in LATENCY_FIELDS:
+        raise click.BadParameter(f'unknown metric {metric}', param_hint='--metric')
+
+    stats = latency_percentiles(
+        group_by='user_id' if group_by == 'tenant' else 'channel',
+        field=field,
+        since=datetime.utcnow() - timedelta(hours=hours),
+        kind=kind
+    )
+    if not stats:
+        click.echo(f'No {kind} runs in the last {hours} hours')
+        return
+
+    def seconds(value):
+        return f'{value:8.2f}' if value is not None else f'{"-":>8}'
+
+    click.echo(f'{group_by:<20} {"runs":>6} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}  ({field}, seconds)')
+    for row in stats:
+        click.echo(
+            f'{str(row["group"]):<20} {row["count"]:>6} {seconds(row["p50"])} {seconds(row["p95"])} '
+            f'{seconds(row["p99"])} {seconds(row["max"])}'
+        )
+
+
+@schedules_cli.command('simulate')
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d']),
+              help='Window start in SCHEDULER_TIMEZONE (default: now)')
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d']),
+              help='Window end in SCHEDULER_TIMEZONE (default: start + 24 hours)')
+@click.option('--run-seconds', type=float,
+              help='Typical run duration for the concurrency estimate (default: p50 from the run ledger)')
+@click.option('--limit', type=int, default=60, help='Busiest minutes to list')
+@with_appcontext
+def schedules_simulate(start, end, run_seconds, limit):
+    """Project fires, OpenAI requests and publishes per minute for a window"""
+    from datetime import datetime, timedelta
+    from zoneinfo import ZoneInfo
+    from flask import current_app
+    from .jobs.capacity import busiest_minutes, simulate
+    from .jobs.ledger import latency_percentiles
+
+    zone = ZoneInfo(current_app.config.get('SCHEDULER_TIMEZONE', 'Europe/Berlin'))
+    start = start.replace(tzinfo=zone) if start else datetime.now(zone)
+    end = end.replace(tzinfo=zone) if end else start + timedelta(hours=24)
+    if end <= start:
+        raise click.BadParameter('must be after --from', param_hint='--to')
+
+    if run_seconds is None:
+        stats = latency_percentiles(since=datetime.utcnow() - timedelta(days=7))
+        runs = sum(row['count'] for row in stats)
+        if runs:
+            run_seconds = sum(row['p50'] * row['count'] for row in stats) / runs
+
+    result = simulate(start, end, run_seconds)
+
+    def line(label, stats):
+        peak_at = stats['peak_at'].strftime('%a %d.%m. %H:%M') if stats['peak_per_minute'] else '-'
+        click.echo(f'  {label:<12} {stats["total"]:>10}   peak {stats["peak_per_minute"]:>7}/min at {peak_at}')
+
+    click.echo(f'{start:%Y-%m-%d %H:%M} - {end:%Y-%m-%d %H:%M} ({zone.key}): '
+               f'{result["schedules"]} active schedules, {result["expressions"]} distinct expressions')
+    click.echo('Runs')
+    line('fires', result['fires'])
+    click.echo('OpenAI requests')
+    for name, stats in result['openai'].items():
+        line(name, stats)
+    click.echo('Publishes')
+    for name, stats in result['platforms'].items():
+        line(name, stats)
+    if 'peak_concurrency' in result:
+        click.echo(f'Peak concurrency at {run_seconds:.1f}s per run: {result["peak_concurrency"]} runs')
+
+    histogram = busiest_minutes(result['histogram'], limit)
+    if histogram:
+        click.echo(f'Fires per minute ({len(histogram)} of {len(result["histogram"])} minutes with fires)')
+        scale = 50 / max(count for _, count in histogram)
+        for minute, count in histogram:
+            click.echo(f'  {minute:%a %d.%m. %H:%M} {count:>8} {"#" * max(1, round(count * scale))}')
+
+
 def init_app(app: Flask):
-    """Register CLI command with Flask app"""
+    """Register CLI commands with Flask app"""
     app.cli.add_command(apply_manual_migration)
+    app.cli.add_command(schedules_cli)
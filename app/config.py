@@ -21,6 +21,48 @@ class Config:
         "max_overflow": 20      # Maximum overflow connections
     }
     
+    # === Scheduler ===
+    # Run triggers and queue worker inside the web processes; set to false when
+    # a dedicated "flask worker" process runs them
+    SCHEDULER_IN_WEB = os.getenv("SCHEDULER_IN_WEB", "true").lower() == "true"
+    # Set by gunicorn.conf.py with preload_app: the master only loads the app,
+    # background jobs start in each worker from the post_fork hook
+    SCHEDULER_START_AFTER_FORK = os.getenv("SCHEDULER_START_AFTER_FORK", "false").lower() == "true"
+    SCHEDULER_TIMEZONE = os.getenv("SCHEDULER_TIMEZONE", "Europe/Berlin")
+    SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "leader")  # leader, standalone, sharded, off
+    SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "30"))  # seconds
+    SCHEDULER_HEARTBEAT_INTERVAL = int(os.getenv("SCHEDULER_HEARTBEAT_INTERVAL", "10"))  # seconds
+    SCHEDULER_VIRTUAL_NODES = int(os.getenv("SCHEDULER_VIRTUAL_NODES", "64"))  # ring points per node (sharded mode)
+    SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", "")  # SQLite only, defaults to temp dir
+    SCHEDULER_SYNC_OVERLAP = int(os.getenv("SCHEDULER_SYNC_OVERLAP", "120"))  # seconds re-read behind the watermark
+    SCHEDULER_RECONCILE_MINUTES = int(os.getenv("SCHEDULER_RECONCILE_MINUTES", "10"))  # safety net behind change notifications
+    SCHEDULER_DEFAULT_JITTER_SECONDS = int(os.getenv("SCHEDULER_DEFAULT_JITTER_SECONDS", "0"))  # for schedules without own window
+    
+    # === Run queue (job_run table) ===
+    RUN_QUEUE_CONCURRENCY = int(os.getenv("RUN_QUEUE_CONCURRENCY", "4"))  # runs per process, 0 = no worker
+    GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "threads")  # threads, async (see jobs/pipeline.py)
+    RUN_QUEUE_ASYNC_CONCURRENCY = int(os.getenv("RUN_QUEUE_ASYNC_CONCURRENCY", "256"))  # runs held per process with GENERATION_BACKEND=async
+    RUN_QUEUE_GLOBAL_CONCURRENCY = int(os.getenv("RUN_QUEUE_GLOBAL_CONCURRENCY", "0"))  # runs across all workers, 0 = unlimited
+    RUN_QUEUE_CLAIM_WINDOW = int(os.getenv("RUN_QUEUE_CLAIM_WINDOW", "100"))  # due runs considered per claim for fair share
+    RUN_QUEUE_METRICS_INTERVAL = int(os.getenv("RUN_QUEUE_METRICS_INTERVAL", "60"))  # seconds between metric log lines
+    RUN_QUEUE_POLL_INTERVAL = float(os.getenv("RUN_QUEUE_POLL_INTERVAL", "2"))  # seconds
+    RUN_QUEUE_VISIBILITY_TIMEOUT = int(os.getenv("RUN_QUEUE_VISIBILITY_TIMEOUT", "600"))  # seconds before a claim expires
+    RUN_QUEUE_MAX_ATTEMPTS = int(os.getenv("RUN_QUEUE_MAX_ATTEMPTS", "3"))
+    RUN_QUEUE_RETRY_DELAY = int(os.getenv("RUN_QUEUE_RETRY_DELAY", "60"))  # seconds, doubled per attempt
+    RUN_QUEUE_RETENTION_DAYS = int(os.getenv("RUN_QUEUE_RETENTION_DAYS", "7"))
+    CATCHUP_MAX_AGE_HOURS = int(os.getenv("CATCHUP_MAX_AGE_HOURS", "24"))  # older missed runs are dropped
+    CATCHUP_MAX_RUNS_PER_SCHEDULE = int(os.getenv("CATCHUP_MAX_RUNS_PER_SCHEDULE", "24"))
+    CATCHUP_RATE_PER_MINUTE = int(os.getenv("CATCHUP_RATE_PER_MINUTE", "10"))  # replayed runs released per minute
+    ONE_OFF_POLL_SECONDS = int(os.getenv("ONE_OFF_POLL_SECONDS", "15"))  # how often due one-off posts are queued
+    ONE_OFF_BATCH_SIZE = int(os.getenv("ONE_OFF_BATCH_SIZE", "500"))  # due one-off posts queued per transaction
+    RUN_DEADLINE_SECONDS = int(os.getenv("RUN_DEADLINE_SECONDS", "240"))  # budget per run, below the misfire grace time
+    PUBLISH_RESERVE_SECONDS = int(os.getenv("PUBLISH_RESERVE_SECONDS", "30"))  # kept for publishing; later media is dropped
+    PREGENERATE_LOOKAHEAD_MINUTES = int(os.getenv("PREGENERATE_LOOKAHEAD_MINUTES", "60"))  # 0 = generate at fire time
+    PREGENERATE_INTERVAL_MINUTES = int(os.getenv("PREGENERATE_INTERVAL_MINUTES", "5"))
+    LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", "50"))  # run ledger entries per INSERT
+    LEDGER_FLUSH_SECONDS = float(os.getenv("LEDGER_FLUSH_SECONDS", "5"))  # max delay before entries are written
+    SCHEDULE_RUN_RETENTION_DAYS = int(os.getenv("SCHEDULE_RUN_RETENTION_DAYS", "30"))
+    
     # === Open Graph defaults ===
     OG_SITE_NAME = os.getenv("OG_SITE_NAME", "Andrii-IT")
     OG_TITLE = os.getenv("OG_TITLE", "Marketing Agent - KI-gestützte Marketing Automation")
@@ -0,0 +1,53 @@
+# file: app/deadline.py
+"""Deadline budgets for scheduled runs.
+
+A run gets one ``Deadline`` (RUN_DEADLINE_SECONDS) when it starts. Every
+blocking call it makes - OpenAI requests and publisher HTTP requests - takes
+its timeout from ``budget(deadline, default)``: the call's usual timeout,
+capped at what is left of the run's budget. A stage that no longer fits
+raises ``DeadlineExceeded`` instead of starting, so a run ends within its
+budget and does not hold a worker thread for the sum of all timeouts.
+"""
+import time
+from typing import Optional
+
+MIN_TIMEOUT = 1.0  # seconds; below this a request is not worth starting
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's budget does not leave enough time for the next stage"""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """Deadline for earlier stages, keeping ``seconds`` back for the later ones"""
+        earlier = Deadline.__new__(Deadline)
+        earlier.seconds = self.seconds
+        earlier.expires_at = self.expires_at - seconds
+        return earlier
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.remaining():.1f}s of {self.seconds}s left)"
+
+
+def budget(deadline: Optional[Deadline], default: float) -> float:
+    """Timeout for the next blocking call: ``default`` capped at the time left.
+
+    Raises DeadlineExceeded when less than MIN_TIMEOUT is left.
+    """
+    if deadline is None:
+        return default
+    left = deadline.remaining()
+    if left < MIN_TIMEOUT:
+        raise DeadlineExceeded(f"{deadline.seconds}s run budget exhausted")
+    return min(default, left)
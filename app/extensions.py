@@ -11,4 +11,14 @@ csrf = CSRFProtect()
 
 login_manager.login_view = "auth.login"
 login_manager.login_message = "Bitte melden Sie sich an, um auf diese Seite zuzugreifen."
-login_manager.login_message_category = "info"
\ No newline at end of file
+login_manager.login_message_category = "info"
+
+
+def release_connection():
+    """Give the session's pooled connection back before slow external I/O.
+
+    Ends the session's (read) transaction; loaded objects stay readable but
+    are detached, so ``db.session.add`` the ones to write back afterwards.
+    Pending changes must be committed first, they are discarded otherwise.
+    """
+    db.session.close()
@@ -1,9 +1,13 @@
 # file: app/forms.py
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, BooleanField, SelectField
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, BooleanField, SelectField, SelectMultipleField
+from wtforms.widgets import CheckboxInput, ListWidget
 from wtforms.validators import DataRequired, Email, Length, Optional, ValidationError
-import re
+
+def optional_int(value):
+    """Coerce a choice to int, with an empty choice meaning None (app default)"""
+    return None if value in ("", None) else int(value)
 
 class RegisterForm(FlaskForm):
     email = StringField("E-Mail-Adresse", validators=[DataRequired(), Email()])
@@ -32,6 +36,16 @@ class SettingsForm(FlaskForm):
                                          validators=[Optional()], 
                                          description="Zusätzliche Anweisungen für die Content-Generierung")
     openai_api_key = StringField("Eigener OpenAI API-Schlüssel (optional)", validators=[Optional()])
+    generation_cache_minutes = SelectField("Ergebnis-Cache für KI-Texte",
+                                           choices=[(0, "Aus"), (60, "1 Stunde"), (1440, "1 Tag"), (10080, "1 Woche")],
+                                           coerce=int, default=0,
+                                           description="Gleiche Anfrage (Thema, Kanal, Anweisungen) liefert in diesem "
+                                                       "Zeitraum den gespeicherten Text, ohne OpenAI erneut aufzurufen "
+                                                       "(nur im Generator, geplante Posts werden immer neu erstellt)")
+    semantic_cache = BooleanField("Auch ähnliche Themen wiederverwenden",
+                                  description="Ein umformuliertes Thema (z.B. \"Instagram Reels Tipps\" statt "
+                                              "\"Tipps für Instagram Reels\") liefert im Cache-Zeitraum den "
+                                              "vorhandenen Entwurf")
 
     # LinkedIn (ручний токен + URN)
     linkedin_access_token = StringField("LinkedIn Access Token (manuell)", validators=[Optional()])
@@ -50,8 +64,8 @@ class ScheduleForm(FlaskForm):
                                 ("linkedin", "LinkedIn"), ("instagram", "Instagram")],
                          validators=[DataRequired()])
     
-    cron_expression = StringField("Zeitplan (CRON)", validators=[DataRequired()],
-                                 description="z.B. '0 9 * * *' für täglich 9:00 Uhr")
+    cron_expression = StringField("Zeitplan (CRON oder Datum)", validators=[DataRequired()],
+                                 description="z.B. '0 9 * * *' für täglich 9:00 Uhr oder '2026-11-02 09:00' für einen einmaligen Beitrag")
     
     content_template = TextAreaField("Content-Vorlage", validators=[DataRequired()],
                                     description="Thema oder Briefing für automatische Content-Erstellung")
@@ -63,24 +77,53 @@ class ScheduleForm(FlaskForm):
                               choices=[("post", "Standard Post"), ("story", "Story"), ("reel", "Reel/Video")],
                               default="post")
     
+    jitter_seconds = SelectField("Zeitfenster",
+                                 choices=[("", "Standard (App-Voreinstellung)"), (0, "Exakt zur angegebenen Zeit"),
+                                          (60, "Bis zu 1 Minute später"), (300, "Bis zu 5 Minuten später"),
+                                          (900, "Bis zu 15 Minuten später")],
+                                 coerce=optional_int, default="",
+                                 description="Verteilt Beiträge zu beliebten Uhrzeiten gleichmäßiger")
+    
+    overlap_policy = SelectField("Wenn der vorige Lauf noch aktiv ist",
+                                 choices=[("queue_one", "Höchstens einen Lauf nachreihen"),
+                                          ("coalesce", "Wartenden Lauf durch neuesten ersetzen"),
+                                          ("skip", "Lauf überspringen"),
+                                          ("allow", "Parallel ausführen")],
+                                 default="queue_one",
+                                 description="Verhindert Stau bei häufigen Zeitplänen mit langer Generierung")
+    
+    catchup_policy = SelectField("Verpasste Läufe",
+                                 choices=[("coalesce", "Einmal nachholen"), ("all", "Alle nachholen"),
+                                          ("skip", "Überspringen")],
+                                 default="coalesce",
+                                 description="Was nach einem Ausfall mit verpassten Terminen passiert")
+    
     active = BooleanField("Zeitplan aktiv", default=True)
     submit = SubmitField("Zeitplan speichern")
 
     def validate_cron_expression(self, field):
-        # More flexible CRON validation supporting *, ranges, steps, lists
+        # Same parser as the scheduler (APScheduler syntax: *, ranges, steps, lists, names)
         # Format: Minute Hour Day Month Weekday
-        cron_parts = field.data.strip().split()
+        # Or a date and time for a one-off post
+        from datetime import datetime
+        from flask import current_app
+        from .jobs.cron import CronExpressionError, parse_due_at, validate_expression
         
-        if len(cron_parts) != 5:
-            raise ValidationError("CRON-Ausdruck muss genau 5 Felder haben: Minute Stunde Tag Monat Wochentag")
+        tz = current_app.config.get("SCHEDULER_TIMEZONE", "Europe/Berlin")
+        try:
+            validate_expression(field.data, tz)
+        except CronExpressionError as e:
+            raise ValidationError(str(e))
         
-        # Allow *, numbers, ranges (1-5), steps (*/5), lists (1,2,3)
-        cron_field_pattern = r'^(\*|[0-9]+(-[0-9]+)?(,[0-9]+(-[0-9]+)?)*|\*/[0-9]+)$'
-        
-        for i, part in enumerate(cron_parts):
-            if not re.match(cron_field_pattern, part):
-                field_names = ["Minute", "Stunde", "Tag", "Monat", "Wochentag"]
-                raise ValidationError(f"Ungültiges Format im Feld '{field_names[i]}': {part}")
+        due_at = parse_due_at(field.data, tz)
+        # Saving an already posted one-off unchanged is fine
+        if due_at and due_at < datetime.utcnow() and field.data != field.object_data:
+            raise ValidationError("Der Zeitpunkt liegt in der Vergangenheit")
+
+class MultiCheckboxField(SelectMultipleField):
+    """Multiple choice rendered as checkboxes"""
+    widget = ListWidget(prefix_label=False)
+    option_widget = CheckboxInput()
 
 class GenerateContentForm(FlaskForm):
     topic = StringField("Thema/Briefing", validators=[DataRequired()],
@@ -98,7 +141,14 @@ class GenerateContentForm(FlaskForm):
                               choices=[("post", "Standard Post"), ("story", "Story"), ("reel", "Reel/Video")],
                               default="post")
     
+    extra_channels = MultiCheckboxField("Auch für",
+                                        choices=[("telegram", "Telegram"), ("facebook", "Facebook"),
+                                                 ("linkedin", "LinkedIn"), ("instagram", "Instagram")],
+                                        default=[],
+                                        description="Eine Anfrage erzeugt eine eigene Variante je Plattform")
+    
     auto_publish = BooleanField("Sofort veröffentlichen", default=False)
+    regenerate = BooleanField("Neu generieren (keinen gespeicherten Entwurf verwenden)", default=False)
     submit = SubmitField("Content generieren")
 
 class UploadFileForm(FlaskForm):
@@ -0,0 +1,155 @@
+# file: app/generation_cache.py
+"""Opt-in cache for generated post texts.
+
+Users who enable it (``User.generation_cache_minutes``) get the stored text
+back when they make the same request - model, messages and parameters -
+again within their TTL, e.g. a re-generated brief in the generator.
+Scheduled runs never use it: a recurring schedule is meant to post a new
+text every time.
+Entries are scoped to the user: tenants sharing the system API key never
+get each other's texts. Entries are kept per process, bounded by
+GENERATION_CACHE_MAX_ENTRIES (least recently used go first).
+
+Identical requests that arrive while one is in flight wait for it instead
+of calling OpenAI again (single-flight), for threads and for coroutines on
+the ``openai_async`` loop alike. Only successful responses are stored.
+Hits, misses and coalesced requests are counted in ``jobs.metrics``.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000"))
+
+
+def request_key(scope: str, request: Dict[str, Any]) -> str:
+    """Hash of the request arguments, scoped to the user (``scope``, e.g. the user id)"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{scope}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def _count(name: str) -> None:
+    from .jobs import metrics
+    metrics.incr(f"generation_cache_{name}")
+
+
+class GenerationCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires at, value)
+        self._inflight: Dict[str, Future] = {}
+
+    def _lookup(self, key: str):
+        """Cached value or None; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def has(self, key: str) -> bool:
+        """Whether ``key`` would be answered without a new call (cached or in flight)"""
+        with self._lock:
+            return key in self._inflight or self._lookup(key) is not None
+
+    def _store(self, key: str, value, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _join(self, key: str):
+        """(value, None) on a hit, (None, future) to wait on, or (None, None) to compute"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                _count("hit")
+                return value, None
+            future = self._inflight.get(key)
+            if future is not None:
+                _count("coalesced")
+                return None, future
+            _count("miss")
+            self._inflight[key] = Future()
+            return None, None
+
+    def _finish(self, key: str, value=None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            future = self._inflight.pop(key)
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def get_or_compute(self, key: str, ttl: Optional[float], compute: Callable[[], Any],
+                       wait_timeout: Optional[float] = None):
+        """``compute()`` once per key and TTL; without a TTL the cache is bypassed.
+
+        Callers coalesced onto an in-flight call wait at most ``wait_timeout``.
+        """
+        if not ttl:
+            return compute()
+        value, future = self._join(key)
+        if value is not None:
+            return value
+        if future is not None:
+            return future.result(wait_timeout)
+        try:
+            value = compute()
+        except BaseException as e:
+            self._finish(key, error=e)
+            raise
+        self._store(key, value, ttl)
+        self._finish(key, value)
+        return value
+
+    async def get_or_compute_async(self, key: str, ttl: Optional[float], compute: Callable[[], Any],
+                                   wait_timeout: Optional[float] = None):
+        """``await compute()`` once per key and TTL (shares entries and in-flight calls with threads)"""
+        if not ttl:
+            return await compute()
+        value, future = self._join(key)
+        if value is not None:
+            return value
+        if future is not None:
+            # Shielded: giving up waiting must not cancel the call for the others
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), wait_timeout)
+        try:
+            value = await compute()
+        except BaseException as e:
+            self._finish(key, error=e)
+            raise
+        self._store(key, value, ttl)
+        self._finish(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+generation_cache = GenerationCache()
+
+
+def _reset_after_fork():
+    # In-flight calls belong to the parent's threads
+    generation_cache.__init__(generation_cache.max_entries)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,4 +1,4 @@
 # file: app/jobs/__init__.py
-from .scheduler import init_scheduler, schedule_job
+from .scheduler import init_scheduler, schedule_job, start_scheduler, stop_scheduler
 
-__all__ = ['init_scheduler', 'schedule_job']
\ No newline at end of file
+__all__ = ['init_scheduler', 'schedule_job', 'start_scheduler', 'stop_scheduler']
\ No newline at end of file
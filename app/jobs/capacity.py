@@ -0,0 +1,111 @@
+# file: app/jobs/capacity.py
+"""Capacity simulation for the active schedule population.
+
+``simulate`` answers "what will this window look like": fires per minute,
+the OpenAI requests they cause (one text request per run, plus image and TTS
+requests for schedules generating them) and publish volume per platform.
+Schedules are aggregated in SQL by (expression, timezone, channel, media
+flags), so the work follows the number of distinct expressions, not the
+number of schedules. One-off posts due in the window count once. Fire
+times are nominal; jitter windows and look-ahead pre-generation move load
+later or earlier than shown.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+
+from .cron import fire_histogram
+
+CHANNELS = ("telegram", "facebook", "instagram", "linkedin")
+OPENAI_REQUESTS = ("text", "image", "tts")
+
+
+def _population(start: datetime, end: datetime):
+    """(expression, timezone, channel, image, voice, count) of active schedules"""
+    from ..extensions import db
+    from ..models import Schedule
+
+    table = Schedule.__table__
+    columns = (table.c.cron_expression, table.c.timezone, table.c.channel,
+               table.c.generate_image, table.c.generate_voice)
+    utc = [moment.astimezone(timezone.utc).replace(tzinfo=None) for moment in (start, end)]
+    return db.session.execute(
+        select(*columns, func.count())
+        .where(and_(
+            table.c.active.is_(True),
+            # Only one-off posts due in the window
+            or_(table.c.due_at.is_(None), table.c.due_at.between(*utc))
+        ))
+        .group_by(*columns)
+    ).all()
+
+
+def simulate(start: datetime, end: datetime, run_seconds: Optional[float] = None) -> Dict:
+    """Project fires, OpenAI requests and publishes per minute in [start, end).
+
+    ``start``/``end`` are aware datetimes. ``run_seconds`` (typical run
+    duration, e.g. p50 from the run ledger) turns the peak minute into the
+    number of runs executing at once.
+    """
+    rows = _population(start, end)
+    channels = sorted(set(CHANNELS) | {row.channel for row in rows})
+    series = ("fires",) + OPENAI_REQUESTS + tuple(channels)
+
+    items = []
+    for index, row in enumerate(rows):
+        count = row[-1]
+        weights = dict.fromkeys(series, 0)
+        weights.update({
+            "fires": count,
+            "text": count,
+            "image": count if row.generate_image else 0,
+            "tts": count if row.generate_voice else 0,
+            row.channel: count,
+        })
+        items.append((index, row.cron_expression, row.timezone, [weights[name] for name in series]))
+
+    window = end - start
+    if items:
+        histogram = fire_histogram(items, start, window)
+    else:
+        histogram = np.zeros((len(series), max(1, int(window.total_seconds() // 60))))
+    by_series = dict(zip(series, histogram))
+
+    def summary(values) -> Dict:
+        peak = int(np.argmax(values)) if len(values) else 0
+        return {
+            "total": int(values.sum()),
+            "peak_per_minute": int(values[peak]) if len(values) else 0,
+            "peak_at": _minute(start, peak),
+        }
+
+    fires = by_series["fires"]
+    result = {
+        "start": start,
+        "end": end,
+        "schedules": sum(row[-1] for row in rows),
+        "expressions": len({(row.cron_expression, row.timezone) for row in rows}),
+        "fires": summary(fires),
+        "openai": {name: summary(by_series[name]) for name in OPENAI_REQUESTS},
+        "platforms": {name: summary(by_series[name]) for name in channels if by_series[name].any()},
+        "histogram": [(_minute(start, offset), int(fires[offset])) for offset in np.flatnonzero(fires)],
+    }
+    if run_seconds:
+        # Little's law: runs in flight = arrival rate x time in system
+        result["peak_concurrency"] = int(np.ceil(result["fires"]["peak_per_minute"] * run_seconds / 60))
+    return result
+
+
+def _minute(start: datetime, offset: int) -> datetime:
+    first = datetime.fromtimestamp(-(-int(start.timestamp()) // 60) * 60, timezone.utc)
+    return (first + timedelta(minutes=int(offset))).astimezone(start.tzinfo)
+
+
+def busiest_minutes(histogram: List, limit: int) -> List:
+    """The ``limit`` busiest minutes, in time order"""
+    if len(histogram) <= limit:
+        return histogram
+    busiest = sorted(histogram, key=lambda item: item[1], reverse=True)[:limit]
+    return sorted(busiest, key=lambda item: item[0])
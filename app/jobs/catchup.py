@@ -0,0 +1,138 @@
+# file: app/jobs/catchup.py
+"""Catch-up of runs missed while no scheduler was running.
+
+Jobs live in memory, so a restart, deploy or leader failover loses every
+fire time that passed in between. When a scheduler starts, each active
+schedule's missed fire times since its last known run (latest queued run,
+``last_run`` or creation) are computed with the bulk cron engine and
+handled per ``Schedule.catchup_policy``:
+
+- ``skip``: nothing is replayed
+- ``coalesce``: one run for the latest missed fire time
+- ``all``: every missed fire time (at most CATCHUP_MAX_RUNS_PER_SCHEDULE)
+
+In sharded mode a node replays only its own schedules, also when it gains
+schedules from a node that left the ring. Only fire times within
+CATCHUP_MAX_AGE_HOURS are considered. The backlog
+is queued behind live runs and released at CATCHUP_RATE_PER_MINUTE, so a
+restart does not turn into a burst of OpenAI calls.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, select
+
+from .cron import next_fire_times
+from .fairshare import PRIORITY_CATCHUP
+from .run_queue import KIND_PUBLISH, enqueue_runs
+
+logger = logging.getLogger(__name__)
+
+POLICY_SKIP = "skip"
+POLICY_COALESCE = "coalesce"
+POLICY_ALL = "all"
+
+
+def _last_known_runs(schedule_ids) -> Dict[int, datetime]:
+    """Latest fire time queued per schedule (job_run keeps the queued ones too)"""
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    rows = db.session.execute(
+        select(table.c.schedule_id, func.max(table.c.fire_time))
+        .where(table.c.kind == KIND_PUBLISH, table.c.schedule_id.in_(schedule_ids))
+        .group_by(table.c.schedule_id)
+    ).all()
+    return {schedule_id: fire_time for schedule_id, fire_time in rows}
+
+
+def find_missed_runs(schedules, now: datetime, max_age: timedelta,
+                     max_per_schedule: int) -> List[Tuple[object, datetime]]:
+    """(schedule, UTC fire time) pairs to replay, oldest first"""
+    if not schedules:
+        return []
+
+    window_start = now - max_age
+    last_known = _last_known_runs([schedule.id for schedule in schedules])
+
+    references = {}
+    for schedule in schedules:
+        candidates = [window_start, schedule.created_at, schedule.last_run, last_known.get(schedule.id)]
+        references[schedule.id] = max(value for value in candidates if value is not None)
+
+    fire_times = next_fire_times(
+        [(schedule.id, schedule.cron_expression, schedule.timezone) for schedule in schedules],
+        start=window_start.replace(tzinfo=timezone.utc),
+        window=max_age,
+        k=max_age // timedelta(minutes=1)
+    )
+
+    missed = []
+    for schedule in schedules:
+        due = [
+            fire_time.astimezone(timezone.utc).replace(tzinfo=None)
+            for fire_time in fire_times.get(schedule.id, [])
+        ]
+        due = [fire_time for fire_time in due if references[schedule.id] < fire_time <= now]
+        if not due:
+            continue
+
+        if schedule.catchup_policy == POLICY_ALL:
+            due = due[-max_per_schedule:]
+        else:
+            due = due[-1:]
+        missed.extend((schedule, fire_time) for fire_time in due)
+
+    missed.sort(key=lambda item: item[1])
+    return missed
+
+
+def catch_up_missed_runs(app) -> int:
+    """Queue runs missed while no scheduler was running, rate-limited"""
+    from ..extensions import db
+    from ..models import Schedule
+    from .sharding import ownership_filter
+
+    with app.app_context():
+        try:
+            now = datetime.utcnow().replace(second=0, microsecond=0)
+            schedules = Schedule.query.filter(
+                Schedule.active.is_(True),
+                Schedule.catchup_policy != POLICY_SKIP,
+                Schedule.due_at.is_(None),  # one-off posts are caught up by their poller
+                ownership_filter(Schedule.shard_key)
+            ).all()
+
+            missed = find_missed_runs(
+                schedules,
+                now,
+                max_age=timedelta(hours=app.config.get("CATCHUP_MAX_AGE_HOURS", 24)),
+                max_per_schedule=app.config.get("CATCHUP_MAX_RUNS_PER_SCHEDULE", 24)
+            )
+            if not missed:
+                return 0
+
+            # Release the backlog gradually, oldest fire time first
+            spacing = 60.0 / max(1, app.config.get("CATCHUP_RATE_PER_MINUTE", 10))
+            queued = enqueue_runs([
+                {
+                    "schedule_id": schedule.id,
+                    "user_id": schedule.user_id,
+                    "fire_time": fire_time,
+                    "available_at": now + timedelta(seconds=index * spacing),
+                }
+                for index, (schedule, fire_time) in enumerate(missed)
+            ], priority=PRIORITY_CATCHUP)
+
+            logger.info(
+                f"Queued {queued} missed runs for {len({schedule.id for schedule, _ in missed})} schedules, "
+                f"released over {queued * spacing / 60:.1f} minutes"
+            )
+            return queued
+
+        except Exception as e:
+            logger.error(f"Error catching up missed runs: {e}")
+            db.session.rollback()
+            return 0
@@ -0,0 +1,357 @@
+# file: app/jobs/cron.py
+"""Shared cron parsing: compiled trigger cache and bulk next-fire-time engine.
+
+``get_trigger`` returns one ``CronTrigger`` per (expression, timezone),
+kept in an LRU cache, so forms, endpoints and the scheduler stop parsing
+the same strings over and over. ``next_fire_times`` answers "next K fire
+times for M schedules within a window" without iterating
+``get_next_fire_time``: each expression is compiled into per-field
+bitmaps, the window is laid out as one array of local minutes per
+timezone, and matching minutes fall out of a vectorized AND. Semantics
+follow APScheduler (all fields must match, day_of_week 0 = Monday);
+around a UTC offset change (skipped or repeated local hours) and for
+syntax the bitmaps do not cover (``last``, ``2nd fri`` ...) the fire
+times come from the trigger. One-off expressions (an ISO date and time,
+see ``parse_due_at``) fire exactly once.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from apscheduler.triggers.cron import CronTrigger
+
+DEFAULT_TIMEZONE = "Europe/Berlin"
+FIELD_NAMES = ("minute", "hour", "day", "month", "day_of_week")
+FIELD_LABELS = ("Minute", "Stunde", "Tag", "Monat", "Wochentag")
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+_NAMES = {
+    "day_of_week": {name: i for i, name in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))},
+    "month": {name: i + 1 for i, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))},
+}
+_ITEM = re.compile(r"^(?:(?P<all>\*)|(?P<first>\w+)(?:-(?P<last>\w+))?)(?:/(?P<step>\d+))?$")
+
+CACHE_SIZE = int(os.getenv("CRON_CACHE_SIZE", "4096"))
+
+
+class CronExpressionError(ValueError):
+    """Invalid cron expression, message is shown to users"""
+
+
+def split_expression(expression: str) -> Tuple[str, ...]:
+    parts = tuple((expression or "").strip().split())
+    if len(parts) != 5:
+        raise CronExpressionError("CRON-Ausdruck muss genau 5 Felder haben: Minute Stunde Tag Monat Wochentag")
+    return parts
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_trigger(parts: Tuple[str, ...], tz: str) -> CronTrigger:
+    return CronTrigger(timezone=tz, **dict(zip(FIELD_NAMES, parts)))
+
+
+def get_trigger(expression: str, tz: Optional[str] = None) -> CronTrigger:
+    """Compiled (cached) trigger; raises CronExpressionError if invalid"""
+    parts = split_expression(expression)
+    try:
+        return _compile_trigger(parts, tz or DEFAULT_TIMEZONE)
+    except ValueError:
+        # Find the offending field for the message (error path only)
+        for name, label, part in zip(FIELD_NAMES, FIELD_LABELS, parts):
+            try:
+                CronTrigger(**{name: part})
+            except ValueError:
+                raise CronExpressionError(f"Ungültiges Format im Feld '{label}': {part}")
+        raise CronExpressionError("Ungültiger CRON-Ausdruck")
+
+
+def parse_due_at(expression: str, tz: Optional[str] = None) -> Optional[datetime]:
+    """Due time (naive UTC, whole minute) of a one-off expression.
+
+    One-off posts store an ISO date and time (``2026-11-02 09:00``, local to
+    ``tz`` unless it carries an offset) instead of cron fields; returns None
+    for anything else.
+    """
+    text = (expression or "").strip()
+    if not text or len(text.split()) > 2:
+        return None
+    try:
+        due = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if due.tzinfo is None:
+        try:
+            due = due.replace(tzinfo=ZoneInfo(tz or DEFAULT_TIMEZONE))
+        except (KeyError, ValueError):
+            return None
+    return due.astimezone(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+
+
+def local_time(moment: datetime, tz: Optional[str] = None) -> datetime:
+    """Naive UTC time as naive wall-clock time in ``tz`` (how ``next_run`` is stored)"""
+    try:
+        zone = ZoneInfo(tz or DEFAULT_TIMEZONE)
+    except (KeyError, ValueError):
+        return moment
+    return moment.replace(tzinfo=timezone.utc).astimezone(zone).replace(tzinfo=None)
+
+
+def validate_expression(expression: str, tz: Optional[str] = None) -> None:
+    """Raise CronExpressionError unless cron fields or a one-off date and time"""
+    if parse_due_at(expression, tz) is not None:
+        return
+    try:
+        get_trigger(expression, tz)
+    except CronExpressionError:
+        if "-" in (expression or "") and len(expression.split()) <= 2:
+            raise CronExpressionError("Ungültiger Zeitpunkt, erwartet z.B. 2026-11-02 09:00")
+        raise
+
+
+def cache_info():
+    return _compile_trigger.cache_info()
+
+
+def _field_mask(part: str, name: str, low: int, high: int) -> Optional[np.ndarray]:
+    mask = np.zeros(high + 1, dtype=bool)
+    names = _NAMES.get(name, {})
+
+    def value(token):
+        token = token.lower()
+        if token in names:
+            return names[token]
+        if not token.isdigit():
+            raise ValueError(token)
+        return int(token)
+
+    for item in part.split(","):
+        match = _ITEM.match(item)
+        if not match:
+            return None
+        try:
+            if match.group("all"):
+                first, last = low, high
+            else:
+                first = value(match.group("first"))
+                if match.group("last"):
+                    last = value(match.group("last"))
+                else:
+                    last = high if match.group("step") else first
+        except ValueError:
+            return None
+        step = int(match.group("step") or 1)
+        if step < 1 or first < low or last > high or first > last:
+            return None
+        mask[first:last + 1:step] = True
+    return mask
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_masks(parts: Tuple[str, ...]) -> Optional[Tuple[np.ndarray, ...]]:
+    masks = []
+    for part, name, (low, high) in zip(parts, FIELD_NAMES, FIELD_RANGES):
+        mask = _field_mask(part, name, low, high)
+        if mask is None:
+            return None
+        masks.append(mask)
+    return tuple(masks)
+
+
+# Minutes around an offset change left to the trigger, enough to cover any
+# skipped or repeated local hour (at most two hours anywhere)
+TRANSITION_MARGIN = 180
+
+
+def _local_fields(start_minute: int, count: int, tz: ZoneInfo):
+    """minute, hour, day, month, weekday of each UTC minute in the window, in ``tz``.
+
+    Also returns the (first, end) minute ranges of the window around offset
+    changes, where local minutes are skipped or repeated.
+    """
+    utc_minutes = np.arange(start_minute, start_minute + count, dtype=np.int64)
+
+    # Offsets only change at transitions, which fall on quarter hours: sample
+    # once per day and resolve quarter hours only on days with a transition
+    blocks = utc_minutes // 15
+    first_block = int(blocks[0])
+    block_count = int(blocks[-1]) - first_block + 1
+
+    def offset_at(block):
+        return datetime.fromtimestamp((first_block + block) * 900, tz).utcoffset() // timedelta(minutes=1)
+
+    offsets = np.empty(block_count, dtype=np.int64)
+    transitions = []
+    for day_start in range(0, block_count, 96):
+        day_end = min(day_start + 96, block_count)
+        before, after = offset_at(day_start), offset_at(day_end)
+        if before == after:
+            offsets[day_start:day_end] = before
+        else:
+            offsets[day_start:day_end] = [offset_at(block) for block in range(day_start, day_end)]
+            first = max(0, (first_block + day_start) * 15 - start_minute - TRANSITION_MARGIN)
+            end = min(count, (first_block + day_end) * 15 - start_minute + TRANSITION_MARGIN)
+            if transitions and first <= transitions[-1][1]:
+                first = transitions.pop()[0]
+            transitions.append((first, end))
+    local = utc_minutes + offsets[blocks - first_block]
+
+    days = local // 1440
+    dates = days.astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    fields = (
+        local % 60,
+        (local // 60) % 24,
+        (dates - months).astype(np.int64) + 1,
+        months.astype(np.int64) % 12 + 1,
+        (days + 3) % 7,  # 1970-01-01 was a Thursday, Monday = 0
+    )
+    return fields, transitions
+
+
+def _fallback_fire_times(trigger: CronTrigger, start: datetime, end: datetime, k: int) -> List[datetime]:
+    fire_times = []
+    next_fire = trigger.get_next_fire_time(None, start)
+    while next_fire is not None and next_fire < end and len(fire_times) < k:
+        fire_times.append(next_fire)
+        next_fire = trigger.get_next_fire_time(next_fire, next_fire)
+    return fire_times
+
+
+def _group_items(items) -> Tuple[Dict[Tuple[object, str], list], list]:
+    """Group items by (parsed expression, timezone); also returns every key.
+
+    One-off expressions are grouped by their due time (a datetime in place
+    of the cron fields).
+    """
+    groups: Dict[Tuple[object, str], list] = {}
+    keys = []
+    for item in items:
+        key, expression, tz = item[0], item[1], item[2] or DEFAULT_TIMEZONE
+        keys.append(key)
+        try:
+            parts = split_expression(expression)
+        except CronExpressionError:
+            parts = parse_due_at(expression, tz)
+            if parts is None:
+                continue
+        groups.setdefault((parts, tz), []).append(item)
+    return groups, keys
+
+
+def _fire_offsets(groups, start: datetime, window: timedelta, k: Optional[int] = None):
+    """Minute offsets from the first whole minute at or after ``start`` at which
+    each group fires, as (group, offsets, timezone) for every valid group"""
+    start = start.astimezone(timezone.utc)
+    # Fire times are whole minutes at or after ``start``
+    start_minute = -(-int(start.timestamp()) // 60)
+    count = max(1, int(window.total_seconds() // 60))
+
+    local_fields = {}
+    for (parts, tz), members in groups.items():
+        if isinstance(parts, datetime):
+            offset = int(parts.replace(tzinfo=timezone.utc).timestamp()) // 60 - start_minute
+            if 0 <= offset < count:
+                try:
+                    zone = ZoneInfo(tz)
+                except (KeyError, ValueError):
+                    zone = timezone.utc
+                yield members, start_minute, np.array([offset], dtype=np.int64), zone
+            continue
+
+        try:
+            trigger = _compile_trigger(parts, tz)
+        except ValueError:
+            continue
+
+        masks = _compile_masks(parts)
+        try:
+            zone = ZoneInfo(tz)
+        except (KeyError, ValueError):
+            masks = None
+        if masks is None:
+            zone = trigger.timezone
+            offsets = np.array([
+                int(fire_time.timestamp()) // 60 - start_minute
+                for fire_time in _fallback_fire_times(trigger, start, start + window, k or count)
+            ], dtype=np.int64)
+        else:
+            if tz not in local_fields:
+                local_fields[tz] = _local_fields(start_minute, count, zone)
+            fields, transitions = local_fields[tz]
+            matches = np.ones(count, dtype=bool)
+            for mask, values in zip(masks, fields):
+                matches &= mask[values]
+            # The trigger decides which skipped or repeated local times fire
+            for first, end in transitions:
+                matches[first:end] = False
+                for fire_time in _fallback_fire_times(
+                        trigger,
+                        datetime.fromtimestamp((start_minute + first) * 60, timezone.utc),
+                        datetime.fromtimestamp((start_minute + end) * 60, timezone.utc),
+                        k or count):
+                    matches[int(fire_time.timestamp()) // 60 - start_minute] = True
+            offsets = np.flatnonzero(matches)[:k]
+
+        yield members, start_minute, offsets, zone
+
+
+def next_fire_times(items: Iterable[Tuple[Hashable, str, Optional[str]]],
+                    start: Optional[datetime] = None, window: timedelta = timedelta(days=7),
+                    k: int = 1) -> Dict[Hashable, List[datetime]]:
+    """Next ``k`` fire times within ``window`` after ``start`` for many schedules.
+
+    ``items`` are (key, expression, timezone) tuples; the result maps each
+    key to aware datetimes in the schedule's timezone (empty if it does not
+    fire in the window, or the expression is invalid). Schedules sharing an
+    expression and timezone are computed once.
+    """
+    groups, keys = _group_items(items)
+    result: Dict[Hashable, List[datetime]] = {key: [] for key in keys}
+
+    for members, start_minute, offsets, zone in _fire_offsets(groups, start or datetime.now(timezone.utc), window, k):
+        fire_times = [datetime.fromtimestamp((start_minute + int(offset)) * 60, zone) for offset in offsets]
+        for member in members:
+            result[member[0]] = list(fire_times)
+
+    return result
+
+
+def fire_histogram(items: Iterable[Tuple[Hashable, str, Optional[str], Sequence[float]]],
+                   start: datetime, window: timedelta) -> np.ndarray:
+    """Weighted fires per minute of the window.
+
+    ``items`` are (key, expression, timezone, weights) tuples with the same
+    number of weights each (e.g. schedules, image requests, ...); the result
+    has one row per weight and one column per minute after ``start``.
+    """
+    items = list(items)
+    count = max(1, int(window.total_seconds() // 60))
+    histogram = np.zeros((len(items[0][3]) if items else 0, count))
+
+    groups, _ = _group_items(items)
+    for members, _, offsets, _ in _fire_offsets(groups, start, window):
+        offsets = offsets[(offsets >= 0) & (offsets < count)]
+        if len(offsets):
+            weights = np.sum([member[3] for member in members], axis=0)
+            histogram[:, offsets] += weights[:, None]
+    return histogram
+
+
+def next_fire_time(expression: str, tz: Optional[str] = None,
+                   start: Optional[datetime] = None) -> Optional[datetime]:
+    """Next fire time of one expression (no window limit), None if invalid"""
+    start = start or datetime.now(timezone.utc)
+    due = parse_due_at(expression, tz)
+    if due is not None:
+        due = due.replace(tzinfo=timezone.utc)
+        return due.astimezone(ZoneInfo(tz or DEFAULT_TIMEZONE)) if due >= start else None
+    try:
+        trigger = get_trigger(expression, tz)
+    except CronExpressionError:
+        return None
+    return trigger.get_next_fire_time(None, start)
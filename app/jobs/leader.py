@@ -0,0 +1,276 @@
+# file: app/jobs/leader.py
+"""Leader election for the background scheduler.
+
+Exactly one process per deployment may fire triggers. On PostgreSQL the
+leader holds a row lease in ``scheduler_lease`` and renews it from a
+heartbeat thread; on SQLite (single host, local development) an exclusive
+file lock stands in for the lease.
+"""
+import os
+import socket
+import tempfile
+import threading
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+def make_holder_id() -> str:
+    """Unique identity of this process (host, pid and a random suffix)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class DatabaseLease:
+    """Row lease in ``scheduler_lease``, valid until ``expires_at``"""
+
+    def __init__(self, app, name: str, holder: str, ttl: int):
+        self.app = app
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+
+    def try_acquire(self) -> bool:
+        """Take over an expired lease or renew our own one"""
+        from ..extensions import db
+        from ..models import SchedulerLease
+
+        table = SchedulerLease.__table__
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                # Renew our own lease
+                result = conn.execute(
+                    table.update()
+                    .where(and_(table.c.name == self.name, table.c.holder == self.holder))
+                    .values(renewed_at=now, expires_at=expires_at)
+                )
+                if result.rowcount:
+                    return True
+
+                # Take over a lease whose holder stopped heartbeating
+                result = conn.execute(
+                    table.update()
+                    .where(and_(table.c.name == self.name, table.c.expires_at < now))
+                    .values(holder=self.holder, acquired_at=now, renewed_at=now, expires_at=expires_at)
+                )
+                if result.rowcount:
+                    return True
+
+            # No row yet - the first process to insert it wins
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(
+                        name=self.name,
+                        holder=self.holder,
+                        acquired_at=now,
+                        renewed_at=now,
+                        expires_at=expires_at
+                    ))
+                return True
+            except IntegrityError:
+                return False
+
+    def release(self) -> None:
+        """Expire our lease so another process can take over immediately"""
+        from ..extensions import db
+        from ..models import SchedulerLease
+
+        table = SchedulerLease.__table__
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(
+                    table.update()
+                    .where(and_(table.c.name == self.name, table.c.holder == self.holder))
+                    .values(expires_at=datetime.utcnow())
+                )
+
+    def detach(self) -> None:
+        """Nothing is inherited across fork for row leases"""
+        pass
+
+
+class FileLease:
+    """Exclusive, non-blocking file lock used as lease on single-host setups"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock_file(fd)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            _unlock_file(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def detach(self) -> None:
+        """Drop the descriptor inherited from the parent without unlocking it.
+
+        flock() locks belong to the open file description, so unlocking here
+        would also release the parent's lease.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+try:
+    import fcntl
+
+    def _lock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(fd):
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock_file(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def default_lock_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"marketing-agent-{name}.lock")
+
+
+class LeaderElector:
+    """Campaign for a lease and keep it alive with a heartbeat thread.
+
+    ``on_elected`` runs when this process becomes leader, ``on_demoted``
+    when it loses the lease (e.g. heartbeat failed for longer than the TTL).
+    """
+
+    def __init__(self, app, name: str = "scheduler",
+                 on_elected: Optional[Callable[[], None]] = None,
+                 on_demoted: Optional[Callable[[], None]] = None):
+        self.app = app
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.ttl = app.config.get("SCHEDULER_LEASE_TTL", 30)
+        self.heartbeat_interval = app.config.get("SCHEDULER_HEARTBEAT_INTERVAL", 10)
+        self.holder = make_holder_id()
+        self.lease = None
+        self.is_leader = False
+        self._renewed_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _make_lease(self):
+        from ..extensions import db
+
+        with self.app.app_context():
+            dialect = db.engine.dialect.name
+
+        if dialect == "sqlite":
+            path = self.app.config.get("SCHEDULER_LOCK_FILE") or default_lock_path(self.name)
+            logger.info(f"Using file lock {path} as {self.name} lease (SQLite)")
+            return FileLease(path)
+
+        return DatabaseLease(self.app, self.name, self.holder, self.ttl)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.name}-elector", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop campaigning and hand the lease back"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            # A heartbeat in progress would take the lease right back
+            self._thread.join(self.ttl)
+        if self.is_leader:
+            self._demote()
+        if self.lease is not None:
+            try:
+                self.lease.release()
+            except Exception as e:
+                logger.error(f"Error releasing {self.name} lease: {e}")
+
+    def reset_after_fork(self) -> None:
+        """Forget the parent's leadership in a freshly forked child"""
+        if self.lease is not None:
+            self.lease.detach()
+        self.lease = None
+        self.is_leader = False
+        self.holder = make_holder_id()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.lease is None:
+                    self.lease = self._make_lease()
+                acquired = self.lease.try_acquire()
+            except Exception as e:
+                logger.error(f"Error renewing {self.name} lease: {e}")
+                # Keep leading through short DB hiccups, but step down before
+                # the lease can expire and be taken over by another process
+                lease_age = time.monotonic() - self._renewed_at
+                acquired = self.is_leader and lease_age < self.ttl - self.heartbeat_interval
+
+            if acquired and self.lease is not None:
+                self._renewed_at = time.monotonic()
+
+            if acquired and not self.is_leader:
+                self._elect()
+            elif not acquired and self.is_leader:
+                self._demote()
+
+            self._stop.wait(self.heartbeat_interval)
+
+    def _elect(self) -> None:
+        logger.info(f"Process {self.holder} became {self.name} leader")
+        self.is_leader = True
+        if self.on_elected:
+            try:
+                self.on_elected()
+            except Exception as e:
+                logger.error(f"Error starting {self.name} as leader: {e}")
+
+    def _demote(self) -> None:
+        logger.warning(f"Process {self.holder} lost {self.name} leadership")
+        self.is_leader = False
+        if self.on_demoted:
+            try:
+                self.on_demoted()
+            except Exception as e:
+                logger.error(f"Error stopping {self.name} after demotion: {e}")
@@ -0,0 +1,162 @@
+# file: app/jobs/ledger.py
+"""Run ledger: one ``schedule_run`` row per executed run.
+
+Workers ``record`` an entry per run in memory; the queue worker writes the
+buffer with a single multi-row INSERT once LEDGER_BATCH_SIZE entries are
+pending or every LEDGER_FLUSH_SECONDS, so the ledger does not add a commit
+per run. ``latency_percentiles`` reads p50/p95/p99 per channel or tenant.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, func, select
+
+logger = logging.getLogger(__name__)
+
+MAX_BUFFER = 10000  # entries kept while the database is unreachable
+
+LATENCY_FIELDS = (
+    "queue_wait", "start_delay", "text_latency", "image_latency", "tts_latency",
+    "generation_latency", "publish_latency", "total_latency",
+)
+
+_lock = threading.Lock()
+_buffer = deque(maxlen=MAX_BUFFER)
+
+
+def _reset_after_fork():
+    global _lock, _buffer
+    # Entries recorded by the parent are the parent's to write
+    _lock = threading.Lock()
+    _buffer = deque(maxlen=MAX_BUFFER)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def record(entry: dict) -> None:
+    with _lock:
+        _buffer.append(entry)
+
+
+def pending() -> int:
+    return len(_buffer)
+
+
+def flush(app) -> int:
+    """Write buffered entries in one statement; returns the number written"""
+    from ..extensions import db
+    from ..models import ScheduleRun
+
+    with _lock:
+        entries = list(_buffer)
+        _buffer.clear()
+    if not entries:
+        return 0
+
+    columns = [column.name for column in ScheduleRun.__table__.columns if column.name != "id"]
+    rows = [{name: entry.get(name) for name in columns} for entry in entries]
+
+    try:
+        with app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(ScheduleRun.__table__.insert(), rows)
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error writing {len(rows)} run ledger entries: {e}")
+        with _lock:
+            # Keep them for the next attempt (oldest are dropped when full)
+            _buffer.extendleft(reversed(entries))
+        return 0
+
+
+def purge_ledger(app, keep_days: Optional[int] = None) -> int:
+    """Delete ledger entries older than ``keep_days``"""
+    from ..extensions import db
+    from ..models import ScheduleRun
+
+    table = ScheduleRun.__table__
+    with app.app_context():
+        keep_days = keep_days or app.config.get("SCHEDULE_RUN_RETENTION_DAYS", 30)
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                table.delete().where(table.c.finished_at < datetime.utcnow() - timedelta(days=keep_days))
+            )
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} run ledger entries older than {keep_days} days")
+        return result.rowcount
+
+
+def _percentile(ordered, fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    # Linear interpolation, same as percentile_cont
+    position = fraction * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_percentiles(group_by: str = "channel", field: str = "total_latency",
+                        since: Optional[datetime] = None, kind: str = "publish") -> List[dict]:
+    """p50/p95/p99 of a latency field per channel or per tenant (user_id).
+
+    PostgreSQL computes the percentiles with ``percentile_cont``; other
+    databases get the values and interpolate the same way in Python.
+    """
+    from ..extensions import db
+    from ..models import ScheduleRun
+
+    if field not in LATENCY_FIELDS:
+        raise ValueError(f"Unknown latency field: {field}")
+    if group_by not in ("channel", "user_id"):
+        raise ValueError(f"Cannot group by {group_by}")
+
+    table = ScheduleRun.__table__
+    key, value = table.c[group_by], table.c[field]
+    since = since or datetime.utcnow() - timedelta(hours=24)
+    where = and_(
+        table.c.finished_at >= since,
+        table.c.kind == kind,
+        value.isnot(None)
+    )
+
+    if db.engine.dialect.name == "postgresql":
+        rows = db.session.execute(
+            select(
+                key,
+                func.count(),
+                func.percentile_cont(0.50).within_group(value),
+                func.percentile_cont(0.95).within_group(value),
+                func.percentile_cont(0.99).within_group(value),
+                func.max(value)
+            )
+            .where(where)
+            .group_by(key)
+        ).all()
+        stats = [
+            {"group": group, "count": count, "p50": p50, "p95": p95, "p99": p99, "max": maximum}
+            for group, count, p50, p95, p99, maximum in rows
+        ]
+    else:
+        values = {}
+        for group, latency in db.session.execute(select(key, value).where(where)):
+            values.setdefault(group, []).append(latency)
+        stats = []
+        for group, latencies in values.items():
+            latencies.sort()
+            stats.append({
+                "group": group,
+                "count": len(latencies),
+                "p50": _percentile(latencies, 0.50),
+                "p95": _percentile(latencies, 0.95),
+                "p99": _percentile(latencies, 0.99),
+                "max": latencies[-1],
+            })
+
+    stats.sort(key=lambda row: row["p95"] or 0, reverse=True)
+    return stats
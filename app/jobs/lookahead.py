@@ -0,0 +1,192 @@
+# file: app/jobs/lookahead.py
+"""Look-ahead pre-generation of scheduled content.
+
+Text and image generation take 10-30 s, far longer than publishing. The
+scheduler leader periodically queues ``pregenerate`` runs for fire times
+within PREGENERATE_LOOKAHEAD_MINUTES; workers generate the content ahead of
+time (in a lane behind publish runs) and store it as an unpublished
+``GeneratedContent`` row for the schedule and fire time. At fire time the
+publish run only has to send it. Content generated for an older version of
+the schedule is ignored and generated again inline.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.exc import IntegrityError
+
+from .fairshare import PRIORITY_PREGENERATE
+from .run_queue import KIND_PREGENERATE, enqueue_runs
+
+logger = logging.getLogger(__name__)
+
+MAX_RUNS_PER_SCHEDULE = 4  # upper bound for schedules firing several times per window
+
+
+def upcoming_fire_times(job, horizon: datetime) -> List[datetime]:
+    """Fire times of an APScheduler job up to ``horizon``, as naive UTC minutes"""
+    fire_times = []
+    next_fire = job.next_run_time
+    while next_fire is not None and next_fire <= horizon and len(fire_times) < MAX_RUNS_PER_SCHEDULE:
+        fire_times.append(next_fire.astimezone(timezone.utc).replace(tzinfo=None, second=0, microsecond=0))
+        next_fire = job.trigger.get_next_fire_time(next_fire, next_fire)
+    return fire_times
+
+
+def queue_pregeneration(due: Iterable[Tuple[int, int, datetime]]) -> int:
+    """Queue a pregenerate run per (schedule_id, user_id, fire_time) not queued yet"""
+    from ..extensions import db
+    from ..models import JobRun
+
+    due = list(due)
+    if not due:
+        return 0
+
+    table = JobRun.__table__
+    schedule_ids = {schedule_id for schedule_id, _, _ in due}
+    fire_times = [fire_time for _, _, fire_time in due]
+    existing = set(db.session.execute(
+        select(table.c.schedule_id, table.c.fire_time).where(and_(
+            table.c.kind == KIND_PREGENERATE,
+            table.c.schedule_id.in_(schedule_ids),
+            table.c.fire_time.between(min(fire_times), max(fire_times))
+        ))
+    ).all())
+
+    now = datetime.utcnow()
+    return enqueue_runs([
+        {
+            "schedule_id": schedule_id,
+            "user_id": user_id,
+            "fire_time": fire_time,
+            "available_at": now,
+            "max_attempts": 2,
+        }
+        for schedule_id, user_id, fire_time in due
+        if (schedule_id, fire_time) not in existing
+    ], kind=KIND_PREGENERATE, priority=PRIORITY_PREGENERATE)
+
+
+def find_pregenerated(schedule, fire_time: datetime, grace_seconds: int = 300):
+    """Unpublished content generated for this run of the current schedule version.
+
+    Runs that started late (misfire grace) still match content generated
+    for their nominal fire time.
+    """
+    from ..models import GeneratedContent
+
+    return (
+        GeneratedContent.query
+        .filter(
+            GeneratedContent.schedule_id == schedule.id,
+            GeneratedContent.published.is_(False),
+            GeneratedContent.schedule_version == schedule.version,
+            GeneratedContent.scheduled_for.between(fire_time - timedelta(seconds=grace_seconds), fire_time)
+        )
+        .order_by(GeneratedContent.scheduled_for.desc())
+        .first()
+    )
+
+
+def pregenerate_content(schedule_id: int, app, fire_time: datetime,
+                        report: Optional[dict] = None) -> Optional[int]:
+    """Generate and store content for an upcoming run; returns the content id.
+
+    ``report`` (a dict) receives channel, stage timings and outcome for the
+    run ledger. Generation gets the RUN_DEADLINE_SECONDS budget too, but
+    nothing is dropped: a run that does not fit fails and the post is
+    generated again at fire time, and so does a run whose text failed (no
+    error text is stored). No connection is held while generating.
+    """
+    from .pipeline import run_stages
+
+    return run_stages(pregeneration_stages(schedule_id, app, fire_time, report), app)
+
+
+def pregeneration_stages(schedule_id: int, app, fire_time: datetime, report: Optional[dict] = None):
+    """``pregenerate_content`` as stages (see ``pipeline.run_stages``)"""
+    from ..extensions import db, release_connection
+    from ..models import GeneratedContent, Schedule, User
+    from ..deadline import Deadline
+
+    report = report if report is not None else {}
+    report["outcome"] = "skipped"
+
+    with app.app_context():
+        schedule = Schedule.query.get(schedule_id)
+        if not schedule or not schedule.active:
+            return None
+        report["channel"] = schedule.channel
+
+        existing = GeneratedContent.query.filter_by(schedule_id=schedule.id, scheduled_for=fire_time).first()
+        if existing is not None and existing.schedule_version == schedule.version:
+            return existing.id
+
+        user = User.query.get(schedule.user_id)
+        if not user or not user.is_active:
+            return None
+        if not user.openai_api_key and not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OpenAI API key not configured")
+
+        release_connection()
+
+    assets = yield dict(
+        topic=schedule.content_template,
+        channel=schedule.channel,
+        user_system_prompt=user.openai_system_prompt,
+        user_api_key=user.openai_api_key,
+        with_image=bool(schedule.generate_image),
+        with_voice=bool(schedule.generate_voice),
+        deadline=Deadline(app.config.get("RUN_DEADLINE_SECONDS", 240)),
+        degrade=False
+    )
+    report["timings"] = assets["timings"]
+    logger.info(f"Pre-generated content for schedule {schedule.id} at {fire_time}: {assets['timings']}")
+
+    with app.app_context():
+        try:
+            if existing is not None:
+                # Generated for an older version of the schedule
+                db.session.delete(existing)
+                db.session.flush()
+            content = GeneratedContent(
+                user_id=user.id,
+                schedule_id=schedule.id,
+                text_content=assets["text"],
+                image_b64=assets["image_b64"],
+                voice_data=assets["voice_bytes"],
+                channel=schedule.channel,
+                scheduled_for=fire_time,
+                schedule_version=schedule.version
+            )
+            db.session.add(content)
+            db.session.commit()
+            report["outcome"] = "generated"
+            return content.id
+        except IntegrityError:
+            db.session.rollback()
+            logger.info(f"Content for schedule {schedule.id} at {fire_time} was generated by another worker")
+            return None
+
+
+def purge_unused_content(app, keep_days: Optional[int] = None) -> int:
+    """Delete pre-generated content that was never published (schedule edited or paused)"""
+    from ..extensions import db
+    from ..models import GeneratedContent
+
+    table = GeneratedContent.__table__
+    with app.app_context():
+        keep_days = keep_days or app.config.get("RUN_QUEUE_RETENTION_DAYS", 7)
+        cutoff = datetime.utcnow() - timedelta(days=keep_days)
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                table.delete().where(and_(
+                    table.c.published.is_(False),
+                    table.c.scheduled_for < cutoff
+                ))
+            )
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} unused pre-generated posts")
+        return result.rowcount
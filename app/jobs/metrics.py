@@ -0,0 +1,92 @@
+# file: app/jobs/metrics.py
+"""In-process metrics for the background jobs.
+
+Counters and timing summaries (count, average, p50/p95, max over the most
+recent samples). Each process keeps its own numbers; workers log a
+snapshot periodically.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict
+
+SAMPLE_SIZE = 1000
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_samples = defaultdict(lambda: deque(maxlen=SAMPLE_SIZE))
+_totals = defaultdict(lambda: [0, 0.0, 0.0])  # count, sum, max
+
+
+def incr(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, seconds: float) -> None:
+    with _lock:
+        _samples[name].append(seconds)
+        totals = _totals[name]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def snapshot() -> Dict[str, dict]:
+    """Current counters and timing summaries (seconds, rounded to ms)"""
+    with _lock:
+        result = {name: {"count": value} for name, value in _counters.items()}
+        for name, samples in _samples.items():
+            ordered = sorted(samples)
+            count, total, maximum = _totals[name]
+            result[name] = {
+                "count": count,
+                "avg": round(total / count, 3) if count else 0.0,
+                "p50": round(_percentile(ordered, 0.50), 3),
+                "p95": round(_percentile(ordered, 0.95), 3),
+                "max": round(maximum, 3),
+            }
+    return result
+
+
+def format_snapshot() -> str:
+    parts = []
+    for name, values in sorted(snapshot().items()):
+        parts.append(f"{name}[" + " ".join(f"{key}={value}" for key, value in values.items()) + "]")
+    return " ".join(parts)
+
+
+def instrument_pool(engine) -> None:
+    """Time how long pooled connections stay checked out.
+
+    ``db_connection_held`` is the checkout-to-checkin time per connection,
+    ``db_pool_checked_out`` the number of connections in use at each
+    checkout (a count, not seconds).
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        record.info["checked_out_at"] = time.monotonic()
+        if hasattr(engine.pool, "checkedout"):  # QueuePool
+            observe("db_pool_checked_out", engine.pool.checkedout())
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            observe("db_connection_held", time.monotonic() - checked_out_at)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _samples.clear()
+        _totals.clear()
@@ -0,0 +1,134 @@
+# file: app/jobs/notify.py
+"""Schedule change notifications for the scheduler.
+
+Views call ``publish_schedule_change`` before committing. On PostgreSQL the
+event is sent with ``pg_notify`` inside the same transaction (delivered only
+if it commits) and the scheduler leader receives it via LISTEN. Elsewhere an
+in-process queue stands in, which only reaches a scheduler running in the
+same process - the periodic reconcile picks up everything else.
+"""
+import json
+import queue
+import logging
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "schedule_changes"
+ACTIONS = ("add", "update", "remove")
+
+_local_queue = queue.Queue()
+
+
+def publish_schedule_change(action: str, schedule_id: int, session=None) -> None:
+    """Queue a change event; it is sent when the session commits"""
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown schedule change action: {action}")
+
+    if session is None:
+        from ..extensions import db
+        session = db.session
+
+    session.info.setdefault("schedule_changes", []).append({"action": action, "id": schedule_id})
+
+
+def _is_postgres(session) -> bool:
+    try:
+        return session.get_bind().dialect.name == "postgresql"
+    except Exception:
+        return False
+
+
+@event.listens_for(Session, "before_commit")
+def _send_pg_notifications(session):
+    changes = session.info.get("schedule_changes")
+    if not changes or not _is_postgres(session):
+        return
+
+    for change in changes:
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": json.dumps(change)}
+        )
+    session.info.pop("schedule_changes", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _send_local_notifications(session):
+    for change in session.info.pop("schedule_changes", None) or []:
+        _local_queue.put(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_notifications(session):
+    session.info.pop("schedule_changes", None)
+
+
+class ScheduleChangeListener:
+    """Background thread that hands received change events to ``handler``"""
+
+    def __init__(self, app, handler: Callable[[dict], None]):
+        self.app = app
+        self.handler = handler
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        from ..extensions import db
+
+        with self.app.app_context():
+            dialect = db.engine.dialect.name
+            dsn = db.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+        if dialect == "postgresql":
+            target, args = self._listen_postgres, (dsn,)
+        else:
+            target, args = self._listen_local, ()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=target, args=args, name="schedule-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _dispatch(self, change: dict) -> None:
+        try:
+            self.handler(change)
+        except Exception as e:
+            logger.error(f"Error applying schedule change {change}: {e}")
+
+    def _listen_local(self) -> None:
+        while not self._stop.is_set():
+            try:
+                change = _local_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._dispatch(change)
+
+    def _listen_postgres(self, dsn: str) -> None:
+        import psycopg
+
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    logger.info(f"Listening for schedule changes on '{CHANNEL}'")
+                    backoff = 1
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1):
+                            try:
+                                change = json.loads(notify.payload)
+                            except ValueError:
+                                logger.error(f"Malformed schedule change payload: {notify.payload}")
+                                continue
+                            self._dispatch(change)
+            except Exception as e:
+                logger.error(f"Schedule change listener error, reconnecting in {backoff}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
@@ -0,0 +1,110 @@
+# file: app/jobs/oneoff.py
+"""One-off scheduled posts.
+
+A schedule whose expression is an ISO date and time gets ``due_at`` (UTC)
+and never becomes an APScheduler job, so any number of future posts costs
+no scheduler memory. The scheduler polls every ONE_OFF_POLL_SECONDS with an
+index range scan on (active, due_at) and queues due posts in batches of
+ONE_OFF_BATCH_SIZE; ``next_run`` is cleared when a post is queued and the
+schedule is deactivated once it ran. Posts that became due while no
+scheduler was running are queued late unless their catch-up policy is
+``skip`` or they are older than CATCHUP_MAX_AGE_HOURS.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import and_, select
+
+from .run_queue import enqueue_runs, jitter_offset
+from .sharding import ownership_filter
+
+logger = logging.getLogger(__name__)
+
+LATE_GRACE = timedelta(minutes=5)  # same as the trigger misfire grace time
+
+
+def _pending(table, now: datetime):
+    return and_(
+        table.c.active.is_(True),
+        table.c.due_at <= now,
+        table.c.next_run.isnot(None),
+        ownership_filter(table.c.shard_key)
+    )
+
+
+def dispatch_due_posts(app) -> int:
+    """Queue every one-off post that is due; returns the number queued"""
+    from ..extensions import db
+    from ..models import Schedule
+
+    table = Schedule.__table__
+    queued = 0
+
+    with app.app_context():
+        batch_size = app.config.get("ONE_OFF_BATCH_SIZE", 500)
+        default_jitter = app.config.get("SCHEDULER_DEFAULT_JITTER_SECONDS", 0)
+        max_age = timedelta(hours=app.config.get("CATCHUP_MAX_AGE_HOURS", 24))
+
+        try:
+            while True:
+                now = datetime.utcnow()
+                rows = db.session.execute(
+                    select(table.c.id, table.c.user_id, table.c.due_at, table.c.jitter_seconds, table.c.catchup_policy)
+                    .where(_pending(table, now))
+                    .order_by(table.c.due_at)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+
+                runs, dropped = [], []
+                for row in rows:
+                    late = now - row.due_at
+                    if late > max_age or (late > LATE_GRACE and row.catchup_policy == "skip"):
+                        dropped.append(row.id)
+                        continue
+                    window = row.jitter_seconds if row.jitter_seconds is not None else default_jitter
+                    runs.append({
+                        "schedule_id": row.id,
+                        "user_id": row.user_id,
+                        "fire_time": row.due_at,
+                        "available_at": row.due_at + jitter_offset(row.id, row.due_at, window),
+                    })
+
+                # Disarm first; both statements commit together in enqueue_runs
+                db.session.execute(
+                    table.update()
+                    .where(table.c.id.in_([row.id for row in rows]))
+                    .values(next_run=None)
+                )
+                if dropped:
+                    db.session.execute(table.update().where(table.c.id.in_(dropped)).values(active=False))
+                    logger.warning(f"Skipped {len(dropped)} one-off posts that were due too long ago")
+                queued += enqueue_runs(runs)
+                db.session.commit()
+
+                if len(rows) < batch_size:
+                    break
+
+        except Exception as e:
+            logger.error(f"Error queueing due one-off posts: {e}")
+            db.session.rollback()
+
+    if queued:
+        logger.info(f"Queued {queued} one-off posts")
+    return queued
+
+
+def upcoming_one_offs(horizon: datetime) -> List[Tuple[int, int, datetime]]:
+    """(schedule_id, user_id, due_at) of pending one-off posts due before ``horizon``"""
+    from ..extensions import db
+    from ..models import Schedule
+
+    table = Schedule.__table__
+    return [
+        tuple(row) for row in db.session.execute(
+            select(table.c.id, table.c.user_id, table.c.due_at)
+            .where(and_(_pending(table, horizon), table.c.due_at > datetime.utcnow()))
+        )
+    ]
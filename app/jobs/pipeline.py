@@ -0,0 +1,277 @@
+# file: app/jobs/pipeline.py
+"""Content generation pipeline for scheduled runs.
+
+The image only depends on the schedule's topic and channel, so DALL-E runs
+on a stage thread while the text (and TTS, which needs the text) is being
+generated. Both are joined before publishing; per-stage timings are
+returned alongside the content.
+
+With a ``deadline`` every stage gets the run's remaining budget minus
+``reserve`` (kept for publishing) as its request timeout. The text is
+required; an image or voice that does not fit, or fails, is dropped when
+``degrade`` is set, so the post goes out text-only instead of late.
+
+With GENERATION_BACKEND=async (read from the app's config on every call)
+the same pipeline runs as coroutines on the ``openai_async`` event loop:
+no stage threads, and the queue worker ``submit_assets`` for every run it
+holds and resumes each run when its future is done, so runs in generation
+do not hold a thread.
+"""
+import asyncio
+import os
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Generator, List, Optional
+
+from ..deadline import Deadline, DeadlineExceeded, budget
+from ..openai_service import build_system_prompt, generate_post_text, generate_image_b64, generate_tts_audio
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_stage_pool = None
+
+
+def _get_stage_pool() -> ThreadPoolExecutor:
+    global _stage_pool
+    if _stage_pool is None:
+        _stage_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("GENERATION_STAGE_THREADS", "8")),
+            thread_name_prefix="generation-stage"
+        )
+    return _stage_pool
+
+
+def _reset_after_fork():
+    global _stage_pool
+    _stage_pool = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def generation_backend(app=None) -> str:
+    """GENERATION_BACKEND of ``app`` (default: the current app, threads outside one)"""
+    if app is None:
+        from flask import current_app, has_app_context
+
+        if not has_app_context():
+            return "threads"
+        app = current_app
+    return app.config.get("GENERATION_BACKEND", "threads")
+
+
+def _timed(timings: Dict[str, float], stage: str, func, *args, **kwargs):
+    started = time.monotonic()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[stage] = round(time.monotonic() - started, 3)
+
+
+def _drop(dropped: List[str], errors: Dict[str, str], stage: str, channel: str, degrade: bool,
+          reason: BaseException) -> None:
+    timed_out = isinstance(reason, (DeadlineExceeded, FutureTimeoutError, asyncio.TimeoutError))
+    if not degrade:
+        if timed_out:
+            raise DeadlineExceeded(f"{stage} did not finish in time") from reason
+        raise reason
+    if timed_out:
+        logger.warning(f"Dropping {stage} for {channel} post to meet the run deadline")
+    else:
+        logger.warning(f"Dropping {stage} for {channel} post after an error: {reason}")
+        errors[stage] = str(reason)
+    metrics.incr(f"{stage}_dropped")
+    dropped.append(stage)
+
+
+def generate_assets(topic: str, channel: str, user_system_prompt: Optional[str],
+                    user_api_key: Optional[str], with_image: bool = False,
+                    with_voice: bool = False, deadline: Optional[Deadline] = None,
+                    reserve: float = 0.0, degrade: bool = True,
+                    cache_ttl: Optional[float] = None, cache_scope: Optional[str] = None,
+                    similar_scope: Optional[str] = None, app=None) -> Dict[str, Any]:
+    """Generate text, image and voice for one post, independent stages in parallel.
+
+    Returns a dict with ``text``, ``image_b64``, ``voice_bytes``, ``timings``
+    (seconds per stage plus ``total``), ``dropped`` (media left out to meet
+    the deadline or after an error) and ``errors`` (stage -> error). Raises DeadlineExceeded when the text does not fit,
+    or any stage when ``degrade`` is off; without ``degrade`` a failed text
+    raises too instead of coming back as an error text. ``cache_ttl`` (seconds) lets an
+    identical text request of the user ``cache_scope`` reuse a recent
+    result, and with ``similar_scope`` a similar topic too (``similar`` then
+    describes the reused draft). ``app`` selects the backend when called
+    outside an app context.
+    """
+    if generation_backend(app) == "async":
+        # The coroutine enforces the deadline itself
+        return submit_assets(
+            topic=topic, channel=channel, user_system_prompt=user_system_prompt, user_api_key=user_api_key,
+            with_image=with_image, with_voice=with_voice, deadline=deadline, reserve=reserve, degrade=degrade,
+            cache_ttl=cache_ttl, cache_scope=cache_scope, similar_scope=similar_scope
+        ).result()
+
+    timings: Dict[str, float] = {}
+    dropped = []
+    errors: Dict[str, str] = {}
+    info: Dict[str, Any] = {}
+    started = time.monotonic()
+    stage_deadline = deadline.reserve(reserve) if deadline is not None else None
+
+    image_future = None
+    if with_image:
+        image_future = _get_stage_pool().submit(
+            _timed, timings, "image", generate_image_b64,
+            topic=topic, channel=channel, user_api_key=user_api_key, deadline=stage_deadline
+        )
+
+    try:
+        system_prompt = build_system_prompt(user_system_prompt, channel)
+        text = _timed(
+            timings, "text", generate_post_text,
+            topic=topic, channel=channel, system_prompt=system_prompt, user_api_key=user_api_key,
+            deadline=stage_deadline, cache_ttl=cache_ttl, cache_scope=cache_scope, similar_scope=similar_scope,
+            info=info, raise_errors=not degrade
+        )
+
+        voice_bytes = None
+        if with_voice:
+            try:
+                voice_bytes = _timed(timings, "tts", generate_tts_audio, text=text, user_api_key=user_api_key,
+                                     deadline=stage_deadline)
+            except Exception as e:
+                _drop(dropped, errors, "tts", channel, degrade, e)
+
+        image_b64 = None
+        if image_future:
+            try:
+                wait = budget(stage_deadline, stage_deadline.seconds) if stage_deadline is not None else None
+                image_b64 = image_future.result(timeout=wait)
+            except Exception as e:
+                # The stage thread ends on its own request timeout
+                image_future.cancel()
+                _drop(dropped, errors, "image", channel, degrade, e)
+    except BaseException:
+        if image_future:
+            image_future.cancel()
+        raise
+
+    timings["total"] = round(time.monotonic() - started, 3)
+
+    return {
+        "text": text,
+        "image_b64": image_b64,
+        "voice_bytes": voice_bytes,
+        "timings": dict(timings),  # a dropped stage may still finish later
+        "dropped": dropped,
+        "errors": errors,
+        "similar": info.get("similar"),
+    }
+
+
+async def generate_assets_async(topic: str, channel: str, user_system_prompt: Optional[str],
+                                user_api_key: Optional[str], with_image: bool = False,
+                                with_voice: bool = False, deadline: Optional[Deadline] = None,
+                                reserve: float = 0.0, degrade: bool = True,
+                                cache_ttl: Optional[float] = None, cache_scope: Optional[str] = None,
+                                similar_scope: Optional[str] = None) -> Dict[str, Any]:
+    """``generate_assets`` as a coroutine on the ``openai_async`` loop"""
+    from .. import openai_async
+
+    timings: Dict[str, float] = {}
+    dropped = []
+    errors: Dict[str, str] = {}
+    info: Dict[str, Any] = {}
+    started = time.monotonic()
+    stage_deadline = deadline.reserve(reserve) if deadline is not None else None
+
+    async def timed(stage: str, coro):
+        stage_started = time.monotonic()
+        try:
+            return await coro
+        finally:
+            timings[stage] = round(time.monotonic() - stage_started, 3)
+
+    image_task = None
+    if with_image:
+        image_task = asyncio.ensure_future(timed("image", openai_async.generate_image_b64(
+            topic=topic, channel=channel, user_api_key=user_api_key, deadline=stage_deadline
+        )))
+
+    try:
+        system_prompt = build_system_prompt(user_system_prompt, channel)
+        text = await timed("text", openai_async.generate_post_text(
+            topic=topic, channel=channel, system_prompt=system_prompt, user_api_key=user_api_key,
+            deadline=stage_deadline, cache_ttl=cache_ttl, cache_scope=cache_scope, similar_scope=similar_scope,
+            info=info, raise_errors=not degrade
+        ))
+
+        voice_bytes = None
+        if with_voice:
+            try:
+                voice_bytes = await timed("tts", openai_async.generate_tts_audio(
+                    text=text, user_api_key=user_api_key, deadline=stage_deadline
+                ))
+            except Exception as e:
+                _drop(dropped, errors, "tts", channel, degrade, e)
+
+        image_b64 = None
+        if image_task:
+            try:
+                wait = budget(stage_deadline, stage_deadline.seconds) if stage_deadline is not None else None
+                image_b64 = await asyncio.wait_for(image_task, wait)
+            except Exception as e:
+                # wait_for cancelled the request
+                _drop(dropped, errors, "image", channel, degrade, e)
+    except BaseException:
+        if image_task:
+            image_task.cancel()
+        raise
+
+    timings["total"] = round(time.monotonic() - started, 3)
+
+    return {
+        "text": text,
+        "image_b64": image_b64,
+        "voice_bytes": voice_bytes,
+        "timings": timings,
+        "dropped": dropped,
+        "errors": errors,
+        "similar": info.get("similar"),
+    }
+
+
+def submit_assets(**kwargs) -> Future:
+    """Start ``generate_assets_async`` on the event loop from any thread.
+
+    The queue worker submits the generation of every run it holds and
+    resumes the run when the future is done, so runs waiting on OpenAI do
+    not occupy a thread (bounded per API key).
+    """
+    from ..openai_async import generation_loop
+
+    return generation_loop.submit(generate_assets_async(**kwargs))
+
+
+def run_stages(stages: Generator, app=None) -> Any:
+    """Drive a run written as stages on the calling thread.
+
+    A run generator yields ``generate_assets`` arguments when it needs
+    content and is sent the result (or has the error thrown in); its return
+    value is returned. The queue worker drives the same generators with
+    ``submit_assets`` instead, resuming them on any of its threads, so a
+    stage must not keep an app context open across a ``yield``, so the
+    ``app`` whose GENERATION_BACKEND applies is passed in.
+    """
+    try:
+        kwargs = next(stages)
+        while True:
+            try:
+                assets = generate_assets(app=app, **kwargs)
+            except Exception as e:
+                kwargs = stages.throw(e)
+            else:
+                kwargs = stages.send(assets)
+    except StopIteration as stop:
+        return stop.value
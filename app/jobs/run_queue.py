@@ -0,0 +1,722 @@
+# file: app/jobs/run_queue.py
+"""Durable execution queue for scheduled runs.
+
+Trigger firing only inserts a ``job_run`` row; any number of worker
+processes claim rows and execute them. On PostgreSQL rows are claimed with
+``SELECT ... FOR UPDATE SKIP LOCKED``; on SQLite each candidate is claimed
+with a conditional UPDATE (compare-and-set), which is safe because SQLite
+serializes writers. A claimed row stays invisible until ``locked_until``;
+if its worker dies the row becomes claimable again and is retried until
+``max_attempts`` is reached. Workers pick among due runs per tenant
+(see ``fairshare``) so one large account cannot monopolize the slots.
+
+A (schedule, fire time, kind) is queued at most once: when several nodes
+fire the same trigger, the unique index lets one insert win and the others
+skip it. Before publishing, a worker confirms it still holds the claim, so
+a run whose claim expired and was taken over is not published twice. A
+successful publish is recorded on the row right away (``published_at``);
+a run that already published is never published again, and a failure
+after that point completes the run with a note instead of retrying it.
+"""
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from . import ledger, metrics
+from .fairshare import PRIORITY_BULK, FairShareSelector
+from .leader import make_holder_id
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+KIND_PUBLISH = "publish"
+KIND_PREGENERATE = "pregenerate"
+
+# Schedule.overlap_policy: what a fire does while an earlier run is still active
+OVERLAP_QUEUE_ONE = "queue_one"  # at most one run waiting behind the running one
+OVERLAP_COALESCE = "coalesce"    # the waiting run takes over the newest fire time
+OVERLAP_SKIP = "skip"            # no new run while one is queued or running
+OVERLAP_ALLOW = "allow"          # runs of the schedule may execute concurrently
+
+
+def _insert_new_runs(rows: List[dict]) -> List[int]:
+    """Insert runs, skipping any whose (schedule, fire time, kind) is already queued.
+
+    The unique index makes the insert the claim on a fire time: when several
+    nodes queue the same run only one row is created, the others get nothing
+    back. Returns the ids of the rows actually inserted.
+    """
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        ids = []
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    ids.append(db.session.execute(table.insert().values(**row)).inserted_primary_key[0])
+            except IntegrityError:
+                pass
+        return ids
+
+    statement = (
+        insert(table)
+        .on_conflict_do_nothing(index_elements=["schedule_id", "fire_time", "kind"])
+        .returning(table.c.id)
+    )
+    return list(db.session.execute(statement, rows).scalars())
+
+
+def enqueue_run(schedule_id: int, user_id: int, fire_time: datetime,
+                kind: str = KIND_PUBLISH, available_at: Optional[datetime] = None,
+                max_attempts: Optional[int] = None, priority: int = PRIORITY_BULK) -> Optional[int]:
+    """Insert a queued run and return its id, None if that run is already queued"""
+    run = dict(schedule_id=schedule_id, user_id=user_id, fire_time=fire_time, available_at=available_at or fire_time)
+    if max_attempts:
+        run["max_attempts"] = max_attempts
+    ids = enqueue_runs([run], kind=kind, priority=priority, return_ids=True)
+    return ids[0] if ids else None
+
+
+def enqueue_runs(runs: List[dict], kind: str = KIND_PUBLISH, priority: int = PRIORITY_BULK,
+                 return_ids: bool = False):
+    """Insert many queued runs in one statement.
+
+    ``runs`` are dicts with ``schedule_id``, ``user_id``, ``fire_time`` and
+    ``available_at`` (optionally ``max_attempts``). Runs another node already
+    queued are skipped; returns the number inserted (or their ids).
+    """
+    from flask import current_app
+    from ..extensions import db
+
+    if not runs:
+        return [] if return_ids else 0
+
+    now = datetime.utcnow()
+    defaults = dict(
+        kind=kind,
+        priority=priority,
+        status=STATUS_QUEUED,
+        attempts=0,
+        max_attempts=current_app.config.get("RUN_QUEUE_MAX_ATTEMPTS", 3),
+        created_at=now
+    )
+    ids = _insert_new_runs([dict(defaults, **run) for run in runs])
+    db.session.commit()
+
+    if len(ids) < len(runs):
+        metrics.incr("run_duplicate", len(runs) - len(ids))
+        logger.debug(f"{len(runs) - len(ids)} of {len(runs)} {kind} runs were already queued")
+    return ids if return_ids else len(ids)
+
+
+def admit_runs(runs: List[dict], policies: Dict[int, str]) -> List[dict]:
+    """Apply each schedule's overlap policy to runs about to be queued.
+
+    Returns the runs that should be inserted; waiting runs of coalescing
+    schedules are moved to the new fire time instead. Every fire that finds
+    an earlier run still active counts as an overrun.
+    """
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    schedule_ids = [run["schedule_id"] for run in runs if policies.get(run["schedule_id"]) != OVERLAP_ALLOW]
+    if not schedule_ids:
+        return runs
+
+    queued, running = {}, set()
+    for row in db.session.execute(
+        select(table.c.id, table.c.schedule_id, table.c.status)
+        .where(and_(
+            table.c.kind == KIND_PUBLISH,
+            table.c.status.in_((STATUS_QUEUED, STATUS_RUNNING)),
+            table.c.schedule_id.in_(schedule_ids)
+        ))
+        .order_by(table.c.fire_time)
+    ):
+        if row.status == STATUS_QUEUED:
+            queued[row.schedule_id] = row.id
+        else:
+            running.add(row.schedule_id)
+
+    admitted = []
+    for run in runs:
+        schedule_id = run["schedule_id"]
+        policy = policies.get(schedule_id, OVERLAP_QUEUE_ONE)
+        if policy == OVERLAP_ALLOW or (schedule_id not in queued and schedule_id not in running):
+            admitted.append(run)
+            continue
+
+        metrics.incr("run_overrun")
+        if policy == OVERLAP_SKIP:
+            metrics.incr("overrun_skipped")
+        elif schedule_id not in queued:
+            # Only running: wait behind it
+            admitted.append(run)
+        elif policy == OVERLAP_COALESCE:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(
+                        table.update()
+                        .where(and_(table.c.id == queued[schedule_id], table.c.status == STATUS_QUEUED))
+                        .values(fire_time=run["fire_time"], available_at=run["available_at"])
+                    )
+                metrics.incr("overrun_coalesced")
+            except IntegrityError:
+                # Another node already queued this fire time
+                metrics.incr("run_duplicate")
+        else:
+            metrics.incr("overrun_dropped")
+
+    db.session.commit()
+    return admitted
+
+
+def jitter_offset(schedule_id: int, fire_time: datetime, window: int) -> timedelta:
+    """Deterministic delay in [0, window] seconds spreading a cohort that fires together"""
+    if not window or window <= 0:
+        return timedelta(0)
+    key = f"{schedule_id}:{fire_time.isoformat()}".encode()
+    return timedelta(seconds=zlib.crc32(key) % (window + 1))
+
+
+def _claimable(table, now):
+    return or_(
+        and_(table.c.status == STATUS_QUEUED, table.c.available_at <= now),
+        # Visibility timeout ran out: the worker holding it died or hung
+        and_(table.c.status == STATUS_RUNNING, table.c.locked_until < now)
+    )
+
+
+def _running_per_user(conn, table, user_ids, now) -> Dict[int, int]:
+    rows = conn.execute(
+        select(table.c.user_id, func.count())
+        .where(and_(
+            table.c.status == STATUS_RUNNING,
+            table.c.locked_until >= now,
+            table.c.user_id.in_(user_ids)
+        ))
+        .group_by(table.c.user_id)
+    ).all()
+    return {user_id: count for user_id, count in rows}
+
+
+def _plans_per_user(conn, user_ids) -> Dict[int, str]:
+    from ..models import User
+
+    users = User.__table__
+    rows = conn.execute(select(users.c.id, users.c.plan).where(users.c.id.in_(user_ids))).all()
+    return {user_id: plan or "free" for user_id, plan in rows}
+
+
+def _serialize_schedules(conn, table, rows, now) -> list:
+    """Drop candidates whose schedule already has a run executing (unless overlap is allowed)"""
+    from ..models import Schedule
+
+    schedule_ids = {row.schedule_id for row in rows if row.kind == KIND_PUBLISH}
+    if not schedule_ids:
+        return rows
+
+    schedules = Schedule.__table__
+    allowed = {
+        schedule_id for schedule_id, in conn.execute(
+            select(schedules.c.id)
+            .where(and_(schedules.c.id.in_(schedule_ids), schedules.c.overlap_policy == OVERLAP_ALLOW))
+        )
+    }
+    busy = {
+        schedule_id for schedule_id, in conn.execute(
+            select(table.c.schedule_id).distinct()
+            .where(and_(
+                table.c.kind == KIND_PUBLISH,
+                table.c.status == STATUS_RUNNING,
+                table.c.locked_until >= now,
+                table.c.schedule_id.in_(schedule_ids - allowed)
+            ))
+        )
+    }
+
+    serialized = []
+    for row in rows:
+        if row.kind == KIND_PUBLISH and row.schedule_id not in allowed:
+            if row.schedule_id in busy:
+                metrics.incr("overlap_deferred")
+                continue
+            busy.add(row.schedule_id)
+        serialized.append(row)
+    return serialized
+
+
+def claim_runs(worker_id: str, limit: int, visibility_timeout: int, global_limit: int = 0,
+               selector: Optional[FairShareSelector] = None, window: int = 0) -> List[dict]:
+    """Claim up to ``limit`` due runs for ``worker_id``, earliest fire time first.
+
+    ``global_limit`` caps running rows across all workers; when it is reached
+    due runs stay queued (pushed back) instead of being started or dropped.
+    With a ``selector`` up to ``window`` due runs are fetched and the selector
+    picks among them per tenant (weights and caps by plan); otherwise runs
+    are taken in priority / fire time order.
+    """
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    now = datetime.utcnow()
+
+    if global_limit:
+        with db.engine.connect() as conn:
+            running = conn.execute(
+                select(func.count())
+                .select_from(table)
+                .where(and_(table.c.status == STATUS_RUNNING, table.c.locked_until >= now))
+            ).scalar()
+        if running >= global_limit:
+            metrics.incr("admission_pushback")
+            return []
+        limit = min(limit, global_limit - running)
+
+    claim_values = dict(
+        status=STATUS_RUNNING,
+        locked_by=worker_id,
+        locked_until=now + timedelta(seconds=visibility_timeout),
+        attempts=table.c.attempts + 1,
+        started_at=now
+    )
+    order = (table.c.priority, table.c.fire_time, table.c.available_at)
+    if selector:
+        # At most ``limit`` runs per tenant in the window, so a large backlog
+        # of one account cannot push everyone else out of view
+        ranked = (
+            select(
+                table.c.id,
+                func.row_number().over(partition_by=table.c.user_id, order_by=order).label("tenant_rank")
+            )
+            .where(_claimable(table, now))
+            .subquery()
+        )
+        window_ids = select(ranked.c.id).where(ranked.c.tenant_rank <= limit)
+        candidates = (
+            select(table.c.id, table.c.schedule_id, table.c.user_id, table.c.kind, table.c.priority, table.c.fire_time)
+            .where(and_(table.c.id.in_(window_ids), _claimable(table, now)))
+            .order_by(*order)
+            .limit(max(limit, window))
+        )
+    else:
+        candidates = (
+            select(table.c.id, table.c.schedule_id, table.c.user_id, table.c.kind, table.c.priority, table.c.fire_time)
+            .where(_claimable(table, now))
+            .order_by(*order)
+            .limit(limit)
+        )
+
+    claimed_ids = []
+    with db.engine.begin() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        # Locked candidates that are not picked are released again at commit
+        rows = conn.execute(candidates.with_for_update(skip_locked=True) if postgres else candidates).all()
+        # One run per schedule at a time: later fires wait for the running one
+        rows = _serialize_schedules(conn, table, rows, now)
+
+        if selector and rows:
+            user_ids = {row.user_id for row in rows}
+            picked = selector.select(
+                rows, limit,
+                _running_per_user(conn, table, user_ids, now),
+                _plans_per_user(conn, user_ids)
+            )
+            if len(picked) < min(limit, len(rows)):
+                metrics.incr("tenant_cap_pushback")
+            rows = picked
+
+        if postgres:
+            ids = [row.id for row in rows]
+            if ids:
+                conn.execute(table.update().where(table.c.id.in_(ids)).values(**claim_values))
+                claimed_ids = ids
+        else:
+            for row in rows:
+                result = conn.execute(
+                    table.update()
+                    .where(and_(table.c.id == row.id, _claimable(table, now)))
+                    .values(**claim_values)
+                )
+                if result.rowcount:
+                    claimed_ids.append(row.id)
+
+        if not claimed_ids:
+            return []
+
+        rows = conn.execute(
+            select(table).where(table.c.id.in_(claimed_ids)).order_by(table.c.priority, table.c.fire_time)
+        ).mappings().all()
+        return [dict(row) for row in rows]
+
+
+def confirm_claim(run_id: int, worker_id: str, visibility_timeout: int) -> bool:
+    """Check the claim is still held right before a side effect and extend it.
+
+    A worker whose claim expired (and may have been taken over) gets False
+    and must not publish; so does a retry of a run that already published.
+    """
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            table.update()
+            .where(and_(
+                table.c.id == run_id,
+                table.c.status == STATUS_RUNNING,
+                table.c.locked_by == worker_id,
+                table.c.published_at.is_(None)
+            ))
+            .values(locked_until=now + timedelta(seconds=visibility_timeout))
+        )
+    return bool(result.rowcount)
+
+
+def mark_published(run_id: int, worker_id: str) -> bool:
+    """Record right after publishing that the run's post went out.
+
+    Committed on its own, before the results are written back, so a failure
+    after publishing cannot lead to the run being published again.
+    """
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            table.update()
+            .where(and_(table.c.id == run_id, table.c.locked_by == worker_id))
+            .values(published_at=datetime.utcnow())
+        )
+    return bool(result.rowcount)
+
+
+def complete_run(run_id: int, worker_id: str, note: Optional[str] = None) -> bool:
+    """Mark a claimed run done; False if the claim expired and was taken over.
+
+    ``note`` is kept in ``last_error`` (e.g. a write-back that failed after
+    the post was published).
+    """
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            table.update()
+            .where(and_(table.c.id == run_id, table.c.locked_by == worker_id))
+            .values(status=STATUS_DONE, finished_at=datetime.utcnow(), locked_until=None, last_error=note)
+        )
+    return bool(result.rowcount)
+
+
+def fail_run(run: dict, worker_id: str, error: str, retry_delay: int) -> None:
+    """Requeue a failed run with exponential backoff, or give up after max_attempts"""
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    now = datetime.utcnow()
+
+    if run["attempts"] >= run["max_attempts"]:
+        values = dict(status=STATUS_FAILED, finished_at=now, locked_until=None, last_error=error)
+        logger.error(f"Run {run['id']} for schedule {run['schedule_id']} failed permanently: {error}")
+    else:
+        delay = retry_delay * 2 ** (run["attempts"] - 1)
+        values = dict(
+            status=STATUS_QUEUED,
+            available_at=now + timedelta(seconds=delay),
+            locked_by=None,
+            locked_until=None,
+            last_error=error
+        )
+        logger.warning(f"Run {run['id']} for schedule {run['schedule_id']} failed, retrying in {delay}s: {error}")
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            table.update()
+            .where(and_(table.c.id == run["id"], table.c.locked_by == worker_id))
+            .values(**values)
+        )
+
+
+def purge_finished_runs(app, keep_days: Optional[int] = None) -> int:
+    """Delete done/failed runs older than ``keep_days``"""
+    from ..extensions import db
+    from ..models import JobRun
+
+    table = JobRun.__table__
+    with app.app_context():
+        keep_days = keep_days or app.config.get("RUN_QUEUE_RETENTION_DAYS", 7)
+        cutoff = datetime.utcnow() - timedelta(days=keep_days)
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                table.delete().where(and_(
+                    table.c.status.in_((STATUS_DONE, STATUS_FAILED)),
+                    table.c.finished_at < cutoff
+                ))
+            )
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} finished runs older than {keep_days} days")
+        return result.rowcount
+
+
+class QueueWorker:
+    """Claims runs from ``job_run`` and executes them on a thread pool.
+
+    With GENERATION_BACKEND=async the threads only load, publish and write
+    back: a run's generation is submitted to the ``openai_async`` loop and
+    the run resumes on a thread when it is done. Up to
+    RUN_QUEUE_ASYNC_CONCURRENCY runs are then held at once, independent of
+    the number of threads.
+    """
+
+    def __init__(self, app, concurrency: Optional[int] = None):
+        from .pipeline import generation_backend
+
+        self.app = app
+        self.concurrency = concurrency or app.config.get("RUN_QUEUE_CONCURRENCY", 4)
+        self.async_generation = generation_backend(app) == "async"
+        self.capacity = (app.config.get("RUN_QUEUE_ASYNC_CONCURRENCY", 256) if self.async_generation
+                         else self.concurrency)
+        self.poll_interval = app.config.get("RUN_QUEUE_POLL_INTERVAL", 2)
+        self.visibility_timeout = app.config.get("RUN_QUEUE_VISIBILITY_TIMEOUT", 600)
+        self.retry_delay = app.config.get("RUN_QUEUE_RETRY_DELAY", 60)
+        self.global_limit = app.config.get("RUN_QUEUE_GLOBAL_CONCURRENCY", 0)
+        self.claim_window = app.config.get("RUN_QUEUE_CLAIM_WINDOW", 100)
+        self.selector = FairShareSelector()
+        self.metrics_interval = app.config.get("RUN_QUEUE_METRICS_INTERVAL", 60)
+        self.ledger_batch_size = app.config.get("LEDGER_BATCH_SIZE", 50)
+        self.ledger_flush_interval = app.config.get("LEDGER_FLUSH_SECONDS", 5)
+        self.worker_id = make_holder_id()
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="run-worker")
+        self._thread = threading.Thread(target=self._run, name="run-queue", daemon=True)
+        self._thread.start()
+        logger.info(f"Run queue worker {self.worker_id} started with concurrency {self.concurrency}"
+                    + (f", up to {self.capacity} runs in async generation" if self.async_generation else ""))
+
+    def stop(self, wait: bool = False) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if wait and self.async_generation:
+            # Runs waiting on generation still resume on the pool
+            give_up = time.monotonic() + self.visibility_timeout
+            while self._inflight and time.monotonic() < give_up:
+                time.sleep(0.1)
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+        if wait:
+            ledger.flush(self.app)
+
+    def reset_after_fork(self) -> None:
+        """The parent's threads do not exist in a forked child"""
+        self.worker_id = make_holder_id()
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pool = None
+        self.selector = FairShareSelector()
+
+    def wakeup(self) -> None:
+        """Poll right away instead of waiting for the next interval"""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        last_report = last_flush = time.monotonic()
+
+        while not self._stop.is_set():
+            with self._lock:
+                free = self.capacity - self._inflight
+
+            runs = []
+            if free > 0:
+                try:
+                    with self.app.app_context():
+                        runs = claim_runs(
+                            self.worker_id, free, self.visibility_timeout, self.global_limit,
+                            selector=self.selector, window=self.claim_window
+                        )
+                except Exception as e:
+                    logger.error(f"Error claiming runs: {e}")
+
+            if self.metrics_interval and time.monotonic() - last_report >= self.metrics_interval:
+                last_report = time.monotonic()
+                report = metrics.format_snapshot()
+                if report:
+                    logger.info(f"Run queue metrics: {report}")
+
+            # Ledger entries are written in batches, not per run
+            if ledger.pending() >= self.ledger_batch_size or (
+                    ledger.pending() and time.monotonic() - last_flush >= self.ledger_flush_interval):
+                last_flush = time.monotonic()
+                ledger.flush(self.app)
+
+            for run in runs:
+                with self._lock:
+                    self._inflight += 1
+                self._pool.submit(self._execute, run)
+
+            # A full batch means more work is probably waiting
+            if not runs or len(runs) < free:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _execute(self, run: dict) -> None:
+        from .lookahead import pregeneration_stages
+        from .pipeline import run_stages
+        from .scheduler import scheduled_post_stages
+
+        started_at = datetime.utcnow()
+        queue_wait = max(0.0, (started_at - run["available_at"]).total_seconds())
+        start_delay = max(0.0, (started_at - run["fire_time"]).total_seconds())
+        if run["kind"] == KIND_PUBLISH:
+            # Wait caused by admission (queue full) vs. total delay the user sees
+            metrics.observe("run_queue_wait", queue_wait)
+            metrics.observe("run_start_delay", start_delay)
+        state = {
+            "started_at": started_at,
+            "queue_wait": queue_wait,
+            "start_delay": start_delay,
+            "started": time.monotonic(),
+            "report": {},
+        }
+
+        if run["kind"] == KIND_PREGENERATE:
+            stages = pregeneration_stages(run["schedule_id"], self.app, run["fire_time"], report=state["report"])
+        else:
+            stages = scheduled_post_stages(
+                run["schedule_id"], self.app, fire_time=run["fire_time"], report=state["report"],
+                confirm=lambda: confirm_claim(run["id"], self.worker_id, self.visibility_timeout),
+                on_published=lambda: mark_published(run["id"], self.worker_id)
+            )
+
+        if self.async_generation:
+            self._advance(run, state, stages)
+            return
+        try:
+            run_stages(stages, self.app)
+        except Exception as e:
+            self._finish(run, state, e)
+        else:
+            self._finish(run, state)
+
+    def _advance(self, run: dict, state: dict, stages, generation: Optional[Future] = None) -> None:
+        """Resume a run (with its generation result) until it needs content or ends"""
+        from .pipeline import submit_assets
+
+        try:
+            if generation is None:
+                kwargs = next(stages)
+            else:
+                try:
+                    assets = generation.result()
+                except Exception as e:
+                    kwargs = stages.throw(e)
+                else:
+                    kwargs = stages.send(assets)
+        except StopIteration:
+            self._finish(run, state)
+            return
+        except Exception as e:
+            self._finish(run, state, e)
+            return
+
+        # No thread waits for the generation
+        submit_assets(**kwargs).add_done_callback(lambda done: self._resume(run, state, stages, done))
+
+    def _resume(self, run: dict, state: dict, stages, generation: Future) -> None:
+        # Called on the event loop thread: continue on a run thread
+        try:
+            self._pool.submit(self._advance, run, state, stages, generation)
+        except RuntimeError:
+            # Pool shut down: the claim expires and the run is retried elsewhere
+            logger.warning(f"Run {run['id']} finished generating after shutdown, leaving it to be retried")
+            with self._lock:
+                self._inflight -= 1
+
+    def _finish(self, run: dict, state: dict, error: Optional[Exception] = None) -> None:
+        report = state["report"]
+        try:
+            if error is not None:
+                metrics.incr("run_failed")
+                report["outcome"] = "error"
+                report["error"] = str(error)
+                try:
+                    with self.app.app_context():
+                        fail_run(run, self.worker_id, str(error), self.retry_delay)
+                except Exception as db_error:
+                    logger.error(f"Error recording failure of run {run['id']}: {db_error}")
+            else:
+                metrics.incr("run_succeeded")
+                try:
+                    with self.app.app_context():
+                        if not complete_run(run["id"], self.worker_id, note=report.get("error")):
+                            logger.warning(f"Run {run['id']} finished after its claim expired")
+                except Exception as db_error:
+                    logger.error(f"Error completing run {run['id']}: {db_error}")
+        finally:
+            elapsed = time.monotonic() - state["started"]
+            metrics.observe("run_execution", elapsed)
+            timings = report.get("timings") or {}
+            ledger.record({
+                "job_run_id": run["id"],
+                "schedule_id": run["schedule_id"],
+                "user_id": run["user_id"],
+                "kind": run["kind"],
+                "channel": report.get("channel"),
+                "fire_time": run["fire_time"],
+                "started_at": state["started_at"],
+                "finished_at": datetime.utcnow(),
+                "attempt": run.get("attempts"),
+                "queue_wait": state["queue_wait"],
+                "start_delay": state["start_delay"],
+                "text_latency": timings.get("text"),
+                "image_latency": timings.get("image"),
+                "tts_latency": timings.get("tts"),
+                "generation_latency": timings.get("total"),
+                "publish_latency": report.get("publish_latency"),
+                "total_latency": round(elapsed, 3),
+                "pregenerated": report.get("pregenerated"),
+                "http_status": report.get("http_status"),
+                "outcome": report.get("outcome") or "unknown",
+                "error": report.get("error"),
+            })
+            with self._lock:
+                self._inflight -= 1
+            self._wakeup.set()
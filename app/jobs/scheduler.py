@@ -1,23 +1,107 @@
 # file: app/jobs/scheduler.py
 import os
+import hashlib
 import logging
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, update
+from apscheduler.events import EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
 import atexit
+import threading
+from . import metrics
+from .notify import ScheduleChangeListener
+from .fairshare import PRIORITY_MANUAL
+from .catchup import catch_up_missed_runs
+from .ledger import purge_ledger
+from .lookahead import purge_unused_content
+from .oneoff import dispatch_due_posts
+from .run_queue import QueueWorker, admit_runs, enqueue_run, enqueue_runs, jitter_offset, purge_finished_runs
 
 logger = logging.getLogger(__name__)
 scheduler = None
+elector = None
+membership = None
+queue_worker = None
+_change_listener = None
+_app = None
+_deferred = None  # init_scheduler arguments kept for start_after_fork
 
-def init_scheduler(app):
-    """Initialize APScheduler with Flask app context"""
-    global scheduler
+NEXT_RUN_BATCH = 1000  # schedule ids per next_run UPDATE
+
+def init_scheduler(app, triggers=True, executor=True, concurrency=None):
+    """Initialize APScheduler with Flask app context.
+
+    SCHEDULER_MODE selects how triggers are owned:
+    - leader: every process campaigns for a lease, only the leader runs triggers
+    - standalone: this process always runs triggers (single-process setups)
+    - sharded: every process runs the triggers of its segment of the
+      schedule ring (see ``sharding``)
+    - off: no triggers in this process
+
+    Fired triggers only enqueue ``job_run`` rows; unless RUN_QUEUE_CONCURRENCY
+    is 0 every process also runs a queue worker that executes them.
+    ``triggers``/``executor`` let a dedicated worker process run only one role.
+
+    With SCHEDULER_START_AFTER_FORK (gunicorn ``preload_app``) nothing is
+    started here: the master must not hold the lease or fork while threads
+    use the pool, so each worker calls ``start_after_fork`` instead.
+    """
+    global elector, membership, queue_worker, _app, _deferred
     
-    if scheduler is not None:
+    if is_initialized():
         return scheduler
     
+    if app.config.get("SCHEDULER_START_AFTER_FORK"):
+        _deferred = (app, triggers, executor, concurrency)
+        logger.info("Background jobs start in the workers after fork")
+        return scheduler
+    
+    _app = app
+    mode = app.config.get("SCHEDULER_MODE", "leader")
+    
+    if triggers:
+        if mode == "off":
+            logger.info("Scheduler disabled (SCHEDULER_MODE=off)")
+        elif mode == "standalone":
+            start_scheduler(app)
+        elif mode == "sharded":
+            from .sharding import NodeMembership
+            
+            membership = NodeMembership(
+                app,
+                on_change=lambda: _on_ring_change(app),
+                on_lost=stop_scheduler
+            )
+            membership.start()
+        else:
+            from .leader import LeaderElector
+            
+            elector = LeaderElector(
+                app,
+                name="scheduler",
+                on_elected=lambda: start_scheduler(app),
+                on_demoted=stop_scheduler
+            )
+            elector.start()
+    
+    concurrency = concurrency if concurrency is not None else app.config.get("RUN_QUEUE_CONCURRENCY", 4)
+    if executor and concurrency > 0:
+        queue_worker = QueueWorker(app, concurrency=concurrency)
+        queue_worker.start()
+    
+    # gunicorn forks workers from a preloaded app: threads do not survive
+    # the fork, so every child campaigns and works the queue on its own
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    
+    # Shutdown scheduler when app exits
+    atexit.register(shutdown_scheduler)
+    
+    return scheduler
+
+def _build_scheduler(app):
     # Configure job stores and executors
     # Use MemoryJobStore for simpler operation (no pickle issues)
     jobstores = {
@@ -34,117 +118,598 @@ def init_scheduler(app):
         'misfire_grace_time': 300  # 5 minutes
     }
     
-    scheduler = BackgroundScheduler(
+    return BackgroundScheduler(
         executors=executors,
         job_defaults=job_defaults,
-        timezone=os.getenv('SCHEDULER_TIMEZONE', 'Europe/Berlin')
+        timezone=app.config.get('SCHEDULER_TIMEZONE', 'Europe/Berlin')
     )
+
+def start_scheduler(app):
+    """Start firing triggers in this process"""
+    global scheduler, _sync_state, _change_listener
+    
+    if scheduler is not None and scheduler.running:
+        return scheduler
+    
+    # A stopped BackgroundScheduler cannot be restarted, build a fresh one
+    # and sync every schedule into it again
+    scheduler = _build_scheduler(app)
+    _sync_state = ScheduleSyncState()
+    scheduler.add_listener(_on_job_submitted, EVENT_JOB_SUBMITTED)
     
     # Start scheduler
     scheduler.start()
     logger.info("Scheduler started successfully")
     
-    # Add cleanup job that runs every minute to refresh schedules
+    # Changes made in the views arrive as notifications; the periodic refresh
+    # is only a safety reconcile for anything a notification missed
     scheduler.add_job(
         func=refresh_user_schedules,
         trigger='interval',
-        minutes=1,
+        minutes=app.config.get("SCHEDULER_RECONCILE_MINUTES", 10),
         id='refresh_schedules',
         replace_existing=True,
+        next_run_time=datetime.now(timezone.utc),
         kwargs={'app': app}
     )
     
-    # Shutdown scheduler when app exits
-    atexit.register(lambda: scheduler.shutdown())
+    # Keep next_run of fired schedules current between reconciles
+    scheduler.add_job(
+        func=flush_next_runs,
+        trigger='interval',
+        minutes=1,
+        id='flush_next_runs',
+        replace_existing=True,
+        kwargs={'app': app}
+    )
+    
+    # Drop finished queue rows once a day
+    scheduler.add_job(
+        func=purge_finished_runs,
+        trigger='interval',
+        hours=24,
+        id='purge_finished_runs',
+        replace_existing=True,
+        kwargs={'app': app}
+    )
+    scheduler.add_job(
+        func=purge_ledger,
+        trigger='interval',
+        hours=24,
+        id='purge_ledger',
+        replace_existing=True,
+        kwargs={'app': app}
+    )
+    
+    # One-off posts are polled by due time instead of becoming jobs
+    scheduler.add_job(
+        func=dispatch_due_posts,
+        trigger='interval',
+        seconds=app.config.get("ONE_OFF_POLL_SECONDS", 15),
+        id='dispatch_due_posts',
+        replace_existing=True,
+        next_run_time=datetime.now(timezone.utc) + timedelta(seconds=10),
+        kwargs={'app': app}
+    )
+    
+    # Replay runs that fell due while no scheduler was running
+    scheduler.add_job(
+        func=catch_up_missed_runs,
+        trigger='date',
+        run_date=datetime.now(timezone.utc) + timedelta(seconds=10),
+        id='catch_up_missed_runs',
+        replace_existing=True,
+        kwargs={'app': app}
+    )
+    
+    # Generate content for runs due soon, so fire time only publishes
+    if app.config.get("PREGENERATE_LOOKAHEAD_MINUTES", 60):
+        scheduler.add_job(
+            func=plan_pregeneration,
+            trigger='interval',
+            minutes=app.config.get("PREGENERATE_INTERVAL_MINUTES", 5),
+            id='plan_pregeneration',
+            replace_existing=True,
+            next_run_time=datetime.now(timezone.utc) + timedelta(seconds=30),
+            kwargs={'app': app}
+        )
+        scheduler.add_job(
+            func=purge_unused_content,
+            trigger='interval',
+            hours=24,
+            id='purge_unused_content',
+            replace_existing=True,
+            kwargs={'app': app}
+        )
+    
+    _change_listener = ScheduleChangeListener(app, lambda change: apply_schedule_change(app, change))
+    _change_listener.start()
     
     return scheduler
 
-def refresh_user_schedules(app):
-    """Refresh all user schedules - runs every minute"""
+def _on_ring_change(app):
+    """Segments of this node changed: start firing or re-sync the owned schedules"""
+    if not is_scheduler_running():
+        start_scheduler(app)
+        return
+    
+    with _sync_lock:
+        # Full sync against the new segments drops schedules that moved away
+        _sync_state.watermark = None
+    refresh_user_schedules(app)
+    
+    # Replay what the previous owner of newly gained schedules missed
+    scheduler.add_job(
+        func=catch_up_missed_runs,
+        trigger='date',
+        run_date=datetime.now(timezone.utc) + timedelta(seconds=10),
+        id='catch_up_missed_runs',
+        replace_existing=True,
+        kwargs={'app': app}
+    )
+
+def stop_scheduler():
+    """Stop firing triggers in this process (e.g. after losing leadership)"""
+    global scheduler, _change_listener
+    
+    if _change_listener is not None:
+        _change_listener.stop()
+        _change_listener = None
+    
+    if scheduler is None:
+        return
+    
+    try:
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
+            logger.info("Scheduler stopped")
+    except Exception as e:
+        logger.error(f"Error stopping scheduler: {e}")
+    finally:
+        scheduler = None
+
+def is_initialized():
+    return scheduler is not None or elector is not None or membership is not None or queue_worker is not None
+
+def shutdown_scheduler(wait=False):
+    """Stop triggers and hand the leader lease back on process exit.
+
+    With ``wait`` the queue worker finishes its in-flight runs first.
+    """
+    if queue_worker is not None:
+        queue_worker.stop(wait=wait)
+    if elector is not None:
+        elector.stop()
+    if membership is not None:
+        membership.stop()
+    stop_scheduler()
+
+def _dispose_pool(app):
+    # Pooled connections are the parent's sockets; the child opens its own
+    from ..extensions import db
+    
     with app.app_context():
-        try:
-            from ..models import Schedule, User
-            
-            # Get all active schedules
-            active_schedules = Schedule.query.filter_by(active=True).all()
-            
-            # Get current job IDs
-            current_jobs = {job.id for job in scheduler.get_jobs()}
-            
-            # Expected job IDs based on active schedules
-            expected_jobs = {f"schedule_{s.id}" for s in active_schedules}
-            expected_jobs.add("refresh_schedules")  # Don't remove the refresh job
+        db.engine.dispose(close=False)
+
+def start_after_fork():
+    """Start the background jobs deferred by ``init_scheduler`` (gunicorn post_fork)"""
+    global _deferred
+    
+    if _deferred is None:
+        return
+    app, triggers, executor, concurrency = _deferred
+    _deferred = None
+    _dispose_pool(app)
+    app.config["SCHEDULER_START_AFTER_FORK"] = False
+    init_scheduler(app, triggers=triggers, executor=executor, concurrency=concurrency)
+
+def _restart_after_fork():
+    global scheduler, _change_listener
+    
+    # The parent's scheduler, listener and worker threads do not exist in the child
+    scheduler = None
+    _change_listener = None
+    
+    if _app is not None:
+        _dispose_pool(_app)
+    
+    if elector is not None:
+        elector.reset_after_fork()
+        elector.start()
+    
+    if membership is not None:
+        membership.reset_after_fork()
+        membership.start()
+    
+    if queue_worker is not None:
+        queue_worker.reset_after_fork()
+        queue_worker.start()
+
+def is_scheduler_running():
+    return scheduler is not None and scheduler.running
+
+class ScheduleSyncState:
+    """What the running scheduler currently knows about the Schedule table.
+
+    Schedules sharing (cron expression, timezone) form a cohort served by a
+    single APScheduler job, so job count and wakeups follow the number of
+    distinct expressions. ``versions`` maps schedule id to the
+    ``Schedule.version`` its membership was built from, ``members`` maps it
+    to its cohort job, ``cohorts`` maps a cohort job to its schedules and
+    ``watermark`` is when the previous sync read the table.
+    """
+    
+    def __init__(self):
+        self.versions = {}
+        self.members = {}
+        self.cohorts = {}  # job id -> {schedule id: (user id, jitter seconds, overlap policy)}
+        self.watermark = None
+        self.fired = set()  # cohort job ids that fired since the last flush
+
+_sync_state = ScheduleSyncState()
+_sync_lock = threading.RLock()
+
+def _on_job_submitted(event):
+    if event.job_id.startswith("cron_"):
+        _sync_state.fired.add(event.job_id)
+
+def build_cron_trigger(schedule):
+    """Compiled CronTrigger for a schedule, None if the expression is invalid"""
+    from .cron import CronExpressionError, get_trigger
+    
+    try:
+        return get_trigger(schedule.cron_expression, schedule.timezone or 'Europe/Berlin')
+    except CronExpressionError as e:
+        logger.error(f"Invalid CRON expression for schedule {schedule.id}: {schedule.cron_expression} ({e})")
+        return None
+
+def cohort_job_id(cron_expression, tz):
+    """Job id shared by all schedules with this (expression, timezone)"""
+    key = f"{' '.join(cron_expression.split())}|{tz or 'Europe/Berlin'}"
+    return "cron_" + hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def _leave_cohort(schedule_id):
+    """Drop a schedule from its cohort, removing the job with the last member"""
+    state = _sync_state
+    job_id = state.members.pop(schedule_id, None)
+    if job_id is None:
+        return
+    
+    cohort = state.cohorts.get(job_id)
+    if cohort is not None:
+        cohort.pop(schedule_id, None)
+        if cohort:
+            return
+        del state.cohorts[job_id]
+    
+    try:
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+            logger.info(f"Removed cohort job without schedules: {job_id}")
+    except Exception as e:
+        logger.error(f"Error removing job {job_id}: {e}")
+
+def _next_run_value(job_id):
+    job = scheduler.get_job(job_id)
+    if job and job.next_run_time:
+        return job.next_run_time.replace(tzinfo=None)
+    return None
+
+def _apply_schedule(schedule, app, next_runs):
+    """Bring the cohort membership of one schedule in line with its row (caller holds _sync_lock)"""
+    state = _sync_state
+    
+    if state.versions.get(schedule.id) == schedule.version:
+        return
+    
+    if not schedule.active or schedule.due_at is not None:
+        # Inactive, or a one-off post (polled by due time, see oneoff.py)
+        _leave_cohort(schedule.id)
+        state.versions.pop(schedule.id, None)
+        return
+    
+    try:
+        trigger = build_cron_trigger(schedule)
+        if trigger is None:
+            _leave_cohort(schedule.id)
+        else:
+            job_id = cohort_job_id(schedule.cron_expression, schedule.timezone)
+            if state.members.get(schedule.id) != job_id:
+                _leave_cohort(schedule.id)
             
-            # Remove jobs that are no longer active
-            jobs_to_remove = current_jobs - expected_jobs
-            for job_id in jobs_to_remove:
-                try:
-                    scheduler.remove_job(job_id)
-                    logger.info(f"Removed inactive job: {job_id}")
-                except Exception as e:
-                    logger.error(f"Error removing job {job_id}: {e}")
+            if job_id not in state.cohorts:
+                scheduler.add_job(
+                    func=dispatch_cohort,
+                    trigger=trigger,
+                    id=job_id,
+                    name=f"{schedule.cron_expression} ({schedule.timezone or 'Europe/Berlin'})",
+                    kwargs={'cohort_id': job_id, 'app': app},
+                    replace_existing=True
+                )
+                state.cohorts[job_id] = {}
             
-            # Add/update active schedules
-            for schedule in active_schedules:
-                job_id = f"schedule_{schedule.id}"
+            state.cohorts[job_id][schedule.id] = (schedule.user_id, _jitter_window(schedule, app), schedule.overlap_policy)
+            state.members[schedule.id] = job_id
+            next_runs.setdefault(job_id, set()).add(schedule.id)
+        
+        # Remember invalid expressions too, they are retried once edited
+        state.versions[schedule.id] = schedule.version
+    
+    except Exception as e:
+        logger.error(f"Error scheduling job for schedule {schedule.id}: {e}")
+
+def _write_next_runs(next_runs):
+    """Copy each cohort job's next run time to its schedules (``next_runs``: job id -> schedule ids)"""
+    from ..models import Schedule
+    from ..extensions import db
+    
+    for job_id, schedule_ids in next_runs.items():
+        next_run = _next_run_value(job_id)
+        schedule_ids = list(schedule_ids)
+        for start in range(0, len(schedule_ids), NEXT_RUN_BATCH):
+            db.session.execute(
+                update(Schedule)
+                .where(Schedule.id.in_(schedule_ids[start:start + NEXT_RUN_BATCH]))
+                .values(next_run=next_run)
+                .execution_options(synchronize_session=False)
+            )
+    db.session.commit()
+
+def refresh_user_schedules(app):
+    """Reconcile scheduler jobs with the Schedule table.
+
+    Only schedules whose ``updated_at`` passed the watermark are rebuilt, so
+    the cost of a tick follows the number of changes, not of schedules.
+    """
+    from ..models import Schedule
+    from ..extensions import db
+    from .sharding import ownership_filter
+    
+    with app.app_context():
+        try:
+            with _sync_lock:
+                state = _sync_state
+                synced_at = datetime.utcnow()
+                full_sync = state.watermark is None
+                # All schedules, or in sharded mode those in this node's segments
+                owned = ownership_filter(Schedule.shard_key)
                 
-                try:
-                    # Parse CRON expression
-                    cron_parts = schedule.cron_expression.strip().split()
-                    if len(cron_parts) != 5:
-                        logger.error(f"Invalid CRON expression for schedule {schedule.id}: {schedule.cron_expression}")
-                        continue
-                    
-                    minute, hour, day, month, day_of_week = cron_parts
-                    
-                    # Create CRON trigger
-                    trigger = CronTrigger(
-                        minute=minute,
-                        hour=hour,
-                        day=day,
-                        month=month,
-                        day_of_week=day_of_week,
-                        timezone=schedule.timezone or 'Europe/Berlin'
-                    )
-                    
-                    # Add or replace job
-                    scheduler.add_job(
-                        func=execute_scheduled_post,
-                        trigger=trigger,
-                        id=job_id,
-                        kwargs={'schedule_id': schedule.id, 'app': app},
-                        replace_existing=True
-                    )
-                    
-                    # Update next run time
-                    job = scheduler.get_job(job_id)
-                    if job and job.next_run_time:
-                        schedule.next_run = job.next_run_time.replace(tzinfo=None)
-                        from ..extensions import db
-                        db.session.commit()
+                # One-off posts never become jobs
+                owned = and_(owned, Schedule.due_at.is_(None))
                 
-                except Exception as e:
-                    logger.error(f"Error scheduling job for schedule {schedule.id}: {e}")
+                if full_sync:
+                    # First sync after (re)start or ring change: load every active schedule
+                    changed = Schedule.query.filter(Schedule.active.is_(True), owned).all()
+                else:
+                    # Re-read a short overlap window so rows written by a clock-skewed
+                    # node or a long transaction are not missed; unchanged versions
+                    # are skipped
+                    overlap = timedelta(seconds=app.config.get("SCHEDULER_SYNC_OVERLAP", 120))
+                    changed = Schedule.query.filter(Schedule.updated_at >= state.watermark - overlap, owned).all()
+                
+                next_runs = {}
+                for schedule in changed:
+                    _apply_schedule(schedule, app, next_runs)
+                
+                state.watermark = synced_at
+                
+                # Deleted rows leave no updated_at behind; a cheap count tells whether
+                # any vanished before paying for an id diff
+                if full_sync:
+                    active_ids = {schedule.id for schedule in changed if schedule.active}
+                elif Schedule.query.filter(Schedule.active.is_(True), owned).count() != len(state.versions):
+                    active_ids = {row.id for row in db.session.query(Schedule.id).filter(Schedule.active.is_(True), owned)}
+                else:
+                    active_ids = None
+                if active_ids is not None:
+                    for schedule_id in set(state.versions) - active_ids:
+                        _leave_cohort(schedule_id)
+                        state.versions.pop(schedule_id, None)
+                
+                _write_next_runs(next_runs)
         
         except Exception as e:
             logger.error(f"Error in refresh_user_schedules: {e}")
+            db.session.rollback()
 
-def execute_scheduled_post(schedule_id, app):
-    """Execute a scheduled social media post"""
+def apply_schedule_change(app, change):
+    """Apply one add/update/remove notification from the views immediately"""
+    from ..models import Schedule
+    from ..extensions import db
+    from .sharding import owns
+    
+    schedule_id = change.get("id")
+    if schedule_id is None:
+        return
+    
     with app.app_context():
         try:
-            from ..models import Schedule, User, GeneratedContent
-            from ..extensions import db
-            from ..openai_service import build_system_prompt, generate_post_text, generate_image_b64
-            from ..publishers.telegram_publisher import TelegramPublisher
-            from ..publishers.linkedin_publisher import LinkedInPublisher
-            from ..publishers.meta_publisher import FacebookPublisher, InstagramPublisher
-            
+            with _sync_lock:
+                if not is_scheduler_running():
+                    return
+                
+                schedule = None
+                if change.get("action") != "remove":
+                    schedule = Schedule.query.get(schedule_id)
+                    if schedule is not None and not owns(schedule.shard_key):
+                        # Another node's segment
+                        schedule = None
+                
+                if schedule is None:
+                    _leave_cohort(schedule_id)
+                    _sync_state.versions.pop(schedule_id, None)
+                    db.session.commit()
+                    return
+                
+                next_runs = {}
+                _apply_schedule(schedule, app, next_runs)
+                _write_next_runs(next_runs)
+                logger.info(f"Applied schedule change: {change}")
+        
+        except Exception as e:
+            logger.error(f"Error applying schedule change {change}: {e}")
+            db.session.rollback()
+
+def flush_next_runs(app):
+    """Write next_run for schedules whose job fired since the last flush"""
+    from ..extensions import db
+    
+    with app.app_context():
+        try:
+            with _sync_lock:
+                # The job listener adds without taking _sync_lock, so drain the
+                # set in place instead of swapping it out
+                next_runs = {}
+                while _sync_state.fired:
+                    job_id = _sync_state.fired.pop()
+                    cohort = _sync_state.cohorts.get(job_id)
+                    if cohort:
+                        next_runs[job_id] = set(cohort)
+                _write_next_runs(next_runs)
+        
+        except Exception as e:
+            logger.error(f"Error in flush_next_runs: {e}")
+            db.session.rollback()
+
+def _jitter_window(schedule, app):
+    if schedule.jitter_seconds is not None:
+        return schedule.jitter_seconds
+    return app.config.get("SCHEDULER_DEFAULT_JITTER_SECONDS", 0)
+
+def _nominal_fire_time(cohort_id):
+    """Scheduled fire time (naive UTC) of the cohort job that is firing now.
+
+    A node that fires late (within the misfire grace time) must queue the
+    same fire time as a node that fired on time, otherwise the unique index
+    on job_run cannot recognize the duplicate.
+    """
+    now = datetime.now(timezone.utc)
+    job = scheduler.get_job(cohort_id) if scheduler is not None else None
+    nominal = None
+    if job is not None:
+        grace = job.misfire_grace_time or 0
+        next_fire = job.trigger.get_next_fire_time(None, now - timedelta(seconds=grace + 60))
+        while next_fire is not None and next_fire <= now:
+            nominal = next_fire
+            next_fire = job.trigger.get_next_fire_time(next_fire, next_fire)
+    if nominal is None:
+        # Cron fires on minute boundaries, so the truncated time identifies the run
+        return now.replace(tzinfo=None, second=0, microsecond=0)
+    return nominal.astimezone(timezone.utc).replace(tzinfo=None)
+
+def dispatch_cohort(cohort_id, app):
+    """Trigger callback: queue a run for every schedule of the cohort.
+
+    Each run becomes claimable at a per-schedule offset inside its jitter
+    window, so cohorts sharing a popular cron time are spread out. Schedules
+    whose previous run is still active are handled per overlap policy.
+    """
+    # Copy without _sync_lock: a long sync must not delay firing
+    members = dict(_sync_state.cohorts.get(cohort_id, {}))
+    if not members:
+        return
+    
+    with app.app_context():
+        try:
+            fire_time = _nominal_fire_time(cohort_id)
+            runs = admit_runs([
+                {
+                    "schedule_id": schedule_id,
+                    "user_id": user_id,
+                    "fire_time": fire_time,
+                    "available_at": fire_time + jitter_offset(schedule_id, fire_time, jitter_seconds),
+                }
+                for schedule_id, (user_id, jitter_seconds, _) in members.items()
+            ], {schedule_id: member[2] for schedule_id, member in members.items()})
+            enqueue_runs(runs)
+        except Exception as e:
+            logger.error(f"Error enqueueing runs for cohort {cohort_id} ({len(members)} schedules): {e}")
+            return
+    
+    if queue_worker is not None:
+        queue_worker.wakeup()
+
+def plan_pregeneration(app):
+    """Queue pre-generation for runs due within PREGENERATE_LOOKAHEAD_MINUTES"""
+    from ..extensions import db
+    from .lookahead import queue_pregeneration, upcoming_fire_times
+    from .oneoff import upcoming_one_offs
+    
+    if scheduler is None:
+        return
+    
+    horizon = datetime.now(timezone.utc) + timedelta(minutes=app.config.get("PREGENERATE_LOOKAHEAD_MINUTES", 60))
+    due = []
+    for job in scheduler.get_jobs():
+        members = dict(_sync_state.cohorts.get(job.id, {}))
+        if not members:
+            continue
+        for fire_time in upcoming_fire_times(job, horizon):
+            due.extend((schedule_id, member[0], fire_time) for schedule_id, member in members.items())
+    
+    with app.app_context():
+        try:
+            due.extend(upcoming_one_offs(horizon.replace(tzinfo=None)))
+            queued = queue_pregeneration(due)
+            if queued:
+                logger.info(f"Queued pre-generation for {queued} upcoming runs")
+        except Exception as e:
+            logger.error(f"Error planning pre-generation: {e}")
+            db.session.rollback()
+            return
+    
+    if queued and queue_worker is not None:
+        queue_worker.wakeup()
+
+def execute_scheduled_post(schedule_id, app, fire_time=None, report=None, confirm=None, on_published=None):
+    """Execute a scheduled social media post.
+
+    The run gets RUN_DEADLINE_SECONDS for generating and publishing; OpenAI
+    and publisher requests time out when it is used up, and an image or
+    voice that is not ready PUBLISH_RESERVE_SECONDS before the deadline is
+    left out so the text still goes out in time.
+    Everything the run needs is loaded first and the session's connection
+    is returned to the pool before generating and publishing; the results
+    are written back in a short transaction afterwards.
+    Errors are logged and re-raised so the queue worker can retry the run.
+    ``report`` (a dict) receives channel, stage timings, publish latency,
+    HTTP status and outcome for the run ledger. ``confirm`` is called right
+    before publishing; if it returns False the run was taken over by another
+    worker and nothing is published. ``on_published`` is called as soon as
+    the post went out; once it has, errors writing back are logged and
+    reported but not raised, so the run is not retried and published again.
+    """
+    from .pipeline import run_stages
+    
+    return run_stages(scheduled_post_stages(schedule_id, app, fire_time, report, confirm, on_published), app)
+
+def scheduled_post_stages(schedule_id, app, fire_time=None, report=None, confirm=None, on_published=None):
+    """``execute_scheduled_post`` as stages (see ``pipeline.run_stages``).
+
+    Yields the generation arguments unless the content was pre-generated;
+    loading and writing back each run in their own app context, so the
+    queue worker can resume the run on another thread.
+    """
+    from ..models import Schedule, User, GeneratedContent
+    from ..extensions import db, release_connection
+    from ..deadline import Deadline
+    from .lookahead import find_pregenerated
+    from ..publishers.telegram_publisher import TelegramPublisher
+    from ..publishers.linkedin_publisher import LinkedInPublisher
+    from ..publishers.meta_publisher import FacebookPublisher, InstagramPublisher
+    
+    report = report if report is not None else {}
+    report["outcome"] = "skipped"
+    
+    with app.app_context():
+        deadline = Deadline(app.config.get("RUN_DEADLINE_SECONDS", 240))
+        try:
             # Get schedule and user
             schedule = Schedule.query.get(schedule_id)
             if not schedule or not schedule.active:
                 logger.warning(f"Schedule {schedule_id} not found or inactive")
                 return
+            report["channel"] = schedule.channel
             
             user = User.query.get(schedule.user_id)
             if not user or not user.is_active:
@@ -153,134 +718,202 @@ def execute_scheduled_post(schedule_id, app):
             
             logger.info(f"Executing scheduled post for user {user.email}, schedule {schedule.id}")
             
-            # Check if user has OpenAI API key
-            if not user.openai_api_key and not os.getenv("OPENAI_API_KEY"):
+            content = find_pregenerated(schedule, fire_time) if fire_time else None
+            if content is None and not user.openai_api_key and not os.getenv("OPENAI_API_KEY"):
                 logger.error(f"No OpenAI API key configured for user {user.email}")
                 raise ValueError("OpenAI API key not configured")
             
-            # Build system prompt
-            system_prompt = build_system_prompt(user.openai_system_prompt, schedule.channel)
-            
-            # Generate content
-            text_content = generate_post_text(
-                topic=schedule.content_template,
-                channel=schedule.channel,
-                system_prompt=system_prompt,
-                user_api_key=user.openai_api_key
-            )
-            
-            # Generate image if requested
-            image_b64 = None
-            if schedule.generate_image:
-                image_b64 = generate_image_b64(
-                    topic=schedule.content_template,
-                    channel=schedule.channel,
-                    user_api_key=user.openai_api_key
-                )
-            
-            # Save generated content
-            content = GeneratedContent(
-                user_id=user.id,
-                schedule_id=schedule.id,
-                text_content=text_content,
-                channel=schedule.channel
-            )
-            db.session.add(content)
-            
-            # Publish to channel
+            # Publisher for the channel
             publisher = None
+            not_configured = None
             if schedule.channel == "telegram":
                 if not user.telegram_token or not user.telegram_chat_id:
                     logger.warning(f"Telegram not configured for user {user.email}. Content generated but not published.")
-                    content.publication_response = "Telegram ist nicht konfiguriert. Content wurde nur generiert."
+                    not_configured = "Telegram ist nicht konfiguriert. Content wurde nur generiert."
                 else:
                     config = {
                         "bot_token": user.telegram_token,
                         "chat_id": user.telegram_chat_id
                     }
-                    publisher = TelegramPublisher(config)
+                    publisher = TelegramPublisher(config, deadline=deadline)
             
             elif schedule.channel == "linkedin":
                 if not user.linkedin_access_token or not user.linkedin_urn:
                     logger.warning(f"LinkedIn not configured for user {user.email}. Content generated but not published.")
-                    content.publication_response = "LinkedIn ist nicht konfiguriert. Content wurde nur generiert."
+                    not_configured = "LinkedIn ist nicht konfiguriert. Content wurde nur generiert."
                 else:
                     config = {
                         "access_token": user.linkedin_access_token,
                         "urn": user.linkedin_urn
                     }
-                    publisher = LinkedInPublisher(config)
+                    publisher = LinkedInPublisher(config, deadline=deadline)
             
             elif schedule.channel == "facebook":
                 if not user.meta_access_token or not user.facebook_page_id:
                     logger.warning(f"Facebook not configured for user {user.email}. Content generated but not published.")
-                    content.publication_response = "Facebook ist nicht konfiguriert. Content wurde nur generiert."
+                    not_configured = "Facebook ist nicht konfiguriert. Content wurde nur generiert."
                 else:
                     config = {
                         "access_token": user.meta_access_token,
                         "page_id": user.facebook_page_id
                     }
-                    publisher = FacebookPublisher(config)
+                    publisher = FacebookPublisher(config, deadline=deadline)
             
             elif schedule.channel == "instagram":
                 if not user.meta_access_token or not user.instagram_business_id:
                     logger.warning(f"Instagram not configured for user {user.email}. Content generated but not published.")
-                    content.publication_response = "Instagram ist nicht konfiguriert. Content wurde nur generiert."
+                    not_configured = "Instagram ist nicht konfiguriert. Content wurde nur generiert."
                 else:
                     config = {
                         "access_token": user.meta_access_token,
                         "instagram_id": user.instagram_business_id
                     }
-                    publisher = InstagramPublisher(config)
+                    publisher = InstagramPublisher(config, deadline=deadline)
+            
+            # No transaction is open while OpenAI and the platform are called
+            release_connection()
+        
+        except Exception as e:
+            logger.error(f"Error executing scheduled post {schedule_id}: {e}")
+            db.session.rollback()
+            raise
+    
+    if content is not None:
+        metrics.incr("pregenerated_hit")
+        report["pregenerated"] = True
+        logger.info(f"Using pre-generated content {content.id} for schedule {schedule.id}")
+        text_content = content.text_content
+        image_b64 = content.image_b64
+        voice_bytes = content.voice_data
+    else:
+        metrics.incr("pregenerated_miss")
+        report["pregenerated"] = False
+        
+        # Generate text, image and voice (independent stages run concurrently)
+        try:
+            assets = yield dict(
+                topic=schedule.content_template,
+                channel=schedule.channel,
+                user_system_prompt=user.openai_system_prompt,
+                user_api_key=user.openai_api_key,
+                with_image=bool(schedule.generate_image),
+                with_voice=bool(schedule.generate_voice),
+                deadline=deadline,
+                reserve=app.config.get("PUBLISH_RESERVE_SECONDS", 30)
+            )
+        except Exception as e:
+            logger.error(f"Error executing scheduled post {schedule_id}: {e}")
+            raise
+        text_content = assets["text"]
+        image_b64 = assets["image_b64"]
+        voice_bytes = assets["voice_bytes"]
+        report["timings"] = assets["timings"]
+        if assets["dropped"]:
+            report["error"] = "; ".join(
+                f"Dropped {stage}: {assets['errors'][stage]}" if stage in assets["errors"]
+                else f"Dropped {stage} to meet the run deadline"
+                for stage in assets["dropped"]
+            )
+        logger.info(f"Generation timings for schedule {schedule.id}: {assets['timings']}")
+        
+        content = GeneratedContent(
+            user_id=user.id,
+            schedule_id=schedule.id,
+            text_content=text_content,
+            channel=schedule.channel
+        )
+    
+    published = False
+    with app.app_context():
+        try:
+            if publisher and confirm is not None and not confirm():
+                logger.warning(f"Claim on run of schedule {schedule.id} at {fire_time} was lost, not publishing")
+                metrics.incr("claim_lost")
+                report["outcome"] = "claim_lost"
+                return
             
             if publisher:
+                publish_started = time.monotonic()
                 try:
                     result = publisher.publish(
                         content_type=schedule.content_type,
                         text=text_content,
-                        image_b64=image_b64
+                        image_b64=image_b64,
+                        voice_bytes=voice_bytes
                     )
+                    report["publish_latency"] = round(time.monotonic() - publish_started, 3)
+                    report["http_status"] = result.get("status")
                     
                     if result.get("success"):
+                        published = True
+                        report["outcome"] = "published"
                         content.published = True
                         content.published_at = datetime.utcnow()
                         content.publication_response = str(result)
+                        # Media was only kept to be published
+                        content.image_b64 = None
+                        content.voice_data = None
                         logger.info(f"Successfully published scheduled post for user {user.email}")
                     else:
                         logger.error(f"Failed to publish scheduled post for user {user.email}: {result.get('error')}")
                         content.publication_response = f"Error: {result.get('error')}"
+                        report["outcome"] = "publish_failed"
+                        report["error"] = str(result.get("error"))
                 
                 except Exception as e:
                     logger.error(f"Exception publishing scheduled post for user {user.email}: {e}")
                     content.publication_response = f"Exception: {str(e)}"
+                    report["publish_latency"] = round(time.monotonic() - publish_started, 3)
+                    report["outcome"] = "publish_failed"
+                    report["error"] = str(e)
+                
+                if published and on_published is not None:
+                    on_published()
             else:
-                logger.warning(f"No publisher configured for {schedule.channel} for user {user.email}")
-                content.publication_response = f"No publisher configured for {schedule.channel}"
+                report["outcome"] = "not_configured"
+                if not not_configured:
+                    logger.warning(f"No publisher configured for {schedule.channel} for user {user.email}")
+                content.publication_response = not_configured or f"No publisher configured for {schedule.channel}"
             
-            # Update schedule last run time
+            # Write back: the detached schedule and content only carry this run's changes
             schedule.last_run = datetime.utcnow()
-            
+            if schedule.due_at is not None:
+                # One-off post is done
+                schedule.active = False
+            db.session.add(schedule)
+            db.session.add(content)
             db.session.commit()
             
         except Exception as e:
-            logger.error(f"Error executing scheduled post {schedule_id}: {e}")
+            db.session.rollback()
+            if not published:
+                logger.error(f"Error executing scheduled post {schedule_id}: {e}")
+                raise
+            # The post is out: retrying the run would publish it again
+            logger.error(f"Schedule {schedule_id} published, but writing back failed: {e}")
+            metrics.incr("writeback_failed")
+            report["error"] = f"Published, but writing back failed: {e}"
 
-def schedule_job(schedule_id):
-    """Manually trigger a scheduled job"""
-    if scheduler is None:
-        logger.error("Scheduler not initialized")
-        return False
+def schedule_job(schedule_id, app=None):
+    """Manually trigger a scheduled job by queueing an immediate run"""
+    from flask import current_app
+    from ..models import Schedule
     
-    job_id = f"schedule_{schedule_id}"
-    job = scheduler.get_job(job_id)
+    app = app or current_app._get_current_object()
     
-    if job:
+    with app.app_context():
         try:
-            job.modify(next_run_time=datetime.now())
-            return True
+            schedule = Schedule.query.get(schedule_id)
+            if schedule is None:
+                logger.error(f"Schedule {schedule_id} not found")
+                return False
+            
+            # Someone is waiting on the result: ahead of background runs
+            enqueue_run(schedule.id, schedule.user_id, datetime.utcnow(), priority=PRIORITY_MANUAL)
         except Exception as e:
-            logger.error(f"Error triggering job {job_id}: {e}")
+            logger.error(f"Error queueing manual run for schedule {schedule_id}: {e}")
             return False
-    else:
-        logger.error(f"Job {job_id} not found")
-        return False
\ No newline at end of file
+    
+    if queue_worker is not None:
+        queue_worker.wakeup()
+    return True
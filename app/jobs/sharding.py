@@ -0,0 +1,229 @@
+# file: app/jobs/sharding.py
+"""Sharded scheduling: every scheduler node fires triggers for a slice of schedules.
+
+With SCHEDULER_MODE=sharded there is no single leader. Each scheduler
+process keeps a heartbeat row in ``scheduler_node``; the live rows form a
+consistent-hash ring with SCHEDULER_VIRTUAL_NODES points per node over the
+``Schedule.shard_key`` space (a hash of ``user_id``, so a tenant's schedules
+stay together). A node only syncs and fires the schedules whose key falls in
+its segments. When a node joins or its heartbeat expires, every node
+recomputes the ring and only the segments next to the changed points move;
+the new owner replays runs missed in between (see ``catchup``) and the
+unique index on ``job_run`` absorbs the short overlap while nodes disagree.
+"""
+import bisect
+import logging
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import false, or_, select, true
+from sqlalchemy.exc import IntegrityError
+
+from .leader import make_holder_id
+
+logger = logging.getLogger(__name__)
+
+SHARD_SPACE = 1 << 16
+_HASH_MULTIPLIER = 2654435761  # Knuth's multiplicative hash; also computed in SQL by the migration
+
+Range = Tuple[int, int]
+
+# Segments owned by this process, None when not running sharded (owns everything)
+_owned_ranges: Optional[List[Range]] = None
+
+
+def shard_key(user_id: int) -> int:
+    return (user_id * _HASH_MULTIPLIER) % SHARD_SPACE
+
+
+def owned_ranges() -> Optional[List[Range]]:
+    return _owned_ranges
+
+
+def owns(key: Optional[int]) -> bool:
+    ranges = _owned_ranges
+    if ranges is None:
+        return True
+    return key is not None and any(low <= key <= high for low, high in ranges)
+
+
+def ownership_filter(column):
+    """SQL condition selecting the rows this process owns"""
+    ranges = _owned_ranges
+    if ranges is None:
+        return true()
+    if not ranges:
+        return false()
+    return or_(*(column.between(low, high) for low, high in ranges))
+
+
+class HashRing:
+    """Consistent-hash ring over [0, SHARD_SPACE) with virtual nodes"""
+
+    def __init__(self, nodes: Sequence[str], virtual_nodes: int = 64):
+        points = {}
+        for node in sorted(nodes):
+            for replica in range(virtual_nodes):
+                position = zlib.crc32(f"{node}#{replica}".encode()) % SHARD_SPACE
+                # On a collision the smaller node id keeps the point on every node
+                points.setdefault(position, node)
+        self._positions = sorted(points)
+        self._owners = [points[position] for position in self._positions]
+
+    def owner(self, key: int) -> Optional[str]:
+        if not self._positions:
+            return None
+        index = bisect.bisect_left(self._positions, key) % len(self._positions)
+        return self._owners[index]
+
+    def ranges(self, node: str) -> List[Range]:
+        """Key ranges (inclusive) owned by ``node``, merged and sorted"""
+        ranges = []
+        for index, (position, owner) in enumerate(zip(self._positions, self._owners)):
+            if owner != node:
+                continue
+            # A point owns the keys after the previous point up to itself
+            previous = self._positions[index - 1] if index else self._positions[-1] - SHARD_SPACE
+            low = previous + 1
+            if low < 0:
+                ranges.append((low + SHARD_SPACE, SHARD_SPACE - 1))
+                low = 0
+            ranges.append((low, position))
+
+        merged = []
+        for low, high in sorted(ranges):
+            if merged and low <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+            else:
+                merged.append((low, high))
+        return merged
+
+
+def _share(ranges: List[Range]) -> float:
+    return sum(high - low + 1 for low, high in ranges) / SHARD_SPACE
+
+
+class NodeMembership:
+    """Heartbeat in ``scheduler_node`` and follow the ring of live nodes.
+
+    ``on_change`` runs whenever this node's segments change (including the
+    first heartbeat), ``on_lost`` when the heartbeat failed for so long that
+    other nodes will have taken the segments over.
+    """
+
+    def __init__(self, app, on_change: Optional[Callable[[], None]] = None,
+                 on_lost: Optional[Callable[[], None]] = None):
+        self.app = app
+        self.on_change = on_change
+        self.on_lost = on_lost
+        self.ttl = app.config.get("SCHEDULER_LEASE_TTL", 30)
+        self.heartbeat_interval = app.config.get("SCHEDULER_HEARTBEAT_INTERVAL", 10)
+        self.virtual_nodes = app.config.get("SCHEDULER_VIRTUAL_NODES", 64)
+        self.node_id = make_holder_id()
+        self.nodes: List[str] = []
+        self._renewed_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-membership", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Leave the ring so the other nodes take over right away"""
+        global _owned_ranges
+
+        self._stop.set()
+        _owned_ranges = None
+        try:
+            from ..extensions import db
+            from ..models import SchedulerNode
+
+            table = SchedulerNode.__table__
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(table.delete().where(table.c.node_id == self.node_id))
+        except Exception as e:
+            logger.error(f"Error leaving scheduler ring: {e}")
+
+    def reset_after_fork(self) -> None:
+        """The child is a new node; the parent keeps its own row"""
+        global _owned_ranges
+
+        _owned_ranges = None
+        self.node_id = make_holder_id()
+        self.nodes = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def heartbeat(self) -> List[str]:
+        """Renew our row and return the ids of all live nodes"""
+        from ..extensions import db
+        from ..models import SchedulerNode
+
+        table = SchedulerNode.__table__
+        now = datetime.utcnow()
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                result = conn.execute(
+                    table.update().where(table.c.node_id == self.node_id).values(heartbeat_at=now)
+                )
+                if not result.rowcount:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(table.insert().values(node_id=self.node_id, started_at=now, heartbeat_at=now))
+                    except IntegrityError:
+                        pass
+                    logger.info(f"Scheduler node {self.node_id} joined the ring")
+
+                # Rows of nodes that died long ago
+                conn.execute(table.delete().where(table.c.heartbeat_at < now - timedelta(seconds=10 * self.ttl)))
+
+                return sorted(conn.execute(
+                    select(table.c.node_id).where(table.c.heartbeat_at >= now - timedelta(seconds=self.ttl))
+                ).scalars())
+
+    def _run(self) -> None:
+        global _owned_ranges
+
+        while not self._stop.is_set():
+            try:
+                nodes = self.heartbeat()
+                self._renewed_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error renewing scheduler heartbeat: {e}")
+                # Give the segments up before the other nodes take them over
+                if self.nodes and time.monotonic() - self._renewed_at >= self.ttl - self.heartbeat_interval:
+                    logger.warning(f"Scheduler node {self.node_id} lost its heartbeat, leaving the ring")
+                    self.nodes = []
+                    _owned_ranges = []
+                    self._notify(self.on_lost)
+                self._stop.wait(self.heartbeat_interval)
+                continue
+
+            if nodes != self.nodes:
+                self.nodes = nodes
+                ranges = HashRing(nodes, self.virtual_nodes).ranges(self.node_id)
+                _owned_ranges = ranges
+                logger.info(
+                    f"Scheduler ring has {len(nodes)} nodes, {self.node_id} owns "
+                    f"{_share(ranges):.1%} of schedules in {len(ranges)} ranges"
+                )
+                self._notify(self.on_change)
+
+            self._stop.wait(self.heartbeat_interval)
+
+    @staticmethod
+    def _notify(callback) -> None:
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error applying scheduler ring change: {e}")
@@ -1,6 +1,7 @@
 # file: app/models.py
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy import event
 from .extensions import db
 
 class User(db.Model, UserMixin):
@@ -33,6 +34,8 @@ class User(db.Model, UserMixin):
     openai_vector_store_id = db.Column(db.String(128))
     openai_system_prompt = db.Column(db.Text)
     openai_api_key = db.Column(db.String(256))  # Optional: user can provide their own key
+    generation_cache_minutes = db.Column(db.Integer)  # reuse identical text requests for N minutes (opt-in)
+    semantic_cache = db.Column(db.Boolean, default=False)  # within that TTL, also reuse drafts for similar topics
 
     # Stripe billing
     stripe_customer_id = db.Column(db.String(64))
@@ -47,7 +50,10 @@ class User(db.Model, UserMixin):
         return Schedule.query.filter_by(user_id=self.id, active=True).all()
 
 class Schedule(db.Model):
-    __table_args__ = {'schema': 'marketing_agent'}
+    __table_args__ = (
+        db.Index('ix_schedule_active_due_at', 'active', 'due_at'),  # one-off poller range scan
+        {'schema': 'marketing_agent'}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("marketing_agent.user.id"), nullable=False)
@@ -55,6 +61,9 @@ class Schedule(db.Model):
     # Scheduling configuration
     cron_expression = db.Column(db.String(64), nullable=False)  # CRON format or ISO datetime
     timezone = db.Column(db.String(64), default="Europe/Berlin")
+    # One-off posts (ISO datetime expression): due time in UTC, NULL for cron schedules.
+    # next_run stays set until the post has been queued.
+    due_at = db.Column(db.DateTime)
     
     # Publishing configuration
     channel = db.Column(db.String(64), nullable=False)  # telegram, facebook, linkedin, instagram
@@ -65,17 +74,60 @@ class Schedule(db.Model):
     generate_voice = db.Column(db.Boolean, default=False)
     content_type = db.Column(db.String(32), default="post")  # post, story, reel
     
+    # Run may start up to this many seconds after the cron time (NULL = app default)
+    jitter_seconds = db.Column(db.Integer)
+    # Run fires while the previous one is still queued/running: queue_one, coalesce, skip, allow
+    overlap_policy = db.Column(db.String(16), default="queue_one", nullable=False)
+    # Runs missed while no scheduler was running: skip, coalesce (latest once), all
+    catchup_policy = db.Column(db.String(16), default="coalesce", nullable=False)
+    
     # Status
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_run = db.Column(db.DateTime)
     next_run = db.Column(db.DateTime)
+    
+    # Change tracking for the scheduler sync (bumped only by user-facing edits,
+    # not by last_run/next_run bookkeeping)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Position on the scheduler ring (hash of user_id), see jobs/sharding.py
+    shard_key = db.Column(db.Integer, index=True)
 
     user = db.relationship("User", backref=db.backref("schedules", lazy=True, cascade="all, delete-orphan"))
 
     def __repr__(self):
         return f'<Schedule {self.id}: {self.channel} - {self.cron_expression}>'
 
+# Fields that change how (or whether) the scheduler runs a schedule
+SCHEDULE_SYNC_FIELDS = (
+    "cron_expression", "timezone", "channel", "content_template",
+    "generate_image", "generate_voice", "content_type", "active",
+    "jitter_seconds", "overlap_policy",
+)
+
+def _arm_one_off(target):
+    from .jobs.cron import local_time, parse_due_at
+    target.due_at = parse_due_at(target.cron_expression, target.timezone)
+    if target.due_at is not None:
+        # Pending until the poller queues it (active is still None before the column default)
+        target.next_run = local_time(target.due_at, target.timezone) if target.active is not False else None
+
+@event.listens_for(Schedule, "before_insert")
+def set_shard_key(mapper, connection, target):
+    from .jobs.sharding import shard_key
+    target.shard_key = shard_key(target.user_id)
+    _arm_one_off(target)
+
+@event.listens_for(Schedule, "before_update")
+def bump_schedule_version(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in SCHEDULE_SYNC_FIELDS):
+        target.version = (target.version or 0) + 1
+        target.updated_at = datetime.utcnow()
+    if any(state.attrs[field].history.has_changes() for field in ("cron_expression", "timezone", "active")):
+        _arm_one_off(target)
+
 class FileAsset(db.Model):
     __table_args__ = {'schema': 'marketing_agent'}
     
@@ -102,7 +154,10 @@ class FileAsset(db.Model):
 
 class GeneratedContent(db.Model):
     """Store generated content for reuse and analytics"""
-    __table_args__ = {'schema': 'marketing_agent'}
+    __table_args__ = (
+        db.Index('ix_generated_content_schedule_scheduled_for', 'schedule_id', 'scheduled_for', unique=True),
+        {'schema': 'marketing_agent'}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("marketing_agent.user.id"), nullable=False)
@@ -113,6 +168,12 @@ class GeneratedContent(db.Model):
     image_url = db.Column(db.String(512))
     voice_url = db.Column(db.String(512))
     
+    # Pre-generated ahead of a scheduled run (media kept until published)
+    scheduled_for = db.Column(db.DateTime)  # fire time of the run (UTC)
+    schedule_version = db.Column(db.Integer)  # schedule version it was generated from
+    image_b64 = db.Column(db.Text)
+    voice_data = db.Column(db.LargeBinary)
+    
     # Publication status
     channel = db.Column(db.String(64), nullable=False)
     published = db.Column(db.Boolean, default=False)
@@ -125,4 +186,106 @@ class GeneratedContent(db.Model):
     schedule = db.relationship("Schedule", backref=db.backref("generated_content", lazy=True))
 
     def __repr__(self):
-        return f'<GeneratedContent {self.id} for {self.channel}>'
\ No newline at end of file
+        return f'<GeneratedContent {self.id} for {self.channel}>'
+
+class ScheduleRun(db.Model):
+    """Ledger entry for one executed run: timings per stage and outcome"""
+    __tablename__ = 'schedule_run'
+    __table_args__ = (
+        db.Index('ix_schedule_run_channel_finished_at', 'channel', 'finished_at'),
+        db.Index('ix_schedule_run_user_finished_at', 'user_id', 'finished_at'),
+        {'schema': 'marketing_agent'}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, db.ForeignKey("marketing_agent.schedule.id", ondelete="SET NULL"), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("marketing_agent.user.id", ondelete="CASCADE"), nullable=False)
+    job_run_id = db.Column(db.Integer)
+    kind = db.Column(db.String(32), nullable=False)  # publish, pregenerate
+    channel = db.Column(db.String(64))
+    
+    fire_time = db.Column(db.DateTime)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime, nullable=False)
+    attempt = db.Column(db.Integer)
+    
+    # Seconds
+    queue_wait = db.Column(db.Float)  # available_at -> start (admission, fair share)
+    start_delay = db.Column(db.Float)  # fire_time -> start (what the user sees)
+    text_latency = db.Column(db.Float)
+    image_latency = db.Column(db.Float)
+    tts_latency = db.Column(db.Float)
+    generation_latency = db.Column(db.Float)  # all generation stages, NULL if pre-generated
+    publish_latency = db.Column(db.Float)
+    total_latency = db.Column(db.Float)
+    
+    pregenerated = db.Column(db.Boolean, default=False)
+    http_status = db.Column(db.Integer)  # platform API response
+    outcome = db.Column(db.String(32), nullable=False)  # published, publish_failed, not_configured, skipped, generated, error
+    error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<ScheduleRun {self.id}: schedule {self.schedule_id} {self.outcome}>'
+
+class SchedulerLease(db.Model):
+    """Lease held by the single process that runs scheduler triggers"""
+    __table_args__ = {'schema': 'marketing_agent'}
+    
+    name = db.Column(db.String(64), primary_key=True)  # e.g. "scheduler"
+    holder = db.Column(db.String(128), nullable=False)  # host:pid:nonce of the leader
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+    renewed_at = db.Column(db.DateTime, default=datetime.utcnow)  # last heartbeat
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} held by {self.holder}>'
+
+
+class SchedulerNode(db.Model):
+    """Scheduler process taking part in sharded scheduling (heartbeat row)"""
+    __tablename__ = 'scheduler_node'
+    __table_args__ = {'schema': 'marketing_agent'}
+    
+    node_id = db.Column(db.String(128), primary_key=True)  # host:pid:nonce
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<SchedulerNode {self.node_id}>'
+
+
+class JobRun(db.Model):
+    """Durable queue entry for one execution of a schedule"""
+    __tablename__ = 'job_run'
+    __table_args__ = (
+        db.Index('ix_job_run_status_available_at', 'status', 'available_at'),
+        db.Index('ix_job_run_status_fire_time', 'status', 'fire_time'),
+        db.Index('ix_job_run_status_priority_fire_time', 'status', 'priority', 'fire_time'),  # claim order
+        # One run per fire time: nodes racing to queue the same run lose on insert
+        db.Index('ix_job_run_schedule_fire_time_kind', 'schedule_id', 'fire_time', 'kind', unique=True),
+        {'schema': 'marketing_agent'}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, db.ForeignKey("marketing_agent.schedule.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("marketing_agent.user.id", ondelete="CASCADE"), nullable=False)
+    kind = db.Column(db.String(32), default="publish", nullable=False)
+    priority = db.Column(db.Integer, default=10, nullable=False)  # lower runs first: 0 manual, 10 scheduled
+    
+    # Queue state
+    status = db.Column(db.String(16), default="queued", nullable=False)  # queued, running, done, failed
+    fire_time = db.Column(db.DateTime, nullable=False)  # when the trigger fired (UTC)
+    available_at = db.Column(db.DateTime, nullable=False)  # not claimable before this (retry backoff)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    locked_by = db.Column(db.String(128))  # worker holding the claim
+    locked_until = db.Column(db.DateTime)  # visibility timeout of the claim
+    last_error = db.Column(db.Text)
+    published_at = db.Column(db.DateTime)  # set as soon as the post went out, never published again
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<JobRun {self.id}: schedule {self.schedule_id} {self.status}>'
@@ -0,0 +1,254 @@
+# file: app/openai_async.py
+"""Asyncio backend for OpenAI generation.
+
+The blocking functions in ``openai_service`` tie up one OS thread per
+request in flight. This module runs the same requests on ``AsyncOpenAI``
+inside one event loop thread per process (``generation_loop``), so hundreds
+of requests can wait on OpenAI at once for the cost of a coroutine each.
+Callers on other threads ``submit`` coroutines and get a
+``concurrent.futures.Future`` back.
+
+Requests per API key are bounded by OPENAI_ASYNC_PER_KEY_CONCURRENCY
+(a semaphore per key fingerprint), so one tenant's batch cannot take every
+connection, and clients are kept per key like the sync registry.
+Results and errors mirror the sync functions, including ``deadline`` and
+the generation and semantic caches.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from .deadline import Deadline, DeadlineExceeded, budget
+from .generation_cache import generation_cache, request_key
+from .openai_service import (
+    CLIENT_CACHE_SIZE, DEFAULT_TIMEOUT, RETIRE_GRACE_SECONDS, _http2_available, image_request,
+    key_fingerprint, post_text_request, tts_request
+)
+from .semantic_cache import embedding_request, index_key, semantic_cache
+
+logger = logging.getLogger(__name__)
+
+PER_KEY_CONCURRENCY = int(os.getenv("OPENAI_ASYNC_PER_KEY_CONCURRENCY", "16"))
+
+
+class _KeyEntry:
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+        self.semaphore = asyncio.BoundedSemaphore(PER_KEY_CONCURRENCY)
+        self.active = 0
+
+
+class GenerationLoop:
+    """Event loop thread running OpenAI requests for the whole process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # Only touched on the loop thread
+        self._keys: "OrderedDict[str, _KeyEntry]" = OrderedDict()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="openai-async", daemon=True)
+            self._thread.start()
+            self._loop = loop
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Run ``coro`` on the loop (started on first use) from any thread"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stop(self, timeout: float = 10) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_clients(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error closing async OpenAI clients: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+    def reset_after_fork(self) -> None:
+        # The loop thread does not exist in the child
+        self._lock = threading.Lock()
+        self._loop = self._thread = None
+        self._keys = OrderedDict()
+
+    def _entry(self, api_key: str) -> _KeyEntry:
+        fingerprint = key_fingerprint(api_key)
+        entry = self._keys.get(fingerprint)
+        if entry is None:
+            entry = self._keys[fingerprint] = _KeyEntry(AsyncOpenAI(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(
+                    timeout=DEFAULT_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=PER_KEY_CONCURRENCY,
+                        max_connections=PER_KEY_CONCURRENCY,
+                        keepalive_expiry=60
+                    ),
+                    http2=_http2_available()
+                )
+            ))
+            self._evict()
+        self._keys.move_to_end(fingerprint)
+        return entry
+
+    def _evict(self) -> None:
+        # Least recently used keys without requests in flight
+        for fingerprint in list(self._keys):
+            if len(self._keys) <= CLIENT_CACHE_SIZE:
+                break
+            entry = self._keys[fingerprint]
+            if entry.active == 0:
+                del self._keys[fingerprint]
+                asyncio.ensure_future(entry.client.close())
+
+    async def _close_clients(self) -> None:
+        entries = list(self._keys.values())
+        self._keys.clear()
+        for entry in entries:
+            await entry.client.close()
+
+    async def call(self, api_key: Optional[str], request, deadline: Optional[Deadline] = None):
+        """``await request(client)`` within the key's concurrency limit and the deadline"""
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("No OpenAI API key available")
+        entry = self._entry(api_key)
+        entry.active += 1
+        try:
+            async with entry.semaphore:
+                client = entry.client
+                if deadline is not None:
+                    client = client.with_options(timeout=budget(deadline, DEFAULT_TIMEOUT), max_retries=0)
+                return await request(client)
+        finally:
+            entry.active -= 1
+
+
+generation_loop = GenerationLoop()
+os.register_at_fork(after_in_child=generation_loop.reset_after_fork)
+
+
+def _deadline_error(deadline: Optional[Deadline], what: str, error: Exception) -> None:
+    if isinstance(error, DeadlineExceeded):
+        raise error
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded(f"{what} did not finish in time: {error}") from error
+
+
+async def _find_similar(user_api_key: Optional[str], scope: str, topic: str, channel: str, system_prompt: str,
+                        max_age: float, deadline: Optional[Deadline]):
+    """Async ``openai_service._find_similar``"""
+    from .jobs import metrics
+    
+    key = index_key(scope, post_text_request("", channel, system_prompt))
+    started = time.monotonic()
+    try:
+        response = await generation_loop.call(
+            user_api_key,
+            lambda client: client.embeddings.create(**embedding_request(topic)),
+            deadline
+        )
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.warning(f"Topic embedding failed, generating without semantic cache: {e}")
+        return None, None, None
+    metrics.observe("semantic_cache_embedding", time.monotonic() - started)
+    vector = semantic_cache.normalize(response.data[0].embedding)
+    return key, vector, semantic_cache.lookup(key, vector, max_age)
+
+
+async def generate_post_text(topic: str, channel: str, system_prompt: str, user_api_key: Optional[str] = None,
+                             deadline: Optional[Deadline] = None, cache_ttl: Optional[float] = None,
+                             cache_scope: Optional[str] = None, similar_scope: Optional[str] = None, info: Optional[dict] = None,
+                             raise_errors: bool = False) -> str:
+    """Async ``openai_service.generate_post_text``"""
+    request = post_text_request(topic, channel, system_prompt)
+    usage = {"tokens": 0}
+
+    async def create() -> str:
+        response = await generation_loop.call(
+            user_api_key,
+            lambda client: client.chat.completions.create(**request),
+            deadline
+        )
+        usage["tokens"] = response.usage.total_tokens if response.usage else 0
+        return response.choices[0].message.content.strip()
+
+    try:
+        cache_key = request_key(cache_scope, request)
+
+        vector = None
+        # Identical requests are answered by the exact cache, no embedding needed
+        if similar_scope and cache_ttl and not (cache_scope and generation_cache.has(cache_key)):
+            key, vector, similar = await _find_similar(
+                user_api_key, similar_scope, topic, channel, system_prompt, cache_ttl, deadline
+            )
+            if similar is not None:
+                if info is not None:
+                    info["similar"] = similar
+                return similar["text"]
+
+        started = time.monotonic()
+        text = await generation_cache.get_or_compute_async(
+            cache_key, cache_ttl if cache_scope else None, create,
+            wait_timeout=budget(deadline, RETIRE_GRACE_SECONDS)
+        )
+        if vector is not None and usage["tokens"]:
+            semantic_cache.add(key, vector, topic, text, usage["tokens"], time.monotonic() - started)
+        return text
+    except Exception as e:
+        _deadline_error(deadline, "Text generation", e)
+        logger.error(f"Error generating post text: {e}")
+        if raise_errors:
+            raise
+        return f"Fehler bei der Content-Generierung: {str(e)}"
+
+
+async def generate_image_b64(topic: str, channel: str, user_api_key: Optional[str] = None,
+                             deadline: Optional[Deadline] = None) -> Optional[str]:
+    """Async ``openai_service.generate_image_b64``"""
+    try:
+        response = await generation_loop.call(
+            user_api_key,
+            lambda client: client.images.generate(**image_request(topic, channel)),
+            deadline
+        )
+        return response.data[0].b64_json
+    except Exception as e:
+        _deadline_error(deadline, "Image generation", e)
+        logger.error(f"Error generating image: {e}")
+        return None
+
+
+async def generate_tts_audio(text: str, user_api_key: Optional[str] = None,
+                             deadline: Optional[Deadline] = None) -> Optional[bytes]:
+    """Async ``openai_service.generate_tts_audio``"""
+    async def speech(client):
+        response = await client.audio.speech.create(**tts_request(text))
+        return response.read()
+
+    try:
+        return await generation_loop.call(user_api_key, speech, deadline)
+    except Exception as e:
+        _deadline_error(deadline, "TTS generation", e)
+        logger.error(f"Error generating TTS: {e}")
+        return None
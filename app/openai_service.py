@@ -1,24 +1,75 @@
 # file: app/openai_service.py
 import os
+import atexit
 import base64
-from typing import Optional, Tuple, Dict, Any
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any, List
 from openai import OpenAI
 import httpx
 import logging
 
+from .deadline import Deadline, DeadlineExceeded, budget
+
 logger = logging.getLogger(__name__)
 
-def get_openai_client(user_api_key: Optional[str] = None) -> OpenAI:
-    """Get OpenAI client with user's API key or fallback to system key"""
-    api_key = user_api_key or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("No OpenAI API key available")
-    
+DEFAULT_TIMEOUT = 60.0
+
+# Process-wide OpenAI clients, one per API key (LRU, evicted when idle)
+CLIENT_CACHE_SIZE = int(os.getenv("OPENAI_CLIENT_CACHE_SIZE", "32"))
+CLIENT_IDLE_SECONDS = float(os.getenv("OPENAI_CLIENT_IDLE_SECONDS", "600"))
+CLIENT_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))  # per client (API key)
+CLIENT_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() == "true"  # needs httpx[http2]
+# Evicted clients are closed once requests that may still use them are over
+# (timeout x (1 + SDK retries) plus backoff)
+RETIRE_GRACE_SECONDS = DEFAULT_TIMEOUT * 3 + 30
+
+_clients_lock = threading.Lock()
+_clients: "OrderedDict[str, list]" = OrderedDict()  # fingerprint -> [client, last used]
+_retired = []  # (client, retired at)
+
+
+def _reset_after_fork():
+    global _clients_lock, _clients, _retired
+    # The parent's connections are not ours to use or close
+    _clients_lock = threading.Lock()
+    _clients = OrderedDict()
+    _retired = []
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Stable id of an API key that is safe to keep in memory and logs"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def _http2_available() -> bool:
+    if not CLIENT_HTTP2:
+        return False
     try:
-        # Create custom HTTP client without proxies parameter
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("OPENAI_HTTP2 is set but the h2 package is missing (pip install httpx[http2]), using HTTP/1.1")
+        return False
+
+
+def _create_client(api_key: str) -> OpenAI:
+    try:
+        # Create custom HTTP client without proxies parameter; kept alive for reuse
         http_client = httpx.Client(
-            timeout=60.0,
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_keepalive_connections=CLIENT_MAX_CONNECTIONS,
+                max_connections=CLIENT_MAX_CONNECTIONS,
+                keepalive_expiry=60
+            ),
+            http2=_http2_available()
         )
         return OpenAI(api_key=api_key, http_client=http_client)
     except Exception as e:
@@ -30,49 +81,140 @@ def get_openai_client(user_api_key: Optional[str] = None) -> OpenAI:
             logger.error(f"OpenAI client fallback error: {fallback_error}")
             raise
 
+
+def _close(client: OpenAI) -> None:
+    try:
+        client.close()
+    except Exception as e:
+        logger.warning(f"Error closing OpenAI client: {e}")
+
+
+def _evict(now: float) -> list:
+    """Retire idle and surplus clients; returns retired clients that can be closed now"""
+    while _clients:
+        fingerprint, (client, last_used) = next(iter(_clients.items()))
+        if len(_clients) <= CLIENT_CACHE_SIZE and now - last_used < CLIENT_IDLE_SECONDS:
+            break
+        del _clients[fingerprint]
+        _retired.append((client, now))
+
+    closable = [client for client, retired_at in _retired if now - retired_at >= RETIRE_GRACE_SECONDS]
+    if closable:
+        _retired[:] = [(client, retired_at) for client, retired_at in _retired
+                       if now - retired_at < RETIRE_GRACE_SECONDS]
+    return closable
+
+
+def get_openai_client(user_api_key: Optional[str] = None) -> OpenAI:
+    """Get OpenAI client with user's API key or fallback to system key.
+    
+    Clients are shared per API key across threads, so repeated calls reuse
+    open connections instead of paying a new TLS handshake each time.
+    """
+    api_key = user_api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("No OpenAI API key available")
+    
+    fingerprint = key_fingerprint(api_key)
+    now = time.monotonic()
+    with _clients_lock:
+        entry = _clients.get(fingerprint)
+        if entry is not None:
+            entry[1] = now
+            _clients.move_to_end(fingerprint)
+            client = entry[0]
+            closable = _evict(now)
+        else:
+            client = None
+    
+    if client is None:
+        created = _create_client(api_key)
+        with _clients_lock:
+            entry = _clients.get(fingerprint)
+            if entry is None:
+                _clients[fingerprint] = [created, now]
+                client, created = created, None
+            else:
+                # Another thread created one meanwhile
+                entry[1] = now
+                _clients.move_to_end(fingerprint)
+                client = entry[0]
+            closable = _evict(now)
+        if created is not None:
+            _close(created)
+    
+    for retired in closable:
+        _close(retired)
+    return client
+
+
+def close_openai_clients() -> None:
+    """Close every cached client (shutdown)"""
+    with _clients_lock:
+        clients = [entry[0] for entry in _clients.values()] + [client for client, _ in _retired]
+        _clients.clear()
+        _retired.clear()
+    for client in clients:
+        _close(client)
+
+
+atexit.register(close_openai_clients)
+
+def _within(client: OpenAI, deadline: Optional[Deadline]) -> OpenAI:
+    """Client whose request timeout fits the run's deadline (no SDK retries, the run queue retries)"""
+    if deadline is None:
+        return client
+    return client.with_options(timeout=budget(deadline, DEFAULT_TIMEOUT), max_retries=0)
+
+# Per-channel instructions, shared by single posts and fan-out requests
+CHANNEL_PROMPTS = {
+    "telegram": (
+        "Du bist ein Experte für Telegram-Marketing. Erstelle prägnante, "
+        "engaging Posts für Telegram-Kanäle. Nutze Emojis sparsam aber effektiv. "
+        "Schreibe auf Deutsch und halte dich an 2000 Zeichen Limit."
+    ),
+    "linkedin": (
+        "Du bist ein LinkedIn-Content-Experte. Erstelle professionelle, "
+        "business-orientierte Posts die Engagement fördern. Nutze relevante "
+        "Hashtags und einen Call-to-Action. Schreibe auf Deutsch."
+    ),
+    "facebook": (
+        "Du bist ein Facebook-Marketing-Spezialist. Erstelle engaging Posts "
+        "die Interaktion fördern. Nutze einen conversational Ton und "
+        "relevante Hashtags. Schreibe auf Deutsch."
+    ),
+    "instagram": (
+        "Du bist ein Instagram-Content-Creator. Erstelle visuell ansprechende "
+        "Post-Texte mit relevanten Hashtags. Nutze einen modernen, trendigen "
+        "Ton. Schreibe auf Deutsch und limitiere auf 2200 Zeichen."
+    )
+}
+
+# Maximum post length per channel (characters), checked on fan-out variants
+CHANNEL_LIMITS = {
+    "telegram": 4096,
+    "linkedin": 3000,
+    "facebook": 63206,
+    "instagram": 2200,
+}
+
 def build_system_prompt(user_system_prompt: Optional[str], channel: str) -> str:
     """Build system prompt based on channel and user preferences"""
     
-    channel_prompts = {
-        "telegram": (
-            "Du bist ein Experte für Telegram-Marketing. Erstelle prägnante, "
-            "engaging Posts für Telegram-Kanäle. Nutze Emojis sparsam aber effektiv. "
-            "Schreibe auf Deutsch und halte dich an 2000 Zeichen Limit."
-        ),
-        "linkedin": (
-            "Du bist ein LinkedIn-Content-Experte. Erstelle professionelle, "
-            "business-orientierte Posts die Engagement fördern. Nutze relevante "
-            "Hashtags und einen Call-to-Action. Schreibe auf Deutsch."
-        ),
-        "facebook": (
-            "Du bist ein Facebook-Marketing-Spezialist. Erstelle engaging Posts "
-            "die Interaktion fördern. Nutze einen conversational Ton und "
-            "relevante Hashtags. Schreibe auf Deutsch."
-        ),
-        "instagram": (
-            "Du bist ein Instagram-Content-Creator. Erstelle visuell ansprechende "
-            "Post-Texte mit relevanten Hashtags. Nutze einen modernen, trendigen "
-            "Ton. Schreibe auf Deutsch und limitiere auf 2200 Zeichen."
-        )
-    }
-    
-    base_prompt = channel_prompts.get(channel, channel_prompts["telegram"])
+    base_prompt = CHANNEL_PROMPTS.get(channel, CHANNEL_PROMPTS["telegram"])
     
     if user_system_prompt:
         base_prompt += f"\n\nZusätzliche Anweisungen: {user_system_prompt}"
     
     return base_prompt
 
-def generate_post_text(topic: str, channel: str, system_prompt: str, user_api_key: Optional[str] = None) -> str:
-    """Generate social media post text using OpenAI"""
-    try:
-        client = get_openai_client(user_api_key)
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"""
+def post_text_request(topic: str, channel: str, system_prompt: str) -> Dict[str, Any]:
+    """Chat completion arguments for a post (shared with the async backend)"""
+    return dict(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"""
 Erstelle einen {channel}-Post zum folgenden Thema: {topic}
 
 Anforderungen:
@@ -82,17 +224,175 @@ Anforderungen:
 - Call-to-Action wenn angebracht
 - Optimale Länge für die Plattform
 """}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
+        ],
+        temperature=0.7,
+        max_tokens=1000
+    )
+
+def _find_similar(client: OpenAI, scope: str, topic: str, channel: str, system_prompt: str, max_age: float):
+    """(index key, topic embedding, reusable draft or None); (None, None, None) if embedding fails"""
+    from .semantic_cache import embedding_request, index_key, semantic_cache
+    from .jobs import metrics
+    
+    key = index_key(scope, post_text_request("", channel, system_prompt))
+    started = time.monotonic()
+    try:
+        response = client.embeddings.create(**embedding_request(topic))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.warning(f"Topic embedding failed, generating without semantic cache: {e}")
+        return None, None, None
+    metrics.observe("semantic_cache_embedding", time.monotonic() - started)
+    vector = semantic_cache.normalize(response.data[0].embedding)
+    return key, vector, semantic_cache.lookup(key, vector, max_age)
+
+def generate_post_text(topic: str, channel: str, system_prompt: str, user_api_key: Optional[str] = None,
+                       deadline: Optional[Deadline] = None, cache_ttl: Optional[float] = None,
+                       cache_scope: Optional[str] = None, similar_scope: Optional[str] = None, info: Optional[dict] = None,
+                       raise_errors: bool = False) -> str:
+    """Generate social media post text using OpenAI.
+    
+    With a ``deadline``, running out of time raises DeadlineExceeded instead
+    of returning an error text that would be published; with
+    ``raise_errors`` any failure is raised. With ``cache_ttl``
+    (seconds) and ``cache_scope`` (the user id) an identical request the
+    user makes within that time returns the same text (see
+    ``generation_cache``); with ``similar_scope`` as well (e.g. the
+    user id) so does a similar topic (see ``semantic_cache``), and ``info``
+    gets the reused draft as ``info["similar"]``.
+    """
+    from .generation_cache import generation_cache, request_key
+    from .semantic_cache import semantic_cache
+    
+    try:
+        client = _within(get_openai_client(user_api_key), deadline)
+        request = post_text_request(topic, channel, system_prompt)
+        usage = {"tokens": 0}
+        
+        def create() -> str:
+            response = client.chat.completions.create(**request)
+            usage["tokens"] = response.usage.total_tokens if response.usage else 0
+            return response.choices[0].message.content.strip()
         
-        return response.choices[0].message.content.strip()
+        cache_key = request_key(cache_scope, request)
+        
+        vector = None
+        # Identical requests are answered by the exact cache, no embedding needed
+        if similar_scope and cache_ttl and not (cache_scope and generation_cache.has(cache_key)):
+            key, vector, similar = _find_similar(client, similar_scope, topic, channel, system_prompt, cache_ttl)
+            if similar is not None:
+                if info is not None:
+                    info["similar"] = similar
+                return similar["text"]
+        
+        started = time.monotonic()
+        text = generation_cache.get_or_compute(
+            cache_key, cache_ttl if cache_scope else None, create,
+            wait_timeout=budget(deadline, RETIRE_GRACE_SECONDS)
+        )
+        if vector is not None and usage["tokens"]:
+            semantic_cache.add(key, vector, topic, text, usage["tokens"], time.monotonic() - started)
+        return text
     
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"Text generation did not finish in time: {e}") from e
         logger.error(f"Error generating post text: {e}")
+        if raise_errors:
+            raise
         return f"Fehler bei der Content-Generierung: {str(e)}"
 
+def fan_out_request(topic: str, channels: List[str], user_system_prompt: Optional[str]) -> Dict[str, Any]:
+    """Chat completion arguments for one variant per channel, answered as a JSON object"""
+    guidelines = "\n".join(
+        f"- {channel}: {CHANNEL_PROMPTS.get(channel, CHANNEL_PROMPTS['telegram'])} "
+        f"Höchstens {CHANNEL_LIMITS.get(channel, 2000)} Zeichen."
+        for channel in channels
+    )
+    system_prompt = (
+        "Du bist ein Social-Media-Marketing-Experte und schreibst für mehrere Plattformen "
+        "gleichzeitig. Jede Variante ist ein eigenständiger Post, zugeschnitten auf ihre "
+        f"Plattform:\n{guidelines}\n\n"
+        "Antworte ausschließlich mit einem JSON-Objekt, das für jede Plattform genau einen "
+        f"Schlüssel ({', '.join(channels)}) mit dem Post-Text als String enthält."
+    )
+    if user_system_prompt:
+        system_prompt += f"\n\nZusätzliche Anweisungen: {user_system_prompt}"
+    return dict(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"""
+Erstelle Posts für {', '.join(channels)} zum folgenden Thema: {topic}
+
+Anforderungen:
+- Authentisch und engaging
+- Passend für die Zielgruppe der jeweiligen Plattform
+- Inkludiere relevante Hashtags (3-5 Stück)
+- Call-to-Action wenn angebracht
+- Optimale Länge für die jeweilige Plattform
+"""}
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.7,
+        max_tokens=1000 * len(channels)
+    )
+
+def parse_fan_out(content: str, channels: List[str]) -> Dict[str, str]:
+    """Valid variants from a fan-out answer; channels without one are left out"""
+    try:
+        variants = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(variants, dict):
+        return {}
+    texts = {}
+    for channel in channels:
+        text = variants.get(channel)
+        if isinstance(text, str) and text.strip() and len(text.strip()) <= CHANNEL_LIMITS.get(channel, 2000):
+            texts[channel] = text.strip()
+    return texts
+
+def generate_post_texts(topic: str, channels: List[str], user_system_prompt: Optional[str],
+                        user_api_key: Optional[str] = None, deadline: Optional[Deadline] = None) -> Dict[str, str]:
+    """Generate one post per channel with a single request.
+    
+    Returns channel -> text. Channels the answer has no valid variant for
+    (missing, empty or over the channel's limit) are generated on their own
+    with ``generate_post_text``, so every channel gets a text.
+    """
+    from .jobs import metrics
+    
+    if len(channels) == 1:
+        channel = channels[0]
+        system_prompt = build_system_prompt(user_system_prompt, channel)
+        return {channel: generate_post_text(topic, channel, system_prompt, user_api_key, deadline)}
+    
+    texts = {}
+    try:
+        client = _within(get_openai_client(user_api_key), deadline)
+        response = client.chat.completions.create(**fan_out_request(topic, channels, user_system_prompt))
+        texts = parse_fan_out(response.choices[0].message.content, channels)
+        metrics.incr("fan_out_requests")
+        metrics.incr("fan_out_variants", len(texts))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"Text generation did not finish in time: {e}") from e
+        logger.error(f"Error generating posts for {', '.join(channels)}: {e}")
+    
+    for channel in channels:
+        if channel not in texts:
+            logger.warning(f"No valid {channel} variant in the fan-out answer, generating it separately")
+            metrics.incr("fan_out_fallback")
+            system_prompt = build_system_prompt(user_system_prompt, channel)
+            texts[channel] = generate_post_text(topic, channel, system_prompt, user_api_key, deadline)
+    return texts
+
 def generate_image_prompt(topic: str, channel: str) -> str:
     """Generate image prompt based on topic and channel"""
     channel_styles = {
@@ -113,42 +413,59 @@ Create a {style} image for social media about: {topic}
 - Engaging and eye-catching
 """
 
-def generate_image_b64(topic: str, channel: str, user_api_key: Optional[str] = None) -> Optional[str]:
+def image_request(topic: str, channel: str) -> Dict[str, Any]:
+    """DALL-E arguments for a post image (shared with the async backend)"""
+    return dict(
+        model="dall-e-3",
+        prompt=generate_image_prompt(topic, channel),
+        size="1024x1024",
+        quality="standard",
+        response_format="b64_json",
+        n=1
+    )
+
+def generate_image_b64(topic: str, channel: str, user_api_key: Optional[str] = None,
+                       deadline: Optional[Deadline] = None) -> Optional[str]:
     """Generate image using DALL-E and return base64"""
     try:
-        client = get_openai_client(user_api_key)
-        prompt = generate_image_prompt(topic, channel)
+        client = _within(get_openai_client(user_api_key), deadline)
         
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",
-            quality="standard",
-            response_format="b64_json",
-            n=1
-        )
+        response = client.images.generate(**image_request(topic, channel))
         
         return response.data[0].b64_json
     
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"Image generation did not finish in time: {e}") from e
         logger.error(f"Error generating image: {e}")
         return None
 
-def generate_tts_audio(text: str, user_api_key: Optional[str] = None) -> Optional[bytes]:
+def tts_request(text: str) -> Dict[str, Any]:
+    """Speech arguments for a post's voice-over (shared with the async backend)"""
+    return dict(
+        model="tts-1",
+        voice="alloy",
+        input=text[:4096],  # Limit text length
+        response_format="mp3"
+    )
+
+def generate_tts_audio(text: str, user_api_key: Optional[str] = None,
+                       deadline: Optional[Deadline] = None) -> Optional[bytes]:
     """Generate TTS audio using OpenAI"""
     try:
-        client = get_openai_client(user_api_key)
+        client = _within(get_openai_client(user_api_key), deadline)
         
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",
-            input=text[:4096],  # Limit text length
-            response_format="mp3"
-        )
+        response = client.audio.speech.create(**tts_request(text))
         
         return response.read()
     
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"TTS generation did not finish in time: {e}") from e
         logger.error(f"Error generating TTS: {e}")
         return None
 
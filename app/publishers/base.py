@@ -2,13 +2,21 @@
 from abc import ABC, abstractmethod
 from typing import Optional, Dict, Any
 
+from ..deadline import Deadline, budget
+
 class BasePublisher(ABC):
     """Base class for social media publishers"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], deadline: Optional[Deadline] = None):
         self.config = config
+        # Scheduled runs pass their deadline; requests then time out when the budget is used up
+        self.deadline = deadline
         self.validate_config()
     
+    def request_timeout(self, default: float) -> float:
+        """HTTP timeout for the next request (raises DeadlineExceeded when out of budget)"""
+        return budget(self.deadline, default)
+    
     @abstractmethod
     def validate_config(self) -> None:
         """Validate publisher configuration"""
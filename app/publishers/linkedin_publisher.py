@@ -55,7 +55,7 @@ class LinkedInPublisher(BasePublisher):
                 f"{API_BASE}/ugcPosts", 
                 json=payload, 
                 headers=self._headers(), 
-                timeout=30
+                timeout=self.request_timeout(30)
             )
             
             ok = r.status_code in (201, 200)
@@ -43,7 +43,7 @@ class FacebookPublisher(BasePublisher):
             r = requests.post(
                 url, 
                 data={"message": text, "access_token": self.access_token}, 
-                timeout=30
+                timeout=self.request_timeout(30)
             )
             
             ok = r.status_code in (200, 201)
@@ -83,7 +83,7 @@ class FacebookPublisher(BasePublisher):
             files = {"source": ("image.png", img_bytes)}
             data = {"caption": text, "access_token": self.access_token}
             
-            r = requests.post(url, data=data, files=files, timeout=60)
+            r = requests.post(url, data=data, files=files, timeout=self.request_timeout(60))
             
             ok = r.status_code in (200, 201)
             response_data = r.json() if r.text else {}
@@ -183,7 +183,7 @@ class InstagramPublisher(BasePublisher):
                 "image_url": remote_url,
                 "caption": text,
                 "access_token": self.access_token
-            }, timeout=60)
+            }, timeout=self.request_timeout(60))
             
             if r1.status_code not in (200, 201):
                 response_data = r1.json() if r1.text else {}
@@ -210,7 +210,7 @@ class InstagramPublisher(BasePublisher):
             r2 = requests.post(publish_url, data={
                 "creation_id": container_id,
                 "access_token": self.access_token
-            }, timeout=60)
+            }, timeout=self.request_timeout(60))
             
             ok = r2.status_code in (200, 201)
             response_data = r2.json() if r2.text else {}
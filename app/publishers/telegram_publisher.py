@@ -36,9 +36,9 @@ class TelegramPublisher(BasePublisher):
             logger.info(f"Sending Telegram request to {method} for chat_id: {data.get('chat_id')}")
             
             if files:
-                response = requests.post(url, data=data, files=files, timeout=30)
+                response = requests.post(url, data=data, files=files, timeout=self.request_timeout(30))
             else:
-                response = requests.post(url, json=data, timeout=30)
+                response = requests.post(url, json=data, timeout=self.request_timeout(30))
             
             # Check for Telegram API errors even with 200 status
             response_data = response.json()
@@ -48,6 +48,7 @@ class TelegramPublisher(BasePublisher):
                 return {
                     "success": False,
                     "error": error_msg,
+                    "status": response.status_code,
                     "platform": "Telegram"
                 }
             
@@ -56,6 +57,7 @@ class TelegramPublisher(BasePublisher):
             return {
                 "success": True,
                 "response": response_data,
+                "status": response.status_code,
                 "platform": "Telegram"
             }
         
@@ -64,6 +66,7 @@ class TelegramPublisher(BasePublisher):
             return {
                 "success": False,
                 "error": f"Network error: {str(e)}",
+                "status": e.response.status_code if e.response is not None else None,
                 "platform": "Telegram"
             }
     
@@ -0,0 +1,155 @@
+# file: app/semantic_cache.py
+"""Semantic cache for near-duplicate post briefs.
+
+``generation_cache`` only helps when a request is repeated word for word.
+Briefs are often reworded ("Tipps für Instagram Reels", "Instagram Reels
+Tipps"), so users who enable it (``User.semantic_cache``) also get a recent
+draft back when the topic's embedding is close enough to an earlier one.
+
+Each user has an in-process index per channel and system prompt: a NumPy
+matrix of unit-length topic embeddings, searched by cosine similarity (one
+matrix-vector product). Freshness policy:
+
+- a draft is only reused within the user's cache TTL
+  (``User.generation_cache_minutes``),
+- and at most SEMANTIC_CACHE_MAX_REUSES times, so a recurring brief gets a
+  new text now and then instead of the same post over and over,
+- above SEMANTIC_CACHE_THRESHOLD similarity.
+
+Requests the exact cache can answer (cached or in flight) skip the
+embedding call and the search.
+
+Every hit counts the tokens and the generation time of the reused draft as
+saved (``semantic_cache_tokens_saved``, ``semantic_cache_seconds_saved`` in
+``jobs.metrics``); embedding calls are timed as ``semantic_cache_embedding``.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 256  # shortened embeddings are plenty for short briefs
+THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+MAX_REUSES = int(os.getenv("SEMANTIC_CACHE_MAX_REUSES", "3"))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))  # per index
+MAX_INDEXES = int(os.getenv("SEMANTIC_CACHE_MAX_INDEXES", "500"))
+
+
+def embedding_request(topic: str) -> Dict[str, Any]:
+    """Embedding arguments for a topic (shared with the async backend)"""
+    return dict(model=EMBEDDING_MODEL, input=topic.strip(), dimensions=EMBEDDING_DIMENSIONS)
+
+
+def index_key(scope: str, request: Dict[str, Any]) -> str:
+    """Index for a user (``scope``) and everything in the request but the topic"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{scope}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def _metrics():
+    from .jobs import metrics
+    return metrics
+
+
+class SemanticIndex:
+    """Topic embeddings of recent drafts; rows are unit vectors"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.vectors = np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.entries = []  # per row: topic, text, created at, tokens, seconds, reuses
+
+    def search(self, vector: np.ndarray, max_age: float, threshold: float = THRESHOLD):
+        """(similarity, entry) of the closest fresh draft, or None"""
+        if not len(self.entries):
+            return None
+        similarities = self.vectors @ vector
+        oldest = time.monotonic() - max_age
+        for row in np.argsort(similarities)[::-1]:
+            if similarities[row] < threshold:
+                return None
+            entry = self.entries[row]
+            if entry["created_at"] >= oldest and entry["reuses"] < MAX_REUSES:
+                return float(similarities[row]), entry
+        return None
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any]) -> None:
+        self.vectors = np.vstack([self.vectors, vector[np.newaxis, :]])[-self.max_entries:]
+        self.entries = (self.entries + [entry])[-self.max_entries:]
+
+
+class SemanticCache:
+    def __init__(self, max_indexes: int = MAX_INDEXES):
+        self.max_indexes = max_indexes
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[str, SemanticIndex]" = OrderedDict()
+
+    @staticmethod
+    def normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, key: str, vector: np.ndarray, max_age: float) -> Optional[Dict[str, Any]]:
+        """Reuse the closest fresh draft in index ``key``.
+
+        Returns topic, text, similarity and what the reuse saved, or None.
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+            found = index.search(vector, max_age) if index is not None else None
+            if found is None:
+                _metrics().incr("semantic_cache_miss")
+                return None
+            similarity, entry = found
+            entry["reuses"] += 1
+            self._indexes.move_to_end(key)
+        metrics = _metrics()
+        metrics.incr("semantic_cache_hit")
+        metrics.incr("semantic_cache_tokens_saved", entry["tokens"])
+        metrics.observe("semantic_cache_seconds_saved", entry["seconds"])
+        return {
+            "topic": entry["topic"],
+            "text": entry["text"],
+            "similarity": similarity,
+            "tokens_saved": entry["tokens"],
+            "seconds_saved": entry["seconds"],
+        }
+
+    def add(self, key: str, vector: np.ndarray, topic: str, text: str, tokens: int, seconds: float) -> None:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = SemanticIndex()
+                while len(self._indexes) > self.max_indexes:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(key)
+            index.add(vector, {
+                "topic": topic,
+                "text": text,
+                "created_at": time.monotonic(),
+                "tokens": tokens,
+                "seconds": seconds,
+                "reuses": 0,
+            })
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+semantic_cache = SemanticCache()
+
+
+def _reset_after_fork():
+    # The parent's lock may be held by one of its threads
+    semantic_cache._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
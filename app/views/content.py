@@ -7,9 +7,9 @@ from werkzeug.utils import secure_filename
 from io import BytesIO
 from ..forms import GenerateContentForm
 from ..models import GeneratedContent
-from ..extensions import db
+from ..extensions import db, release_connection
 from ..openai_service import (
-    build_system_prompt, generate_post_text, 
+    build_system_prompt, generate_post_text, generate_post_texts,
     generate_image_b64, generate_tts_audio
 )
 from ..publishers.telegram_publisher import TelegramPublisher
@@ -64,19 +64,47 @@ def index():
     
     if form.validate_on_submit():
         try:
-            # Build system prompt
-            system_prompt = build_system_prompt(
-                current_user.openai_system_prompt,
-                form.channel.data
-            )
+            # No connection is held while OpenAI and the platform are called
+            release_connection()
             
-            # Generate text content
-            text_content = generate_post_text(
-                topic=form.topic.data,
-                channel=form.channel.data,
-                system_prompt=system_prompt,
-                user_api_key=current_user.openai_api_key
-            )
+            channels = [form.channel.data] + [
+                channel for channel in form.extra_channels.data if channel != form.channel.data
+            ]
+            
+            if len(channels) > 1:
+                # One request returns a variant for every channel
+                texts = generate_post_texts(
+                    topic=form.topic.data,
+                    channels=channels,
+                    user_system_prompt=current_user.openai_system_prompt,
+                    user_api_key=current_user.openai_api_key
+                )
+            else:
+                # Build system prompt
+                system_prompt = build_system_prompt(
+                    current_user.openai_system_prompt,
+                    form.channel.data
+                )
+                
+                # Generate text content
+                generation_info = {}
+                texts = {form.channel.data: generate_post_text(
+                    topic=form.topic.data,
+                    channel=form.channel.data,
+                    system_prompt=system_prompt,
+                    user_api_key=current_user.openai_api_key,
+                    cache_scope=str(current_user.id),
+                    cache_ttl=0 if form.regenerate.data else (current_user.generation_cache_minutes or 0) * 60,
+                    similar_scope=str(current_user.id) if current_user.semantic_cache else None,
+                    info=generation_info
+                )}
+                similar = generation_info.get("similar")
+                if similar:
+                    flash(f"Entwurf zum ähnlichen Thema „{similar['topic']}“ wiederverwendet "
+                          f"(Ähnlichkeit {similar['similarity']:.0%}, ca. {similar['tokens_saved']} Tokens und "
+                          f"{similar['seconds_saved']:.0f} s gespart). Für einen neuen Text „Neu generieren“ wählen.",
+                          "info")
+            text_content = texts[form.channel.data]
             
             # Generate image if requested
             image_b64 = None
@@ -95,45 +123,52 @@ def index():
                     user_api_key=current_user.openai_api_key
                 )
             
-            # Save generated content
-            content = GeneratedContent(
-                user_id=current_user.id,
-                text_content=text_content,
-                channel=form.channel.data
-            )
+            # Save generated content (one row per channel)
+            contents = {
+                channel: GeneratedContent(
+                    user_id=current_user.id,
+                    text_content=texts[channel],
+                    channel=channel
+                )
+                for channel in channels
+            }
             
-            db.session.add(content)
+            db.session.add_all(contents.values())
             db.session.commit()
+            content = contents[form.channel.data]
             
             # Auto-publish if requested and channel is configured
             if form.auto_publish.data:
-                publisher = get_publisher(form.channel.data, current_user)
-                if publisher:
-                    try:
-                        result = publisher.publish(
-                            content_type=form.content_type.data,
-                            text=text_content,
-                            image_b64=image_b64
-                        )
+                for channel, channel_content in contents.items():
+                    publisher = get_publisher(channel, current_user)
+                    if publisher:
+                        try:
+                            result = publisher.publish(
+                                content_type=form.content_type.data,
+                                text=channel_content.text_content,
+                                image_b64=image_b64
+                            )
+                            
+                            if result.get("success"):
+                                channel_content.published = True
+                                channel_content.publication_response = str(result)
+                                db.session.commit()
+                                flash(f"Content erfolgreich auf {channel.title()} veröffentlicht!", "success")
+                            else:
+                                flash(f"Fehler bei Veröffentlichung auf {channel.title()}: "
+                                      f"{result.get('error', 'Unbekannter Fehler')}", "warning")
                         
-                        if result.get("success"):
-                            content.published = True
-                            content.publication_response = str(result)
-                            db.session.commit()
-                            flash(f"Content erfolgreich auf {form.channel.data.title()} veröffentlicht!", "success")
-                        else:
-                            flash(f"Fehler bei Veröffentlichung: {result.get('error', 'Unbekannter Fehler')}", "warning")
-                    
-                    except Exception as e:
-                        flash(f"Fehler bei der Veröffentlichung: {str(e)}", "warning")
-                else:
-                    flash(f"{form.channel.data.title()} ist nicht konfiguriert. Content wurde nur generiert.", "info")
+                        except Exception as e:
+                            flash(f"Fehler bei der Veröffentlichung auf {channel.title()}: {str(e)}", "warning")
+                    else:
+                        flash(f"{channel.title()} ist nicht konfiguriert. Content wurde nur generiert.", "info")
             
             generated_content = {
                 "text": text_content,
                 "image_b64": image_b64,
                 "voice_available": bool(voice_bytes),
-                "content_id": content.id
+                "content_id": content.id,
+                "variants": {channel: texts[channel] for channel in channels[1:]}
             }
             
             # Store voice temporarily for download (in production, use proper storage)
@@ -181,6 +216,9 @@ def publish_content(content_id, channel):
         flash(f"{channel.title()} ist nicht konfiguriert.", "warning")
         return redirect(url_for("content.history"))
     
+    # No connection is held while the platform is called
+    release_connection()
+    
     try:
         result = publisher.publish(
             content_type="post",
@@ -188,6 +226,7 @@ def publish_content(content_id, channel):
         )
         
         if result.get("success"):
+            db.session.add(content)
             content.published = True
             content.channel = channel
             content.publication_response = str(result)
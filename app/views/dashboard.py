@@ -46,6 +46,8 @@ def settings():
         # OpenAI
         current_user.openai_system_prompt = form.openai_system_prompt.data.strip() if form.openai_system_prompt.data else None
         current_user.openai_api_key = form.openai_api_key.data.strip() if form.openai_api_key.data else None
+        current_user.generation_cache_minutes = form.generation_cache_minutes.data or None
+        current_user.semantic_cache = form.semantic_cache.data
         
         # LinkedIn
         current_user.linkedin_access_token = form.linkedin_access_token.data.strip() if form.linkedin_access_token.data else None
@@ -4,7 +4,7 @@ import mimetypes
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from ..extensions import db
+from ..extensions import db, release_connection
 from ..forms import UploadFileForm
 from ..models import FileAsset
 from ..openai_service import (
@@ -58,11 +58,15 @@ def index():
                 file_size = os.path.getsize(filepath)
                 mime_type = mimetypes.guess_type(filepath)[0]
                 
+                # No connection is held during the OpenAI uploads
+                user = current_user._get_current_object()
+                release_connection()
+                
                 # Upload to OpenAI
                 openai_file_id = upload_file_to_openai(
                     file_path=filepath,
                     purpose="assistants",
-                    user_api_key=current_user.openai_api_key
+                    user_api_key=user.openai_api_key
                 )
                 
                 if not openai_file_id:
@@ -74,35 +78,35 @@ def index():
                 vector_store_id = form.vector_store_id.data.strip() if form.vector_store_id.data else None
                 
                 # Create vector store if user doesn't have one
-                if not vector_store_id and not current_user.openai_vector_store_id:
-                    vector_store_name = f"User_{current_user.id}_Knowledge_Base"
+                if not vector_store_id and not user.openai_vector_store_id:
+                    vector_store_name = f"User_{user.id}_Knowledge_Base"
                     vector_store_id = create_vector_store(
                         name=vector_store_name,
-                        user_api_key=current_user.openai_api_key
+                        user_api_key=user.openai_api_key
                     )
                     
                     if vector_store_id:
-                        current_user.openai_vector_store_id = vector_store_id
-                        db.session.commit()
+                        # Saved with the file record below
+                        user.openai_vector_store_id = vector_store_id
                         flash(f"Neuer Vector Store erstellt: {vector_store_id}", "info")
                 
                 # Use user's default vector store if none specified
                 if not vector_store_id:
-                    vector_store_id = current_user.openai_vector_store_id
+                    vector_store_id = user.openai_vector_store_id
                 
                 # Add to vector store if available
                 if vector_store_id and mime_type and mime_type.startswith('text/'):
                     success = add_file_to_vector_store(
                         file_id=openai_file_id,
                         vector_store_id=vector_store_id,
-                        user_api_key=current_user.openai_api_key
+                        user_api_key=user.openai_api_key
                     )
                     if not success:
                         flash("Warnung: Datei konnte nicht zum Vector Store hinzugefügt werden.", "warning")
                 
                 # Save file record
                 file_asset = FileAsset(
-                    user_id=current_user.id,
+                    user_id=user.id,
                     filename=filename,
                     original_filename=original_filename,
                     file_size=file_size,
@@ -112,6 +116,7 @@ def index():
                     processing_status="completed"
                 )
                 
+                db.session.add(user)
                 db.session.add(file_asset)
                 db.session.commit()
                 
@@ -1,11 +1,12 @@
 # file: app/views/schedule.py
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from datetime import datetime
+from datetime import datetime, timedelta
 from ..extensions import db
 from ..forms import ScheduleForm
 from ..models import Schedule
 from ..jobs.scheduler import schedule_job
+from ..jobs.notify import publish_schedule_change
 
 schedule_bp = Blueprint("schedule", __name__, url_prefix="/schedule")
 
@@ -33,10 +34,16 @@ def index():
             generate_image=form.generate_image.data,
             generate_voice=form.generate_voice.data,
             content_type=form.content_type.data,
+            jitter_seconds=form.jitter_seconds.data,
+            overlap_policy=form.overlap_policy.data,
+            catchup_policy=form.catchup_policy.data,
             active=form.active.data
         )
+        schedule.next_run = _next_run(schedule)
         
         db.session.add(schedule)
+        db.session.flush()
+        publish_schedule_change("add", schedule.id)
         db.session.commit()
         
         flash("Zeitplan erfolgreich erstellt.", "success")
@@ -61,8 +68,34 @@ def index():
     return render_template("schedule/index.html", 
                           form=form, 
                           schedules=schedules,
+                          upcoming=_upcoming_posts(schedules),
                           channel_config_json=json.dumps(channel_config))
 
+def _next_run(schedule):
+    """Next fire time in the schedule's timezone (as stored by the scheduler)"""
+    from ..jobs.cron import next_fire_time
+    
+    next_run = next_fire_time(schedule.cron_expression, schedule.timezone) if schedule.active else None
+    return next_run.replace(tzinfo=None) if next_run else None
+
+def _upcoming_posts(schedules, days=7, limit=10):
+    """Next posts of all active schedules, soonest first"""
+    from ..jobs.cron import next_fire_times
+    
+    by_id = {schedule.id: schedule for schedule in schedules if schedule.active}
+    fire_times = next_fire_times(
+        [(schedule.id, schedule.cron_expression, schedule.timezone) for schedule in by_id.values()],
+        window=timedelta(days=days),
+        k=limit
+    )
+    upcoming = [
+        (fire_time, by_id[schedule_id])
+        for schedule_id, times in fire_times.items()
+        for fire_time in times
+    ]
+    upcoming.sort(key=lambda item: item[0])
+    return upcoming[:limit]
+
 @schedule_bp.route("/edit/<int:schedule_id>", methods=["GET", "POST"])
 @login_required
 def edit(schedule_id):
@@ -80,8 +113,13 @@ def edit(schedule_id):
         schedule.generate_image = form.generate_image.data
         schedule.generate_voice = form.generate_voice.data
         schedule.content_type = form.content_type.data
+        schedule.jitter_seconds = form.jitter_seconds.data
+        schedule.overlap_policy = form.overlap_policy.data
+        schedule.catchup_policy = form.catchup_policy.data
         schedule.active = form.active.data
+        schedule.next_run = _next_run(schedule)
         
+        publish_schedule_change("update", schedule.id)
         db.session.commit()
         
         flash("Zeitplan erfolgreich aktualisiert.", "success")
@@ -98,6 +136,7 @@ def toggle(schedule_id):
     ).first_or_404()
     
     schedule.active = not schedule.active
+    publish_schedule_change("update", schedule.id)
     db.session.commit()
     
     status = "aktiviert" if schedule.active else "deaktiviert"
@@ -113,6 +152,7 @@ def delete(schedule_id):
         user_id=current_user.id
     ).first_or_404()
     
+    publish_schedule_change("remove", schedule.id)
     db.session.delete(schedule)
     db.session.commit()
     
@@ -135,7 +175,7 @@ def run_now(schedule_id):
             return redirect(url_for("schedule.index"))
     
     try:
-        if schedule_job(schedule_id):
+        if schedule_job(schedule_id, app=current_app._get_current_object()):
             flash("Zeitplan wird ausgeführt... Überprüfen Sie Ihren Kanal in wenigen Sekunden.", "success")
         else:
             flash("Fehler beim Ausführen des Zeitplans. Scheduler möglicherweise nicht initialisiert.", "danger")
@@ -151,36 +191,15 @@ def validate_cron():
     cron_expr = request.json.get('cron', '')
     
     try:
-        from apscheduler.triggers.cron import CronTrigger
-        from datetime import datetime
-        
-        # Parse CRON expression
-        parts = cron_expr.strip().split()
-        if len(parts) != 5:
-            raise ValueError("CRON expression must have exactly 5 parts")
-        
-        minute, hour, day, month, day_of_week = parts
-        
-        # Create trigger to validate
-        trigger = CronTrigger(
-            minute=minute,
-            hour=hour,
-            day=day,
-            month=month,
-            day_of_week=day_of_week
-        )
+        from ..jobs.cron import next_fire_times, validate_expression
         
-        # Get next run times for preview
-        now = datetime.now()
-        next_runs = []
+        # Validate (compiled triggers are cached); one-off dates preview as one run
+        tz = current_app.config.get("SCHEDULER_TIMEZONE", "Europe/Berlin")
+        validate_expression(cron_expr, tz)
         
-        for i in range(3):  # Show next 3 runs
-            next_run = trigger.get_next_fire_time(None, now)
-            if next_run:
-                next_runs.append(next_run.strftime("%d.%m.%Y %H:%M"))
-                now = next_run
-            else:
-                break
+        # Get next run times for preview (next 3 runs within a year)
+        upcoming = next_fire_times([(0, cron_expr, tz)], window=timedelta(days=366), k=3)[0]
+        next_runs = [next_run.strftime("%d.%m.%Y %H:%M") for next_run in upcoming]
         
         return jsonify({
             "valid": True,
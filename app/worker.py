@@ -0,0 +1,68 @@
+"""Dedicated background worker process
+
+Runs scheduler triggers and/or the run queue outside the web tier, so web
+and worker pools can be sized independently:
+
+    flask --app app:create_worker_app worker --role all --concurrency 8
+
+Web processes should then be started with SCHEDULER_IN_WEB=false.
+"""
+import signal
+import threading
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+
+@click.command('worker')
+@click.option('--role', type=click.Choice(['scheduler', 'executor', 'all']), default='all',
+              show_default=True, help='scheduler: fire triggers (leader-elected), executor: run queued posts')
+@click.option('--concurrency', type=int, default=None,
+              help='Runs executed in parallel (default: RUN_QUEUE_CONCURRENCY)')
+@with_appcontext
+def worker(role, concurrency):
+    """Run scheduler triggers and/or queue execution until stopped"""
+    from .jobs import scheduler as jobs
+
+    if jobs.is_initialized():
+        raise click.UsageError(
+            "Background jobs were already started by the web app. "
+            "Use 'flask --app app:create_worker_app worker' or set SCHEDULER_IN_WEB=false."
+        )
+
+    app = current_app._get_current_object()
+    # Not forked by gunicorn: start right here
+    app.config["SCHEDULER_START_AFTER_FORK"] = False
+    if concurrency is None:
+        concurrency = app.config.get("RUN_QUEUE_CONCURRENCY", 4)
+    if role in ('executor', 'all') and concurrency < 1:
+        raise click.BadParameter('must be at least 1 for the executor role', param_hint='--concurrency')
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        click.echo(f'Received signal {signum}, finishing in-flight runs...')
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    jobs.init_scheduler(
+        app,
+        triggers=role in ('scheduler', 'all'),
+        executor=role in ('executor', 'all'),
+        concurrency=concurrency
+    )
+    click.echo(f'Worker started (role={role}, concurrency={concurrency if role != "scheduler" else 0})')
+
+    while not stop.wait(1):
+        pass
+
+    jobs.shutdown_scheduler(wait=True)
+    click.echo('Worker stopped')
+
+
+def init_app(app: Flask):
+    """Register worker command with Flask app"""
+    app.cli.add_command(worker)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the incremental scheduler sync (refresh_user_schedules)
+
+Shows that a refresh tick costs O(changes), not O(schedules): the full
+sync after a restart grows with the table, a tick with a fixed number of
+edits stays flat. Schedules sharing a cron expression share one job.
+
+Run: python bench_schedule_sync.py [sizes...]   (default: 1000 10000 50000)
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Throwaway SQLite database; the marketing_agent schema is an attached file
+TMP_DIR = tempfile.mkdtemp(prefix="bench-sync-")
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(TMP_DIR, 'main.db')}"
+# No triggers and no queue worker polling the (unmigrated) job_run table
+os.environ["SCHEDULER_IN_WEB"] = "false"
+os.environ["SCHEDULER_MODE"] = "off"
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+STATEMENTS = {"count": 0}
+
+
+@event.listens_for(Engine, "connect")
+def _attach_schema(dbapi_conn, _record):
+    dbapi_conn.execute(f"ATTACH DATABASE '{os.path.join(TMP_DIR, 'schema.db')}' AS marketing_agent")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statements(conn, cursor, statement, parameters, context, executemany):
+    STATEMENTS["count"] += 1
+
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from app import create_app
+from app.extensions import db
+from app.models import User, Schedule
+from app.jobs import scheduler as scheduler_module
+
+CHANGES_PER_TICK = 10
+CRONS = ["0 9 * * *", "0 9 * * 1-5", "*/30 * * * *", "0 12 * * 1", "0 9,18 * * *"]
+
+
+def measure(app, label):
+    STATEMENTS["count"] = 0
+    started = time.perf_counter()
+    scheduler_module.refresh_user_schedules(app)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return label, elapsed_ms, STATEMENTS["count"], len(scheduler_module.scheduler.get_jobs())
+
+
+def run(app, size):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email="bench@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        # Existing schedules were last edited a while ago (outside the overlap window)
+        updated_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.execute(
+            Schedule.__table__.insert(),
+            [{
+                "user_id": user.id,
+                "cron_expression": CRONS[i % len(CRONS)],
+                "timezone": "Europe/Berlin",
+                "channel": "telegram",
+                "content_template": f"Topic {i}",
+                "active": True,
+                "version": 1,
+                "updated_at": updated_at,
+            } for i in range(size)]
+        )
+        db.session.commit()
+
+    # Paused scheduler: jobs are registered but never fire during the benchmark
+    scheduler_module.scheduler = BackgroundScheduler(timezone="Europe/Berlin")
+    scheduler_module.scheduler.start(paused=True)
+    scheduler_module._sync_state = scheduler_module.ScheduleSyncState()
+
+    results = [measure(app, "full sync (restart)"), measure(app, "idle tick")]
+
+    with app.app_context():
+        for schedule in Schedule.query.limit(CHANGES_PER_TICK).all():
+            schedule.content_template += " (edited)"
+        db.session.commit()
+    results.append(measure(app, f"tick, {CHANGES_PER_TICK} edits"))
+
+    with app.app_context():
+        for schedule in Schedule.query.order_by(Schedule.id.desc()).limit(CHANGES_PER_TICK).all():
+            db.session.delete(schedule)
+        db.session.commit()
+    results.append(measure(app, f"tick, {CHANGES_PER_TICK} deletes"))
+
+    scheduler_module.scheduler.shutdown(wait=False)
+    scheduler_module.scheduler = None
+    return results
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    app = create_app()
+
+    print(f"{'schedules':>10}  {'phase':<22} {'ms':>10} {'SQL stmts':>10} {'jobs':>6}")
+    print("-" * 65)
+    for size in sizes:
+        for label, elapsed_ms, statements, jobs in run(app, size):
+            print(f"{size:>10}  {label:<22} {elapsed_ms:>10.1f} {statements:>10} {jobs:>6}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
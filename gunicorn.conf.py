@@ -34,8 +34,24 @@ umask = 0
 user = None
 group = None
 preload_app = True  # Load app before forking workers (saves memory)
+# The master only loads the app; scheduler triggers and the run queue start
+# in each worker after fork (post_fork below), and only the worker holding
+# the leader lease fires triggers (see app/jobs/leader.py)
+if preload_app:
+    os.environ.setdefault('SCHEDULER_START_AFTER_FORK', 'true')
 tmp_upload_dir = None
 
 # SSL (Render handles this)
 keyfile = None
 certfile = None
+
+
+def post_fork(server, worker):
+    from app.jobs.scheduler import start_after_fork
+    start_after_fork()
+
+
+def worker_exit(server, worker):
+    # Hand the leader lease back instead of letting it expire
+    from app.jobs.scheduler import shutdown_scheduler
+    shutdown_scheduler()
@@ -0,0 +1,32 @@
+"""Add pre-generation fields to generated_content
+
+Revision ID: content_pregeneration
+Revises: job_run_priority
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'content_pregeneration'
+down_revision = 'job_run_priority'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('generated_content', sa.Column('scheduled_for', sa.DateTime(), nullable=True), schema='marketing_agent')
+    op.add_column('generated_content', sa.Column('schedule_version', sa.Integer(), nullable=True), schema='marketing_agent')
+    op.add_column('generated_content', sa.Column('image_b64', sa.Text(), nullable=True), schema='marketing_agent')
+    op.add_column('generated_content', sa.Column('voice_data', sa.LargeBinary(), nullable=True), schema='marketing_agent')
+    op.create_index('ix_generated_content_schedule_scheduled_for', 'generated_content', ['schedule_id', 'scheduled_for'], unique=True, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index('ix_generated_content_schedule_scheduled_for', table_name='generated_content', schema='marketing_agent')
+    op.drop_column('generated_content', 'voice_data', schema='marketing_agent')
+    op.drop_column('generated_content', 'image_b64', schema='marketing_agent')
+    op.drop_column('generated_content', 'schedule_version', schema='marketing_agent')
+    op.drop_column('generated_content', 'scheduled_for', schema='marketing_agent')
@@ -0,0 +1,34 @@
+"""Make job_run unique per schedule, fire time and kind
+
+Revision ID: job_run_fire_time_unique
+Revises: schedule_run_ledger
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'job_run_fire_time_unique'
+down_revision = 'schedule_run_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the first row of runs that were queued more than once
+    op.execute(
+        """
+        DELETE FROM marketing_agent.job_run AS duplicate
+        USING marketing_agent.job_run AS original
+        WHERE duplicate.schedule_id = original.schedule_id
+          AND duplicate.fire_time = original.fire_time
+          AND duplicate.kind = original.kind
+          AND duplicate.id > original.id
+        """
+    )
+    op.create_index('ix_job_run_schedule_fire_time_kind', 'job_run', ['schedule_id', 'fire_time', 'kind'], unique=True, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index('ix_job_run_schedule_fire_time_kind', table_name='job_run', schema='marketing_agent')
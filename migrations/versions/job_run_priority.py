@@ -0,0 +1,26 @@
+"""Add priority lane to job_run
+
+Revision ID: job_run_priority
+Revises: schedule_jitter
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'job_run_priority'
+down_revision = 'schedule_jitter'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('job_run', sa.Column('priority', sa.Integer(), nullable=False, server_default='10'), schema='marketing_agent')
+    op.create_index('ix_job_run_status_priority_fire_time', 'job_run', ['status', 'priority', 'fire_time'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index('ix_job_run_status_priority_fire_time', table_name='job_run', schema='marketing_agent')
+    op.drop_column('job_run', 'priority', schema='marketing_agent')
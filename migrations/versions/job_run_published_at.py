@@ -0,0 +1,24 @@
+"""Record when a queued run published its post
+
+Revision ID: job_run_published_at
+Revises: user_semantic_cache
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'job_run_published_at'
+down_revision = 'user_semantic_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('job_run', sa.Column('published_at', sa.DateTime(), nullable=True), schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_column('job_run', 'published_at', schema='marketing_agent')
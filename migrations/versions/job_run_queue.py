@@ -0,0 +1,48 @@
+"""Add job_run table for the durable execution queue
+
+Revision ID: job_run_queue
+Revises: schedule_version
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'job_run_queue'
+down_revision = 'schedule_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_run',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('schedule_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('fire_time', sa.DateTime(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('locked_by', sa.String(length=128), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['schedule_id'], ['marketing_agent.schedule.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['marketing_agent.user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    schema='marketing_agent'
+    )
+    op.create_index('ix_job_run_status_available_at', 'job_run', ['status', 'available_at'], unique=False, schema='marketing_agent')
+    op.create_index(op.f('ix_marketing_agent_job_run_schedule_id'), 'job_run', ['schedule_id'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_marketing_agent_job_run_schedule_id'), table_name='job_run', schema='marketing_agent')
+    op.drop_index('ix_job_run_status_available_at', table_name='job_run', schema='marketing_agent')
+    op.drop_table('job_run', schema='marketing_agent')
@@ -0,0 +1,24 @@
+"""Add catchup_policy to schedule
+
+Revision ID: schedule_catchup_policy
+Revises: content_pregeneration
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'schedule_catchup_policy'
+down_revision = 'content_pregeneration'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('schedule', sa.Column('catchup_policy', sa.String(length=16), nullable=False, server_default='coalesce'), schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_column('schedule', 'catchup_policy', schema='marketing_agent')
@@ -0,0 +1,26 @@
+"""Add due_at for one-off schedules
+
+Revision ID: schedule_due_at
+Revises: scheduler_sharding
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'schedule_due_at'
+down_revision = 'scheduler_sharding'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('schedule', sa.Column('due_at', sa.DateTime(), nullable=True), schema='marketing_agent')
+    op.create_index('ix_schedule_active_due_at', 'schedule', ['active', 'due_at'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index('ix_schedule_active_due_at', table_name='schedule', schema='marketing_agent')
+    op.drop_column('schedule', 'due_at', schema='marketing_agent')
@@ -0,0 +1,26 @@
+"""Add jitter_seconds to schedule
+
+Revision ID: schedule_jitter
+Revises: job_run_queue
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'schedule_jitter'
+down_revision = 'job_run_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('schedule', sa.Column('jitter_seconds', sa.Integer(), nullable=True), schema='marketing_agent')
+    op.create_index('ix_job_run_status_fire_time', 'job_run', ['status', 'fire_time'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index('ix_job_run_status_fire_time', table_name='job_run', schema='marketing_agent')
+    op.drop_column('schedule', 'jitter_seconds', schema='marketing_agent')
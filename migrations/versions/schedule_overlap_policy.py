@@ -0,0 +1,24 @@
+"""Add overlap_policy to schedule
+
+Revision ID: schedule_overlap_policy
+Revises: schedule_catchup_policy
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'schedule_overlap_policy'
+down_revision = 'schedule_catchup_policy'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('schedule', sa.Column('overlap_policy', sa.String(length=16), nullable=False, server_default='queue_one'), schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_column('schedule', 'overlap_policy', schema='marketing_agent')
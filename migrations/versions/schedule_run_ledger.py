@@ -0,0 +1,57 @@
+"""Add schedule_run ledger
+
+Revision ID: schedule_run_ledger
+Revises: schedule_overlap_policy
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'schedule_run_ledger'
+down_revision = 'schedule_overlap_policy'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('schedule_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('schedule_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('job_run_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('channel', sa.String(length=64), nullable=True),
+        sa.Column('fire_time', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('attempt', sa.Integer(), nullable=True),
+        sa.Column('queue_wait', sa.Float(), nullable=True),
+        sa.Column('start_delay', sa.Float(), nullable=True),
+        sa.Column('text_latency', sa.Float(), nullable=True),
+        sa.Column('image_latency', sa.Float(), nullable=True),
+        sa.Column('tts_latency', sa.Float(), nullable=True),
+        sa.Column('generation_latency', sa.Float(), nullable=True),
+        sa.Column('publish_latency', sa.Float(), nullable=True),
+        sa.Column('total_latency', sa.Float(), nullable=True),
+        sa.Column('pregenerated', sa.Boolean(), nullable=True),
+        sa.Column('http_status', sa.Integer(), nullable=True),
+        sa.Column('outcome', sa.String(length=32), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['schedule_id'], ['marketing_agent.schedule.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['user_id'], ['marketing_agent.user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        schema='marketing_agent'
+    )
+    op.create_index('ix_schedule_run_channel_finished_at', 'schedule_run', ['channel', 'finished_at'], unique=False, schema='marketing_agent')
+    op.create_index('ix_schedule_run_user_finished_at', 'schedule_run', ['user_id', 'finished_at'], unique=False, schema='marketing_agent')
+    op.create_index(op.f('ix_marketing_agent_schedule_run_schedule_id'), 'schedule_run', ['schedule_id'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_marketing_agent_schedule_run_schedule_id'), table_name='schedule_run', schema='marketing_agent')
+    op.drop_index('ix_schedule_run_user_finished_at', table_name='schedule_run', schema='marketing_agent')
+    op.drop_index('ix_schedule_run_channel_finished_at', table_name='schedule_run', schema='marketing_agent')
+    op.drop_table('schedule_run', schema='marketing_agent')
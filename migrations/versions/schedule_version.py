@@ -0,0 +1,28 @@
+"""Add version and updated_at to schedule for incremental scheduler sync
+
+Revision ID: schedule_version
+Revises: scheduler_lease
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'schedule_version'
+down_revision = 'scheduler_lease'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('schedule', sa.Column('version', sa.Integer(), nullable=False, server_default='1'), schema='marketing_agent')
+    op.add_column('schedule', sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()), schema='marketing_agent')
+    op.create_index(op.f('ix_marketing_agent_schedule_updated_at'), 'schedule', ['updated_at'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_marketing_agent_schedule_updated_at'), table_name='schedule', schema='marketing_agent')
+    op.drop_column('schedule', 'updated_at', schema='marketing_agent')
+    op.drop_column('schedule', 'version', schema='marketing_agent')
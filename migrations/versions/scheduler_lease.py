@@ -0,0 +1,32 @@
+"""Add scheduler_lease table for leader election
+
+Revision ID: scheduler_lease
+Revises: linkedin_meta_fields
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'scheduler_lease'
+down_revision = 'linkedin_meta_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduler_lease',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('holder', sa.String(length=128), nullable=False),
+    sa.Column('acquired_at', sa.DateTime(), nullable=True),
+    sa.Column('renewed_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name'),
+    schema='marketing_agent'
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_lease', schema='marketing_agent')
@@ -0,0 +1,39 @@
+"""Add scheduler_node heartbeat table and schedule.shard_key
+
+Revision ID: scheduler_sharding
+Revises: job_run_fire_time_unique
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'scheduler_sharding'
+down_revision = 'job_run_fire_time_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduler_node',
+    sa.Column('node_id', sa.String(length=128), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('node_id'),
+    schema='marketing_agent'
+    )
+    op.create_index(op.f('ix_marketing_agent_scheduler_node_heartbeat_at'), 'scheduler_node', ['heartbeat_at'], unique=False, schema='marketing_agent')
+
+    op.add_column('schedule', sa.Column('shard_key', sa.Integer(), nullable=True), schema='marketing_agent')
+    # Same hash as app.jobs.sharding.shard_key
+    op.execute("UPDATE marketing_agent.schedule SET shard_key = (user_id::bigint * 2654435761) % 65536")
+    op.create_index(op.f('ix_marketing_agent_schedule_shard_key'), 'schedule', ['shard_key'], unique=False, schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_marketing_agent_schedule_shard_key'), table_name='schedule', schema='marketing_agent')
+    op.drop_column('schedule', 'shard_key', schema='marketing_agent')
+    op.drop_index(op.f('ix_marketing_agent_scheduler_node_heartbeat_at'), table_name='scheduler_node', schema='marketing_agent')
+    op.drop_table('scheduler_node', schema='marketing_agent')
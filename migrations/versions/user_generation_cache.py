@@ -0,0 +1,24 @@
+"""Add opt-in generation cache TTL per user
+
+Revision ID: user_generation_cache
+Revises: schedule_due_at
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_generation_cache'
+down_revision = 'schedule_due_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('generation_cache_minutes', sa.Integer(), nullable=True), schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_column('user', 'generation_cache_minutes', schema='marketing_agent')
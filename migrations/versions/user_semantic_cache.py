@@ -0,0 +1,24 @@
+"""Add opt-in semantic cache flag per user
+
+Revision ID: user_semantic_cache
+Revises: user_generation_cache
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_semantic_cache'
+down_revision = 'user_generation_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('semantic_cache', sa.Boolean(), nullable=True), schema='marketing_agent')
+
+
+def downgrade():
+    op.drop_column('user', 'semantic_cache', schema='marketing_agent')
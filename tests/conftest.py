@@ -0,0 +1,67 @@
+# file: tests/conftest.py
+"""Fixtures for the background job tests.
+
+The tests run on SQLite: every connection attaches a second database file
+as the ``marketing_agent`` schema the models live in. Background jobs are
+never started; tests call the queue and scheduler functions directly.
+"""
+import os
+
+os.environ.setdefault("SCHEDULER_MODE", "off")
+os.environ.setdefault("SCHEDULER_IN_WEB", "false")
+os.environ.setdefault("RUN_QUEUE_CONCURRENCY", "0")
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+
+
+@event.listens_for(Engine, "connect")
+def _attach_schema(dbapi_connection, connection_record):
+    if "sqlite" not in type(dbapi_connection).__module__:
+        return
+    path = dbapi_connection.execute("PRAGMA database_list").fetchone()[2]
+    dbapi_connection.execute(f"ATTACH DATABASE '{path}.marketing_agent' AS marketing_agent")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'marketing.db'}")
+    app = create_app(with_scheduler=False, with_blueprints=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    from app.models import User
+
+    def make_user(email=None, **fields):
+        user = User(email=email or f"user{User.query.count() + 1}@example.com", password_hash="x", **fields)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def make_schedule(app, make_user):
+    from app.models import Schedule
+
+    def make_schedule(user=None, **fields):
+        user = user or make_user()
+        fields.setdefault("cron_expression", "0 9 * * *")
+        fields.setdefault("channel", "telegram")
+        fields.setdefault("content_template", "Tipps für Instagram Reels")
+        schedule = Schedule(user_id=user.id, **fields)
+        db.session.add(schedule)
+        db.session.commit()
+        return schedule
+    return make_schedule
@@ -0,0 +1,63 @@
+# file: tests/test_cron.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.jobs.cron import _fallback_fire_times, get_trigger, next_fire_times
+
+EXPRESSIONS = [
+    "0 9 * * *",
+    "*/15 * * * *",
+    "30 8-18/2 * * mon-fri",
+    "0 0 1,15 * *",
+    "5 4 * * sun",
+    "0 12 * jan,jul *",
+    "45 23 31 * *",
+    "0 9 1-7 * mon",  # APScheduler: day AND weekday must match
+    "0 10 last * *",  # not covered by the bitmaps, answered by the trigger
+]
+TIMEZONES = ["Europe/Berlin", "UTC", "America/New_York", "Asia/Kolkata"]
+
+
+def _trigger_fire_times(expression, tz, start, window, k):
+    return _fallback_fire_times(get_trigger(expression, tz), start, start + window, k)
+
+
+def _timestamps(fire_times):
+    # Aware datetimes in different tzinfo implementations compare unequal
+    # around repeated hours, compare the instants
+    return [fire_time.timestamp() for fire_time in fire_times]
+
+
+@pytest.mark.parametrize("tz", TIMEZONES)
+def test_next_fire_times_match_the_trigger(tz):
+    start = datetime(2026, 1, 20, 7, 13, 30, tzinfo=timezone.utc)
+    window = timedelta(days=45)
+    items = [(expression, expression, tz) for expression in EXPRESSIONS]
+
+    fire_times = next_fire_times(items, start, window, k=500)
+
+    for expression in EXPRESSIONS:
+        expected = _trigger_fire_times(expression, tz, start, window, 500)
+        assert _timestamps(fire_times[expression]) == _timestamps(expected), expression
+
+
+def test_invalid_expressions_have_no_fire_times():
+    start = datetime(2026, 1, 20, tzinfo=timezone.utc)
+    fire_times = next_fire_times([(1, "61 * * * *", "UTC"), (2, "0 9 * *", "UTC")], start)
+    assert fire_times == {1: [], 2: []}
+
+
+@pytest.mark.parametrize("day", [
+    datetime(2026, 3, 29, tzinfo=timezone.utc),   # Europe/Berlin springs forward, 02:00-03:00 is skipped
+    datetime(2026, 10, 25, tzinfo=timezone.utc),  # and falls back, 02:00-03:00 happens twice
+])
+@pytest.mark.parametrize("expression", ["30 2 * * *", "0 2 * * sun", "*/30 1-3 * * *", "15 3 * * *"])
+def test_next_fire_times_match_the_trigger_across_dst_changes(day, expression):
+    start = day - timedelta(hours=14)
+    window = timedelta(days=2)
+
+    fire_times = next_fire_times([(1, expression, "Europe/Berlin")], start, window, k=100)[1]
+
+    expected = _trigger_fire_times(expression, "Europe/Berlin", start, window, 100)
+    assert _timestamps(fire_times) == _timestamps(expected)
@@ -0,0 +1,61 @@
+# file: tests/test_fairshare.py
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+from app.jobs.fairshare import PRIORITY_BULK, PRIORITY_MANUAL, FairShareSelector
+
+Row = namedtuple("Row", "id user_id priority fire_time")
+
+def _backlog(users, runs_per_user, priority=PRIORITY_BULK):
+    start = datetime(2026, 10, 18, 9, 0)
+    rows = [
+        Row(len(users) * index + position, user_id, priority, start + timedelta(seconds=index))
+        for index in range(runs_per_user)
+        for position, user_id in enumerate(users)
+    ]
+    return sorted(rows, key=lambda row: row.fire_time)
+
+
+def _picks(rows, limit, plans, running=None):
+    return Counter(row.user_id for row in FairShareSelector().select(rows, limit, running or {}, plans))
+
+
+def test_weights_share_slots_by_plan(monkeypatch):
+    # Lift the per-plan concurrency caps to look at the weights alone
+    monkeypatch.setattr("app.jobs.fairshare.plan_concurrency_cap", lambda plan: -1)
+    plans = {1: "free", 2: "basic", 3: "pro"}
+
+    picks = _picks(_backlog(plans, 50), 70, plans)
+
+    # Weights 1 : 2 : 4
+    assert picks == {1: 10, 2: 20, 3: 40}
+
+
+def test_every_tenant_gets_a_slot_in_the_first_round(monkeypatch):
+    monkeypatch.setattr("app.jobs.fairshare.plan_concurrency_cap", lambda plan: -1)
+    plans = {user_id: "free" for user_id in range(1, 11)}
+    plans[1] = "enterprise"
+    # One big tenant with a large backlog due first
+    rows = _backlog([1], 200) + [row._replace(fire_time=row.fire_time + timedelta(hours=1)) for row in _backlog(range(2, 11), 1)]
+
+    picks = _picks(rows, 10, plans)
+
+    assert set(picks) == set(range(1, 11))
+
+
+def test_concurrency_cap_per_plan():
+    plans = {1: "free", 2: "basic"}
+    picks = _picks(_backlog(plans, 10), 10, plans, running={2: 1})
+
+    # free runs one at a time, basic two (one already running)
+    assert picks == {1: 1, 2: 1}
+
+
+def test_manual_lane_goes_first(monkeypatch):
+    monkeypatch.setattr("app.jobs.fairshare.plan_concurrency_cap", lambda plan: -1)
+    plans = {1: "free", 2: "free"}
+    manual = Row(999, 2, PRIORITY_MANUAL, datetime(2026, 10, 18, 12, 0))
+
+    chosen = FairShareSelector().select(_backlog([1], 5) + [manual], 1, {}, plans)
+
+    assert chosen == [manual]
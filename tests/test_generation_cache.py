@@ -0,0 +1,106 @@
+# file: tests/test_generation_cache.py
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import openai_service
+from app.generation_cache import GenerationCache, generation_cache
+
+
+class FakeClient:
+    """Stands in for the OpenAI client: answers every completion with a new text"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.calls += 1
+        message = SimpleNamespace(content=f"Post {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=100))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(openai_service, "get_openai_client", lambda api_key=None: client)
+    generation_cache.clear()
+    yield client
+    generation_cache.clear()
+
+
+def test_identical_requests_in_flight_call_once():
+    cache = GenerationCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "Post"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("1:key", 60, compute, wait_timeout=5)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["Post"] * 8
+    assert cache.get_or_compute("1:key", 60, compute) == "Post"
+    assert len(calls) == 1
+
+
+def test_errors_are_not_cached():
+    cache = GenerationCache()
+
+    def fail():
+        raise RuntimeError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("1:key", 60, fail)
+    assert cache.get_or_compute("1:key", 60, lambda: "Post") == "Post"
+
+
+def test_without_ttl_the_cache_is_bypassed():
+    cache = GenerationCache()
+    values = iter(["first", "second"])
+
+    assert cache.get_or_compute("1:key", None, lambda: next(values)) == "first"
+    assert cache.get_or_compute("1:key", None, lambda: next(values)) == "second"
+    assert len(cache) == 0
+
+
+def test_cached_texts_are_scoped_to_the_user(client):
+    def generate(user_id):
+        return openai_service.generate_post_text(
+            "Tipps für Instagram Reels", "telegram", "system prompt",
+            cache_ttl=600, cache_scope=str(user_id)
+        )
+
+    # Both users on the system API key
+    first = generate(1)
+    assert generate(1) == first
+    assert generate(2) != first
+    assert client.calls == 2
+
+
+def test_scheduled_runs_always_generate_a_new_text(app, make_user, make_schedule, client):
+    from app.jobs.scheduler import execute_scheduled_post
+
+    client.with_options = lambda **options: client
+    user = make_user(openai_api_key="sk-test", generation_cache_minutes=1440, semantic_cache=True)
+    schedule = make_schedule(user)
+
+    execute_scheduled_post(schedule.id, app)
+    execute_scheduled_post(schedule.id, app)
+
+    assert client.calls == 2
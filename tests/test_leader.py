@@ -0,0 +1,59 @@
+# file: tests/test_leader.py
+import time
+
+from app.jobs.leader import FileLease, LeaderElector
+
+
+def _wait_for(condition, timeout=5.0):
+    give_up = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > give_up:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_file_lease_is_exclusive(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    first, second = FileLease(path), FileLease(path)
+
+    assert first.try_acquire()
+    assert first.try_acquire()  # renewing the held lease
+    assert not second.try_acquire()
+
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_leadership_moves_to_the_other_process(app, tmp_path):
+    app.config["SCHEDULER_LOCK_FILE"] = str(tmp_path / "scheduler.lock")
+    app.config["SCHEDULER_HEARTBEAT_INTERVAL"] = 0.02
+    events = []
+    electors = [
+        LeaderElector(
+            app,
+            on_elected=lambda name=name: events.append(("elected", name)),
+            on_demoted=lambda name=name: events.append(("demoted", name))
+        )
+        for name in ("a", "b")
+    ]
+    for elector in electors:
+        elector.start()
+
+    try:
+        assert _wait_for(lambda: any(elector.is_leader for elector in electors))
+        time.sleep(0.1)
+        leaders = [elector for elector in electors if elector.is_leader]
+        assert len(leaders) == 1
+        leader = leaders[0]
+        follower = electors[1 - electors.index(leader)]
+
+        # Shutting down hands the lease back; the follower takes over on its next heartbeat
+        leader.stop()
+        assert not leader.is_leader
+        assert _wait_for(lambda: follower.is_leader)
+        assert [kind for kind, _ in events] == ["elected", "demoted", "elected"]
+    finally:
+        for elector in electors:
+            elector.stop()
@@ -0,0 +1,31 @@
+# file: tests/test_lookahead.py
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app import openai_service
+from app.jobs.lookahead import pregenerate_content
+from app.models import GeneratedContent
+
+
+class FailingClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return self
+
+    def create(self, **request):
+        raise RuntimeError("insufficient_quota")
+
+
+def test_failed_text_is_not_stored(app, make_user, make_schedule, monkeypatch):
+    monkeypatch.setattr(openai_service, "get_openai_client", lambda api_key=None: FailingClient())
+    schedule = make_schedule(make_user(openai_api_key="sk-test"))
+    fire_time = datetime.utcnow().replace(second=0, microsecond=0) + timedelta(hours=1)
+
+    with pytest.raises(RuntimeError, match="insufficient_quota"):
+        pregenerate_content(schedule.id, app, fire_time)
+
+    assert GeneratedContent.query.count() == 0
@@ -0,0 +1,76 @@
+# file: tests/test_pipeline.py
+import asyncio
+from concurrent.futures import Future
+
+import pytest
+
+from app.jobs import pipeline
+
+
+def _kwargs(**overrides):
+    return dict(dict(topic="Tipps für Instagram Reels", channel="telegram",
+                     user_system_prompt=None, user_api_key=None), **overrides)
+
+
+def test_backend_is_read_from_the_app_on_every_call(app, monkeypatch):
+    submitted = []
+
+    def submit_assets(**kwargs):
+        submitted.append(kwargs)
+        future = Future()
+        future.set_result({"text": "async"})
+        return future
+
+    monkeypatch.setattr(pipeline, "submit_assets", submit_assets)
+    monkeypatch.setattr(pipeline, "generate_post_text", lambda **kwargs: "threads")
+
+    assert pipeline.generate_assets(app=app, **_kwargs())["text"] == "threads"
+    app.config["GENERATION_BACKEND"] = "async"
+    assert pipeline.generate_assets(app=app, **_kwargs())["text"] == "async"
+    assert len(submitted) == 1
+
+
+def _failing_image(**kwargs):
+    raise RuntimeError("content_policy_violation")
+
+
+def test_failed_image_is_dropped_and_reported(monkeypatch):
+    monkeypatch.setattr(pipeline, "generate_post_text", lambda **kwargs: "Post")
+    monkeypatch.setattr(pipeline, "generate_image_b64", _failing_image)
+
+    assets = pipeline.generate_assets(with_image=True, **_kwargs())
+
+    assert assets["text"] == "Post"
+    assert assets["image_b64"] is None
+    assert assets["dropped"] == ["image"]
+    assert assets["errors"] == {"image": "content_policy_violation"}
+    assert "image" in assets["timings"]
+
+
+def test_failed_voice_fails_the_run_without_degrade(monkeypatch):
+    def failing_tts(**kwargs):
+        raise RuntimeError("tts unavailable")
+
+    monkeypatch.setattr(pipeline, "generate_post_text", lambda **kwargs: "Post")
+    monkeypatch.setattr(pipeline, "generate_tts_audio", failing_tts)
+
+    with pytest.raises(RuntimeError, match="tts unavailable"):
+        pipeline.generate_assets(with_voice=True, degrade=False, **_kwargs())
+
+
+def test_failed_image_is_dropped_on_the_async_backend(monkeypatch):
+    from app import openai_async
+
+    async def text(**kwargs):
+        return "Post"
+
+    async def image(**kwargs):
+        _failing_image()
+
+    monkeypatch.setattr(openai_async, "generate_post_text", text)
+    monkeypatch.setattr(openai_async, "generate_image_b64", image)
+
+    assets = asyncio.run(pipeline.generate_assets_async(with_image=True, **_kwargs()))
+
+    assert assets["dropped"] == ["image"]
+    assert assets["errors"] == {"image": "content_policy_violation"}
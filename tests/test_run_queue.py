@@ -0,0 +1,164 @@
+# file: tests/test_run_queue.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.jobs import pipeline, run_queue
+from app.models import JobRun
+from app.publishers.telegram_publisher import TelegramPublisher
+
+
+def _due(schedule, seconds_ago=60, **fields):
+    fire_time = datetime.utcnow().replace(microsecond=0) - timedelta(seconds=seconds_ago)
+    return dict(schedule_id=schedule.id, user_id=schedule.user_id, fire_time=fire_time, available_at=fire_time, **fields)
+
+
+def test_enqueue_runs_queues_each_fire_time_once(app, make_schedule):
+    schedule = make_schedule()
+    run = _due(schedule)
+
+    assert run_queue.enqueue_runs([run]) == 1
+    # Another node firing the same trigger
+    assert run_queue.enqueue_runs([dict(run), _due(schedule, seconds_ago=120)]) == 1
+    assert run_queue.enqueue_run(schedule.id, schedule.user_id, run["fire_time"]) is None
+    # Pre-generating the same fire time is a different run
+    assert run_queue.enqueue_runs([dict(run)], kind=run_queue.KIND_PREGENERATE) == 1
+    assert JobRun.query.count() == 3
+
+
+def test_claim_is_compare_and_set(app, make_schedule):
+    schedule = make_schedule()
+    run_id = run_queue.enqueue_run(schedule.id, schedule.user_id, _due(schedule)["fire_time"])
+
+    claimed = run_queue.claim_runs("worker-a", 5, 60)
+    assert [run["id"] for run in claimed] == [run_id]
+    assert run_queue.claim_runs("worker-b", 5, 60) == []
+    assert run_queue.confirm_claim(run_id, "worker-a", 60)
+    assert not run_queue.confirm_claim(run_id, "worker-b", 60)
+
+    # Worker A hangs past its visibility timeout: B takes the run over
+    db.session.execute(
+        JobRun.__table__.update().values(locked_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+    assert [run["id"] for run in run_queue.claim_runs("worker-b", 5, 60)] == [run_id]
+    assert not run_queue.confirm_claim(run_id, "worker-a", 60)
+    assert not run_queue.complete_run(run_id, "worker-a")
+    assert run_queue.complete_run(run_id, "worker-b")
+
+
+@pytest.mark.parametrize("policy, claimable", [
+    (run_queue.OVERLAP_QUEUE_ONE, 1),
+    (run_queue.OVERLAP_ALLOW, 2),
+])
+def test_claim_runs_one_run_per_schedule(app, make_schedule, policy, claimable):
+    schedule = make_schedule(overlap_policy=policy)
+    other = make_schedule()
+    run_queue.enqueue_runs([_due(schedule, 120), _due(schedule, 60), _due(other)])
+
+    claimed = run_queue.claim_runs("worker-a", 5, 60)
+    assert sorted(run["schedule_id"] for run in claimed) == sorted([schedule.id] * claimable + [other.id])
+    # A deferred fire stays queued while the schedule has a run executing
+    assert len(run_queue.claim_runs("worker-b", 5, 60)) == 0
+
+
+def test_fail_run_backs_off_then_gives_up(app, make_schedule):
+    schedule = make_schedule()
+    run_queue.enqueue_runs([_due(schedule, max_attempts=3)])
+    delays = []
+
+    for attempt in range(1, 4):
+        db.session.execute(JobRun.__table__.update().values(available_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        run, = run_queue.claim_runs("worker-a", 1, 60)
+        assert run["attempts"] == attempt
+        failed_at = datetime.utcnow()
+        run_queue.fail_run(run, "worker-a", "boom", retry_delay=10)
+
+        row = db.session.get(JobRun, run["id"])
+        db.session.refresh(row)
+        assert row.last_error == "boom"
+        if attempt < 3:
+            assert row.status == run_queue.STATUS_QUEUED
+            delays.append(round((row.available_at - failed_at).total_seconds()))
+        else:
+            assert row.status == run_queue.STATUS_FAILED
+            assert row.finished_at is not None
+
+    assert delays == [10, 20]
+
+
+def _claim_one(app, schedule, worker):
+    with app.app_context():
+        run_queue.enqueue_run(schedule.id, schedule.user_id, datetime.utcnow() - timedelta(seconds=1))
+        runs = run_queue.claim_runs(worker.worker_id, 1, worker.visibility_timeout)
+    assert len(runs) == 1
+    return runs[0]
+
+
+def test_failed_write_back_after_publishing_is_not_retried(app, make_user, make_schedule, monkeypatch):
+    user = make_user(telegram_token="token", telegram_chat_id="chat", openai_api_key="sk-test")
+    schedule = make_schedule(user)
+    worker = run_queue.QueueWorker(app, concurrency=1)
+    run = _claim_one(app, schedule, worker)
+
+    def generate_assets(**kwargs):
+        return dict(text="Post", image_b64=None, voice_bytes=None, timings={}, dropped=[], similar=None)
+
+    def commit():
+        raise RuntimeError("database went away")
+
+    def publish(self, **kwargs):
+        # Everything committed from now on fails, the post itself went out
+        monkeypatch.setattr(db.session, "commit", commit)
+        return {"success": True, "status": 200}
+
+    monkeypatch.setattr(pipeline, "generate_assets", generate_assets)
+    monkeypatch.setattr(TelegramPublisher, "publish", publish)
+    worker._execute(run)
+    monkeypatch.undo()
+
+    with app.app_context():
+        row = db.session.get(JobRun, run["id"])
+        assert row.status == run_queue.STATUS_DONE
+        assert row.published_at is not None
+        assert "writing back failed" in row.last_error
+        # Even with a fresh claim the run would not publish again
+        assert not run_queue.confirm_claim(run["id"], worker.worker_id, 60)
+
+
+@pytest.mark.parametrize("policy, behind_running, behind_queued", [
+    (run_queue.OVERLAP_QUEUE_ONE, True, False),
+    (run_queue.OVERLAP_COALESCE, True, False),
+    (run_queue.OVERLAP_SKIP, False, False),
+    (run_queue.OVERLAP_ALLOW, True, True),
+])
+def test_admit_runs_overlap_policies(app, make_schedule, policy, behind_running, behind_queued):
+    schedule = make_schedule(overlap_policy=policy)
+    policies = {schedule.id: policy}
+    run_queue.enqueue_runs([_due(schedule, 300)])
+    run_queue.claim_runs("worker-a", 1, 600)
+
+    # The first run is still executing when the next fire comes
+    fire = _due(schedule, 200)
+    admitted = run_queue.admit_runs([fire], policies)
+    assert admitted == ([fire] if behind_running else [])
+    run_queue.enqueue_runs(admitted)
+
+    # ... and again with that one waiting behind it
+    latest = _due(schedule, 100)
+    admitted = run_queue.admit_runs([latest], policies)
+    assert admitted == ([latest] if behind_queued else [])
+    run_queue.enqueue_runs(admitted)
+
+    queued = [run.fire_time for run in JobRun.query.filter_by(status=run_queue.STATUS_QUEUED).order_by(JobRun.fire_time)]
+    if policy == run_queue.OVERLAP_COALESCE:
+        # The waiting run took over the newest fire time
+        assert queued == [latest["fire_time"]]
+    elif policy == run_queue.OVERLAP_ALLOW:
+        assert queued == [fire["fire_time"], latest["fire_time"]]
+    elif policy == run_queue.OVERLAP_SKIP:
+        assert queued == []
+    else:
+        assert queued == [fire["fire_time"]]